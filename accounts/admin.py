@@ -1,13 +1,15 @@
-from .models import GroupAdminKYC, PayoutOrder, SavingsGroup, GroupJoinRequest, GroupMembership
+from .models import DisbursementBatch, GroupAdminKYC, Notification, Payout, PayoutOrder, PayoutProjection, SavingsGroup, UserNotification, GroupJoinRequest, GroupMembership
 from django.utils.html import format_html
 from django.utils import timezone
 from django.contrib import admin
-import cloudinary
+
+from . import kyc
 
 @admin.register(GroupAdminKYC)
 class GroupAdminKYCAdmin(admin.ModelAdmin):
     list_display = ['user', 'is_manually_verified', 'created_at', 'verification_status']
     list_filter = ['is_manually_verified', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__email', 'user__profile__momo_number']
 
     fieldsets = (
@@ -39,23 +41,9 @@ class GroupAdminKYCAdmin(admin.ModelAdmin):
             obj.verified_at = timezone.now()
         super().save_model(request, obj, form, change)
 
-    # generate signed URLs for private images
+    # signed URLs for private images, reused until shortly before they expire
     def _get_signed_url(self, image_field):
-        """
-        Explicitly builds a signed URL for private Cloudinary resources.
-        """
-        if not image_field:
-            return None
-
-        try:
-            return cloudinary.CloudinaryImage(image_field.public_id).build_url(
-                type='private',
-                sign_url=True,
-                secure=True,
-                expires_in=3600
-            )
-        except Exception as e:
-            return None
+        return kyc.signed_url(image_field)
 
     def front_preview(self, obj):
         url = self._get_signed_url(obj.ghana_card_front)
@@ -147,3 +135,63 @@ class GroupMembershipAdmin(admin.ModelAdmin):
     list_filter = ['joined_at']
     search_fields = ['user__email', 'group__group_name']
     readonly_fields = ['user', 'group', 'joined_at']
+
+
+@admin.register(Payout)
+class PayoutAdmin(admin.ModelAdmin):
+    list_display = ['group', 'cycle_number', 'beneficiary', 'amount', 'status', 'batch', 'notified_at', 'disbursed_at']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['group__admin__profile', 'beneficiary', 'batch']
+    search_fields = ['group__group_name', 'beneficiary__email']
+    readonly_fields = [
+        'group', 'cycle_number', 'beneficiary', 'amount',
+        'incomplete_alert_sent_at', 'notified_at', 'disbursed_at', 'created_at',
+        'batch', 'submission_attempts', 'failure_reason'
+    ]
+    actions = ['mark_disbursed']
+
+    def mark_disbursed(self, request, queryset):
+        queryset.filter(status='notified').update(status='disbursed', disbursed_at=timezone.now())
+    mark_disbursed.short_description = "Mark selected payouts as disbursed"
+
+
+@admin.register(PayoutProjection)
+class PayoutProjectionAdmin(admin.ModelAdmin):
+    list_display = ['day', 'payout_count', 'total_amount', 'generated_at']
+    date_hierarchy = 'day'
+    readonly_fields = ['day', 'payout_count', 'total_amount', 'generated_at']
+
+
+@admin.register(DisbursementBatch)
+class DisbursementBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'provider', 'provider_reference', 'status', 'item_count', 'submitted_at', 'completed_at']
+    list_filter = ['provider', 'status']
+    readonly_fields = [
+        'provider', 'provider_reference', 'status', 'item_count', 'error',
+        'created_at', 'submitted_at', 'completed_at'
+    ]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'channel', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['kind', 'channel', 'status']
+    search_fields = ['dedupe_key', 'recipient', 'provider_reference']
+    readonly_fields = [
+        'channel', 'kind', 'dedupe_key', 'payload', 'recipient', 'provider_reference',
+        'attempts', 'last_error', 'created_at', 'sent_at'
+    ]
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+    retry_now.short_description = "Retry selected notifications now"
+
+
+@admin.register(UserNotification)
+class UserNotificationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'kind', 'title', 'is_read', 'created_at']
+    list_filter = ['kind', 'is_read']
+    list_select_related = ['user']
+    search_fields = ['user__email', 'title']
+    readonly_fields = ['user', 'kind', 'title', 'body', 'data', 'created_at', 'read_at']
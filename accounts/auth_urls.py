@@ -3,14 +3,16 @@ from .views import (
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 from django.urls import path
+from django.views.decorators.cache import never_cache
 
 urlpatterns = [
-    path('signup/', FullSignupView.as_view(), name='signup'),
+    # Async views: decorated here, method_decorator(..., name='dispatch') expects a sync dispatch
+    path('signup/', never_cache(FullSignupView.as_view()), name='signup'),
     path('otp/send/', SendOTPView.as_view(), name='otp-send'),
     path('otp/verify/', VerifyOTPView.as_view(), name='otp-verify'),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot_password'),
-    path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
+    path('reset-password/', never_cache(ResetPasswordView.as_view()), name='reset_password'),
     path('me/', MeView.as_view(), name='me'),
 ]
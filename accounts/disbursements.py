@@ -0,0 +1,385 @@
+"""
+MoMo disbursement for payouts.
+
+Payouts that reached 'notified' are grouped into provider bulk-transfer
+batches and submitted concurrently over one pooled async HTTP client.
+A reconciliation pass then polls the provider until every transfer is final.
+
+The provider is chosen with DISBURSEMENT_PROVIDER; without one the
+disbursement tasks refuse to run. FakeDisbursementProvider is a local stand-in
+that never leaves the process, for development and tests.
+
+A batch is committed as 'submitting' before it is sent. If the run dies in
+between, the batch is failed after DISBURSEMENT_SUBMIT_TIMEOUT and its payouts
+are claimed again under the same transfer references; transfers the provider
+already has are left out of the resubmission.
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import DisbursementBatch, Payout
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Transfer:
+    reference: str
+    amount: Decimal
+    momo_number: str
+    momo_provider: str
+    recipient_name: str
+    reason: str
+    # Above 1 the reference may already exist at the provider
+    attempt: int = 1
+
+
+@dataclass
+class TransferResult:
+    reference: str
+    status: str  # 'pending', 'success', 'failed', or 'missing' if the provider never got it
+    reason: str = ''
+
+
+class DisbursementProvider:
+    """Interface every provider implements."""
+    name = ''
+    max_batch_size = 100
+
+    def check_transfer(self, transfer):
+        """Returns why the provider can't take ``transfer``, or '' if it can."""
+        return ''
+
+    async def submit_batch(self, client, transfers):
+        """Sends one bulk transfer; returns the provider's batch reference."""
+        raise NotImplementedError
+
+    async def fetch_statuses(self, client, references):
+        """Returns a TransferResult for each transfer reference."""
+        raise NotImplementedError
+
+
+class PaystackDisbursementProvider(DisbursementProvider):
+    name = 'paystack'
+    max_batch_size = 100
+    base_url = 'https://api.paystack.co'
+
+    MOMO_BANK_CODES = {
+        'mtn': 'MTN',
+        'telecel': 'VOD',
+        'airteltigo': 'ATL',
+    }
+
+    def _headers(self):
+        return {
+            'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
+            'Content-Type': 'application/json',
+        }
+
+    def check_transfer(self, transfer):
+        if transfer.momo_provider not in self.MOMO_BANK_CODES:
+            return f"Unsupported MoMo provider '{transfer.momo_provider}'"
+        return ''
+
+    async def _unsent(self, client, transfers):
+        """
+        Drops retried transfers Paystack already has, so a resubmitted batch
+        isn't rejected for a duplicate reference. Reconciliation settles those.
+        """
+        retried = [transfer.reference for transfer in transfers if transfer.attempt > 1]
+        if not retried:
+            return transfers
+        known = {
+            result.reference for result in await self.fetch_statuses(client, retried)
+            if result.status != 'missing'
+        }
+        return [transfer for transfer in transfers if transfer.reference not in known]
+
+    async def submit_batch(self, client, transfers):
+        transfers = await self._unsent(client, transfers)
+        if not transfers:
+            return ''
+
+        recipients_resp = await client.post(
+            f'{self.base_url}/transferrecipient/bulk',
+            headers=self._headers(),
+            json={'batch': [
+                {
+                    'type': 'mobile_money',
+                    'name': transfer.recipient_name,
+                    'account_number': transfer.momo_number,
+                    'bank_code': self.MOMO_BANK_CODES[transfer.momo_provider],
+                    'currency': 'GHS',
+                    # Paystack may normalise the account number; match recipients on our reference
+                    'metadata': {'reference': transfer.reference},
+                }
+                for transfer in transfers
+            ]},
+        )
+        recipients_resp.raise_for_status()
+        recipient_codes = {
+            recipient['metadata']['reference']: recipient['recipient_code']
+            for recipient in recipients_resp.json()['data']['success']
+        }
+
+        transfer_resp = await client.post(
+            f'{self.base_url}/transfer/bulk',
+            headers=self._headers(),
+            json={
+                'currency': 'GHS',
+                'source': 'balance',
+                'transfers': [
+                    {
+                        'amount': int(transfer.amount * 100),
+                        'recipient': recipient_codes[transfer.reference],
+                        'reference': transfer.reference,
+                        'reason': transfer.reason,
+                    }
+                    for transfer in transfers
+                    # Wallets the provider rejected are reported as failed at reconciliation
+                    if transfer.reference in recipient_codes
+                ],
+            },
+        )
+        transfer_resp.raise_for_status()
+        # Paystack has no batch id; transfers are tracked by their own reference
+        return ''
+
+    async def _fetch_status(self, client, reference):
+        resp = await client.get(f'{self.base_url}/transfer/verify/{reference}', headers=self._headers())
+        if resp.status_code == 404:
+            return TransferResult(reference, 'missing', 'Transfer not found at provider')
+        resp.raise_for_status()
+        data = resp.json()['data']
+        if data['status'] == 'success':
+            return TransferResult(reference, 'success')
+        if data['status'] in ('failed', 'reversed', 'abandoned'):
+            return TransferResult(reference, 'failed', data.get('reason') or data['status'])
+        return TransferResult(reference, 'pending')
+
+    async def fetch_statuses(self, client, references):
+        return await asyncio.gather(*(self._fetch_status(client, ref) for ref in references))
+
+
+class FakeDisbursementProvider(DisbursementProvider):
+    """
+    In-process stand-in. Each call takes DISBURSEMENT_FAKE_LATENCY seconds and every
+    transfer succeeds, except to numbers listed in DISBURSEMENT_FAKE_FAILING_NUMBERS.
+    """
+    name = 'fake'
+    max_batch_size = 100
+
+    def __init__(self):
+        self.latency = getattr(settings, 'DISBURSEMENT_FAKE_LATENCY', 0)
+        self.failing_numbers = set(getattr(settings, 'DISBURSEMENT_FAKE_FAILING_NUMBERS', []))
+        self.results = {}
+
+    async def submit_batch(self, client, transfers):
+        await asyncio.sleep(self.latency)
+        for transfer in transfers:
+            if transfer.momo_number in self.failing_numbers:
+                self.results[transfer.reference] = TransferResult(transfer.reference, 'failed', 'Invalid MoMo wallet')
+            else:
+                self.results[transfer.reference] = TransferResult(transfer.reference, 'success')
+        return f'fake-{uuid.uuid4().hex[:12]}'
+
+    async def fetch_statuses(self, client, references):
+        await asyncio.sleep(self.latency)
+        # References submitted by another worker process are treated as settled
+        return [self.results.get(ref, TransferResult(ref, 'success')) for ref in references]
+
+
+_provider = None
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        if not settings.DISBURSEMENT_PROVIDER:
+            # Never fall back to the fake: it would mark real payouts disbursed
+            raise ImproperlyConfigured("Set DISBURSEMENT_PROVIDER to disburse payouts")
+        _provider = import_string(settings.DISBURSEMENT_PROVIDER)()
+    return _provider
+
+
+def http_client():
+    """Pooled client shared by every request of one disbursement run."""
+    concurrency = settings.DISBURSEMENT_MAX_CONCURRENCY
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+
+def _to_transfer(payout):
+    profile = payout.beneficiary.profile
+    return Transfer(
+        reference=payout.transfer_reference,
+        amount=payout.amount,
+        momo_number=str(profile.momo_number).replace('+', ''),
+        momo_provider=profile.momo_provider,
+        recipient_name=profile.momo_name,
+        reason=f"SnappX payout: {payout.group.group_name} cycle {payout.cycle_number}",
+        attempt=payout.submission_attempts + 1,
+    )
+
+
+def release_stale_batches(provider):
+    """
+    Fails batches still 'submitting' after DISBURSEMENT_SUBMIT_TIMEOUT, left by
+    a run that died before recording the provider's answer, and releases their
+    payouts. Their transfer references don't change, and the next submission
+    skips transfers that did go through. Returns the number of payouts released.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.DISBURSEMENT_SUBMIT_TIMEOUT)
+    with transaction.atomic():
+        stale = list(
+            DisbursementBatch.objects.select_for_update(skip_locked=True)
+            .filter(status='submitting', provider=provider.name, created_at__lt=cutoff)
+            .values_list('pk', flat=True)
+        )
+        if not stale:
+            return 0
+        released = Payout.objects.filter(batch__in=stale, status='notified').update(batch=None)
+        DisbursementBatch.objects.filter(pk__in=stale).update(
+            status='failed', error="Submission interrupted; payouts released for retry"
+        )
+    logger.warning(f"Released {released} payouts from interrupted disbursement batches {stale}")
+    return released
+
+
+def claim_due_payouts(provider, limit=1000):
+    """
+    Assigns notified payouts that are not yet in a batch to new batches.
+    SKIP LOCKED lets concurrent runs claim disjoint payouts. Payouts the
+    provider can't take are failed on their own instead of in a batch.
+    """
+    batch_size = min(settings.DISBURSEMENT_BATCH_SIZE, provider.max_batch_size)
+    with transaction.atomic():
+        payouts = list(
+            Payout.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status='notified', batch__isnull=True)
+            .select_related('beneficiary__profile', 'group')
+            .order_by('notified_at')[:limit]
+        )
+        claimed = []
+        for payout in payouts:
+            transfer = _to_transfer(payout)
+            error = provider.check_transfer(transfer)
+            if error:
+                Payout.objects.filter(pk=payout.pk).update(status='failed', failure_reason=error)
+                logger.warning(f"Payout {payout.pk} can't be disbursed: {error}")
+            else:
+                claimed.append((payout, transfer))
+
+        batches = []
+        for start in range(0, len(claimed), batch_size):
+            chunk = claimed[start:start + batch_size]
+            batch = DisbursementBatch.objects.create(provider=provider.name, item_count=len(chunk))
+            Payout.objects.filter(pk__in=[payout.pk for payout, _ in chunk]).update(
+                batch=batch, submission_attempts=F('submission_attempts') + 1
+            )
+            batches.append((batch, [transfer for _, transfer in chunk]))
+    return batches
+
+
+async def _submit_all(provider, batches):
+    semaphore = asyncio.Semaphore(settings.DISBURSEMENT_MAX_CONCURRENCY)
+
+    async def submit(transfers):
+        async with semaphore:
+            return await provider.submit_batch(client, transfers)
+
+    async with http_client() as client:
+        return await asyncio.gather(
+            *(submit(transfers) for _, transfers in batches),
+            return_exceptions=True,
+        )
+
+
+def submit_due_payouts():
+    """Claims due payouts and submits them as bulk transfers. Returns the number of payouts submitted."""
+    provider = get_provider()
+    release_stale_batches(provider)
+    batches = claim_due_payouts(provider)
+    if not batches:
+        return 0
+
+    outcomes = asyncio.run(_submit_all(provider, batches))
+
+    submitted = 0
+    now = timezone.now()
+    for (batch, transfers), outcome in zip(batches, outcomes):
+        # Only a batch still 'submitting' is updated: one taken over as stale stays failed
+        submitting = DisbursementBatch.objects.filter(pk=batch.pk, status='submitting')
+        if isinstance(outcome, Exception):
+            logger.error(f"Disbursement batch {batch.pk} failed to submit: {outcome}")
+            with transaction.atomic():
+                if submitting.update(status='failed', error=str(outcome)):
+                    # Release the payouts so the next run retries them; references stay the same
+                    batch.payouts.filter(status='notified').update(batch=None)
+            continue
+        if not submitting.update(status='submitted', provider_reference=outcome, submitted_at=now):
+            logger.warning(f"Disbursement batch {batch.pk} was released before its submission was recorded")
+            continue
+        submitted += len(transfers)
+    return submitted
+
+
+async def _fetch_all(provider, references_by_batch):
+    async with http_client() as client:
+        return await asyncio.gather(
+            *(provider.fetch_statuses(client, refs) for refs in references_by_batch),
+            return_exceptions=True,
+        )
+
+
+def reconcile_batches():
+    """Polls the provider for submitted batches and settles their payouts. Returns payouts settled."""
+    provider = get_provider()
+    batches = list(
+        DisbursementBatch.objects.filter(status='submitted', provider=provider.name)
+        .prefetch_related('payouts')
+    )
+    if not batches:
+        return 0
+
+    payouts_by_batch = [
+        {payout.transfer_reference: payout for payout in batch.payouts.all() if payout.status == 'notified'}
+        for batch in batches
+    ]
+    outcomes = asyncio.run(_fetch_all(provider, [list(payouts) for payouts in payouts_by_batch]))
+
+    settled = 0
+    now = timezone.now()
+    for batch, payouts, outcome in zip(batches, payouts_by_batch, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Could not reconcile disbursement batch {batch.pk}: {outcome}")
+            continue
+
+        disbursed = [payouts[result.reference].pk for result in outcome if result.status == 'success']
+        failed = [result for result in outcome if result.status in ('failed', 'missing')]
+        with transaction.atomic():
+            Payout.objects.filter(pk__in=disbursed, status='notified').update(status='disbursed', disbursed_at=now)
+            for result in failed:
+                Payout.objects.filter(pk=payouts[result.reference].pk, status='notified').update(
+                    status='failed', failure_reason=result.reason
+                )
+            if len(disbursed) + len(failed) == len(payouts):
+                batch.status = 'completed'
+                batch.completed_at = now
+                batch.save(update_fields=['status', 'completed_at'])
+        settled += len(disbursed) + len(failed)
+    return settled
@@ -0,0 +1,62 @@
+"""
+Per-user in-app notification feed.
+
+The unread count is kept as a counter in the cache so the client can poll it
+cheaply. It is only a cache: on a miss it is recounted from the database, and
+any write that can't adjust it safely just drops it.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import realtime
+from .models import UserNotification
+
+UNREAD_TIMEOUT = 60 * 60 * 24
+
+
+def _unread_key(user_id):
+    return f'feed:unread:{user_id}'
+
+
+def push(user_id, kind, title, body, data=None):
+    """Adds an entry to a user's feed inside the caller's transaction."""
+    entry = UserNotification.objects.create(user_id=user_id, kind=kind, title=title, body=body, data=data or {})
+    transaction.on_commit(lambda: _adjust_unread(user_id, 1))
+    realtime.publish([user_id], kind, {
+        'id': entry.pk, 'title': title, 'body': body, 'data': entry.data, 'created_at': entry.created_at,
+    })
+    return entry
+
+
+def _adjust_unread(user_id, delta):
+    try:
+        count = cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        # Not cached; the next read recounts
+        return
+    if count < 0:
+        cache.delete(_unread_key(user_id))
+
+
+def unread_count(user_id):
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = UserNotification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(key, count, timeout=UNREAD_TIMEOUT)
+    return count
+
+
+def mark_read(user_id, ids=None):
+    """Marks the given entries (or all of them) read. Returns how many changed."""
+    entries = UserNotification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        entries = entries.filter(pk__in=ids)
+    updated = entries.update(is_read=True, read_at=timezone.now())
+    if ids is None:
+        # Recounted on the next read, so a concurrent push isn't lost
+        cache.delete(_unread_key(user_id))
+    elif updated:
+        _adjust_unread(user_id, -updated)
+    return updated
@@ -0,0 +1,25 @@
+import datetime
+
+from django.utils import timezone
+from django_filters import rest_framework as filters
+
+from .models import SavingsGroup
+
+
+class SavingsGroupCatalogFilter(filters.FilterSet):
+    """
+    Filters for the public group catalog. ``open_seats`` is an annotation added
+    by AllGroupsListView (expected_members - current_members).
+    """
+    min_amount = filters.NumberFilter(field_name='contribution_amount', lookup_expr='gte')
+    max_amount = filters.NumberFilter(field_name='contribution_amount', lookup_expr='lte')
+    min_open_seats = filters.NumberFilter(field_name='open_seats', lookup_expr='gte')
+    max_days_to_payout = filters.NumberFilter(method='filter_max_days_to_payout')
+
+    class Meta:
+        model = SavingsGroup
+        fields = ['frequency', 'expected_members', 'contribution_amount']
+
+    def filter_max_days_to_payout(self, queryset, name, value):
+        latest_date = timezone.now().date() + datetime.timedelta(days=int(value))
+        return queryset.filter(next_payout_date__lte=latest_date)
@@ -0,0 +1,121 @@
+"""
+Cloudinary uploads of Group Admin KYC images.
+
+The three images of a submission upload at the same time, one thread each,
+before the GroupAdminKYC row is saved; CloudinaryField then only stores the
+results. Each upload is timed in the kyc_upload_seconds histogram.
+
+The uploader is chosen with KYC_UPLOADER. FakeKycUploader keeps uploads in
+memory, for development and tests.
+
+The images are private: reviewers see them through signed download URLs that
+expire, kept in a per-process cache until shortly before they do.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from cloudinary.utils import private_download_url
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+from core.instrumentation import track_outbound
+from core.metrics import metrics
+
+from .models import GroupAdminKYC
+
+IMAGE_FIELDS = ('ghana_card_front', 'ghana_card_back', 'live_photo')
+
+
+class CloudinaryKycUploader:
+    """Uploads with the folder, type and transformation declared on the model field."""
+
+    def upload(self, field, file):
+        options = {'type': field.type, 'resource_type': field.resource_type, **field.options}
+        if file.seekable():
+            file.seek(0)
+        return cloudinary.uploader.upload_resource(file, **options)
+
+
+class FakeKycUploader:
+    """In-process stand-in that accepts every image without calling Cloudinary."""
+
+    def __init__(self):
+        self.uploaded = []
+
+    def upload(self, field, file):
+        self.uploaded.append((field.name, file.name))
+        return CloudinaryResource(
+            public_id=f"{field.options.get('folder', 'kyc')}/fake-{len(self.uploaded)}",
+            type=field.type, resource_type=field.resource_type, version=1, format='jpg',
+        )
+
+
+_uploader = None
+
+
+def get_uploader():
+    global _uploader
+    if _uploader is None:
+        _uploader = import_string(settings.KYC_UPLOADER)()
+    return _uploader
+
+
+def _timed_upload(uploader, field, file):
+    started = time.perf_counter()
+    try:
+        return uploader.upload(field, file)
+    finally:
+        metrics.observe('kyc_upload_seconds', time.perf_counter() - started, {'field': field.name})
+
+
+def upload_images(files):
+    """
+    Uploads ``files`` ({field name: uploaded file}, empty values skipped)
+    concurrently. Returns {field name: CloudinaryResource} for assigning to a
+    GroupAdminKYC; raises the first upload error.
+    """
+    files = {name: file for name, file in files.items() if file}
+    if not files:
+        return {}
+    uploader = get_uploader()
+    fields = {name: GroupAdminKYC._meta.get_field(name) for name in files}
+
+    # The request waits on the slowest upload: recorded as one outbound call
+    with track_outbound('cloudinary'), ThreadPoolExecutor(max_workers=len(files)) as pool:
+        futures = {
+            name: pool.submit(_timed_upload, uploader, fields[name], file)
+            for name, file in files.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+# Signing is local, so a shared cache would cost more than it saves
+_signed_urls = LocMemCache('kyc-signed-urls', {'OPTIONS': {'MAX_ENTRIES': 5000}})
+
+
+def signed_url(image):
+    """
+    Signed download URL for a stored private KYC image, or None. It expires
+    KYC_SIGNED_URL_SECONDS after signing and is cached per image version until
+    KYC_SIGNED_URL_MARGIN seconds before that.
+    """
+    if not image:
+        return None
+    key = f'{image.public_id}:{image.version}'
+    url = _signed_urls.get(key)
+    if url is None:
+        # Signed delivery URLs (sign_url=True) never expire; download API URLs
+        # carry expires_at. The API serves the current version of the image.
+        expires_at = int(time.time()) + settings.KYC_SIGNED_URL_SECONDS
+        try:
+            url = private_download_url(
+                image.public_id, image.format or 'jpg',
+                type='private', resource_type=image.resource_type or 'image', expires_at=expires_at,
+            )
+        except Exception:
+            return None
+        _signed_urls.set(key, url, timeout=expires_at - settings.KYC_SIGNED_URL_MARGIN - time.time())
+    return url
@@ -0,0 +1,137 @@
+"""
+Pooled email sending for notification tasks.
+
+send_mail() opens a new SMTP connection (and TLS handshake) for every message.
+The mailer keeps one connection per worker process open between tasks, sends
+messages over it in batches, and reconnects when the server drops it.
+"""
+import logging
+import smtplib
+import socket
+import threading
+import time
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+class NotificationMailer:
+    def __init__(self, batch_size=50, max_idle_seconds=60):
+        self.batch_size = batch_size
+        # Close connections the server is likely to have timed out already
+        self.max_idle_seconds = max_idle_seconds
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+        self.messages_sent = 0
+        self.connections_opened = 0
+        self.connection_reuses = 0
+        self.send_seconds = 0.0
+
+    def _get_connection(self):
+        if self._connection is not None and time.monotonic() - self._last_used > self.max_idle_seconds:
+            self._close()
+        if self._connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._connection = connection
+            self.connections_opened += 1
+            metrics.inc('email_connections_opened_total')
+        else:
+            self.connection_reuses += 1
+            metrics.inc('email_connection_reuses_total')
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _send_batch(self, messages):
+        """
+        Sends messages one by one over the shared connection. If the server
+        drops it, only the message that failed is sent again over a new one:
+        those before it were accepted and would otherwise go out twice.
+        """
+        connection = self._get_connection()
+        sent = 0
+        started = time.perf_counter()
+        try:
+            for message in messages:
+                try:
+                    sent += connection.send_messages([message]) or 0
+                except RECONNECT_ERRORS as e:
+                    self._close()
+                    logger.warning(f"SMTP connection dropped, reconnecting: {e}")
+                    metrics.inc('email_reconnects_total')
+                    connection = self._get_connection()
+                    try:
+                        sent += connection.send_messages([message]) or 0
+                    except RECONNECT_ERRORS:
+                        self._close()
+                        raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._last_used = time.monotonic()
+            self.messages_sent += sent
+            self.send_seconds += elapsed
+            metrics.inc('email_messages_sent_total', amount=sent)
+            metrics.inc('email_send_seconds_total', amount=elapsed)
+        return sent
+
+    def send_many(self, messages):
+        """Sends messages over the shared connection in batches. Returns how many were sent."""
+        sent = 0
+        with self._lock:
+            for start in range(0, len(messages), self.batch_size):
+                sent += self._send_batch(messages[start:start + self.batch_size])
+        return sent
+
+    def send(self, message):
+        return self.send_many([message]) == 1
+
+    def stats(self):
+        return {
+            'messages_sent': self.messages_sent,
+            'connections_opened': self.connections_opened,
+            'connection_reuses': self.connection_reuses,
+            'messages_per_second': self.messages_sent / self.send_seconds if self.send_seconds else 0.0,
+        }
+
+
+def build_email(subject, text, recipient, html=None):
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+    if html:
+        message.attach_alternative(html, 'text/html')
+    return message
+
+
+mailer = NotificationMailer()
+
+
+@worker_process_shutdown.connect
+def close_mailer_connection(**kwargs):
+    stats = mailer.stats()
+    if stats['messages_sent']:
+        logger.info(f"Mailer shutting down: {stats}")
+    mailer.close()
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+QUERY = 'SELECT 1'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request database overhead with a new connection per request, persistent "
+        "connections and the psycopg pool. Run it against the real (remote) database to include "
+        "TLS and auth handshakes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=3, help="Queries per simulated request.")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        base = connections[options['database']].settings_dict
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("Connection pooling needs PostgreSQL.")
+        options_without_pool = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+
+        variants = {
+            'new connection': {**base, 'OPTIONS': options_without_pool, 'CONN_MAX_AGE': 0},
+            'persistent': {
+                **base, 'OPTIONS': options_without_pool, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True,
+            },
+            'pooled': {
+                **base, 'CONN_MAX_AGE': 0,
+                'OPTIONS': {**options_without_pool, 'pool': base['OPTIONS'].get('pool') or True},
+            },
+        }
+
+        baseline = None
+        for label, settings_dict in variants.items():
+            latencies = self._run(settings_dict, options['requests'], options['queries'])
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            baseline = baseline or p50
+            self.stdout.write(
+                f"{label:<15} p50 {p50:7.2f}ms  p95 {p95:7.2f}ms  saving per request {baseline - p50:7.2f}ms"
+            )
+
+    def _run(self, settings_dict, requests, queries):
+        # A private connection, so the variants don't share state with each other or with 'default'
+        connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias='bench-connections')
+        latencies = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # What request_started / request_finished do around every request
+                connection.close_if_unusable_or_obsolete()
+                for _ in range(queries):
+                    with connection.cursor() as cursor:
+                        cursor.execute(QUERY)
+                        cursor.fetchone()
+                connection.close_if_unusable_or_obsolete()
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+            if connection.pool:
+                connection.close_pool()
+        return sorted(latencies)
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from accounts.disbursements import FakeDisbursementProvider, Transfer
+
+
+class Command(BaseCommand):
+    help = "Measures disbursement throughput per batch size against the fake provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payouts', type=int, default=5000)
+        parser.add_argument('--batch-sizes', default='1,10,50,100')
+        parser.add_argument('--latency', type=float, default=0.2,
+                            help="Simulated provider round-trip per call, in seconds.")
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        transfers = [
+            Transfer(
+                reference=f'bench-{i}',
+                amount=Decimal('500.00'),
+                momo_number=f'23324{i:07d}',
+                momo_provider='mtn',
+                recipient_name=f'Member {i}',
+                reason='Benchmark payout',
+            )
+            for i in range(options['payouts'])
+        ]
+
+        for batch_size in [int(size) for size in options['batch_sizes'].split(',')]:
+            provider = FakeDisbursementProvider()
+            provider.latency = options['latency']
+            batches = [transfers[i:i + batch_size] for i in range(0, len(transfers), batch_size)]
+
+            started = time.perf_counter()
+            asyncio.run(self._submit(provider, batches, options['concurrency']))
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"batch_size={batch_size:>4}  calls={len(batches):>5}  "
+                f"elapsed={elapsed:7.2f}s  throughput={len(transfers) / elapsed:9.1f} payouts/s"
+            )
+
+    async def _submit(self, provider, batches, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def submit(batch):
+            async with semaphore:
+                await provider.submit_batch(None, batch)
+
+        await asyncio.gather(*(submit(batch) for batch in batches))
@@ -0,0 +1,268 @@
+import contextlib
+import io
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import seeding
+from accounts.models import Contribution, GroupJoinRequest, GroupMembership, SavingsGroup, User
+from accounts.tasks import process_daily_payouts
+
+SCENARIOS = ('signup', 'login', 'dashboard', 'catalog_search', 'join', 'approve', 'contribute', 'payout_scan')
+
+# External services are replaced with local stand-ins; DB and cache are the real ones
+LOCAL_SERVICES = {
+    'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+    'SMS_PROVIDER': 'accounts.sms.FakeSmsProvider',
+    'REALTIME_BROKER': 'local',
+    'RATELIMIT_ENABLE': False,
+    'AXES_ENABLED': False,
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def dawurobo_stub(*args, **kwargs):
+    return mock.Mock(status_code=200, text='success', json=lambda: {'status': 'success'})
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the main endpoints and the payout scan against a seeded dataset in the test database. "
+        "Reports p50/p95/p99 latency, throughput and query counts, and saves them as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contributions', default='10k', help="Dataset size: 10k, 1M, 10M...")
+        parser.add_argument('--iterations', type=int, default=200, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--scan-iterations', type=int, default=3, help="Timed runs of the payout scan.")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Keep the test database, and reuse its dataset on the next run with the same size."
+        )
+        parser.add_argument('--output', help="JSON results file; defaults to bench_results/<size>-<time>.json")
+        parser.add_argument('--compare', help="Earlier JSON results to print deltas against.")
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        target = seeding.parse_count(options['contributions'])
+
+        # Never seed millions of rows into the configured database
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False
+        )
+        try:
+            with override_settings(**LOCAL_SERVICES), \
+                    mock.patch('accounts.otp._post', side_effect=dawurobo_stub):
+                dataset = self._dataset(target, options['seed'])
+                self.rng = random.Random(options['seed'])
+                self.password_hash = make_password(seeding.BENCH_PASSWORD)
+                results = {}
+                for name in scenarios:
+                    iterations = options['scan_iterations'] if name == 'payout_scan' else options['iterations']
+                    warmup = 1 if name == 'payout_scan' else options['warmup']
+                    results[name] = self._run(name, iterations, warmup)
+                    self._print(name, results[name])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'bench_results' / (
+            f"{options['contributions']}-{timezone.now():%Y%m%d-%H%M%S}.json"
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Saved {output}")
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()), report)
+
+    def _dataset(self, target, seed):
+        existing = Contribution.objects.count()
+        if existing and existing < target * 0.9:
+            raise CommandError(
+                f"The kept test database holds {existing} contributions; run once without --keepdb to reseed."
+            )
+        if not existing:
+            started = time.perf_counter()
+            seeding.generate(target, seed=seed, log=lambda line: self.stdout.write(f"  seeding: {line}"))
+            self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+        # Started groups only: members of recruiting groups can't contribute yet
+        self.group_ids = list(
+            SavingsGroup.objects.filter(group_name__startswith='Bench group', start_date__isnull=False)
+            .values_list('id', flat=True)
+        )
+        self.user_ids = list(User.objects.filter(username__startswith='bench').values_list('id', flat=True))
+        return {
+            'users': User.objects.count(),
+            'groups': SavingsGroup.objects.count(),
+            'contributions': Contribution.objects.count(),
+        }
+
+    def _run(self, name, iterations, warmup):
+        scenario = getattr(self, f'_{name}')
+        samples = []
+        errors = 0
+        for iteration in range(warmup + iterations):
+            # Each iteration is rolled back, so every run sees the same dataset.
+            # Tasks print progress lines, which would bury the report.
+            with transaction.atomic(), contextlib.redirect_stdout(io.StringIO()):
+                elapsed, queries, status_code = scenario(iteration)
+                transaction.set_rollback(True)
+            if iteration < warmup:
+                continue
+            samples.append((elapsed, queries))
+            if status_code >= 400:
+                errors += 1
+
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        query_counts = [queries for _, queries in samples]
+        return {
+            'iterations': len(samples),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'throughput_per_s': round(len(latencies) / sum(latencies), 1),
+            'queries_mean': round(statistics.mean(query_counts), 1),
+            'queries_max': max(query_counts),
+        }
+
+    def _print(self, name, result):
+        self.stdout.write(
+            f"{name:<15} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+            f"p99 {result['p99_ms']:8.1f}ms  {result['throughput_per_s']:8.1f}/s  "
+            f"queries {result['queries_mean']:6.1f} (max {result['queries_max']})  errors {result['errors']}"
+        )
+
+    def _compare(self, previous, current):
+        self.stdout.write(f"Compared with the run of {previous['started_at']} ({previous['dataset']}):")
+        for name, result in current['results'].items():
+            before = previous['results'].get(name)
+            if not before:
+                continue
+            deltas = '  '.join(
+                f"{key} {(result[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else f"{key} n/a"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s')
+            )
+            queries = result['queries_max'] - before['queries_max']
+            self.stdout.write(f"{name:<15} {deltas}  queries {queries:+d}")
+
+    # Scenarios: set up inside the iteration's transaction, then time one request
+
+    def _timed(self, send):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(captured), response.status_code
+
+    def _client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def _random_user(self):
+        return User.objects.get(id=self.rng.choice(self.user_ids))
+
+    def _outsider(self, iteration):
+        # Numbered past any seeded user
+        user_id, = seeding.create_users([8_000_000 + iteration], self.password_hash)
+        return User.objects.get(id=user_id)
+
+    def _signup(self, iteration):
+        data = {
+            'email': f'signup{iteration}@example.com',
+            'password': seeding.BENCH_PASSWORD,
+            'password2': seeding.BENCH_PASSWORD,
+            'full_name': 'Bench Signup',
+            'date_of_birth': '1995-05-05',
+            'user_type': 'worker',
+            'ghana_post_address': 'GA-123-4567',
+            'momo_provider': 'mtn',
+            'momo_number': seeding.phone_number(9_000_000 + iteration),
+            'momo_name': 'Bench Signup',
+        }
+        client = self._client()
+        return self._timed(lambda: client.post(reverse('signup'), data, format='multipart'))
+
+    def _login(self, iteration):
+        data = {'login_field': self._random_user().email, 'password': seeding.BENCH_PASSWORD}
+        client = self._client()
+        return self._timed(lambda: client.post(reverse('login'), data))
+
+    def _dashboard(self, iteration):
+        client = self._client(self._random_user())
+        return self._timed(lambda: client.get(reverse('dashboard')))
+
+    def _catalog_search(self, iteration):
+        params = {
+            'search': f'group {self.rng.randrange(100)}',
+            'frequency': self.rng.choice(('daily', 'weekly', 'monthly')),
+            'ordering': self.rng.choice(('contribution_amount', '-created_at', 'next_payout_date')),
+        }
+        client = self._client(self._random_user())
+        return self._timed(lambda: client.get(reverse('all-groups'), params))
+
+    def _join(self, iteration):
+        client = self._client(self._outsider(iteration))
+        url = reverse('group-request-join', kwargs={'group_id': self.rng.choice(self.group_ids)})
+        return self._timed(lambda: client.post(url))
+
+    def _approve(self, iteration):
+        group = SavingsGroup.objects.get(id=self.rng.choice(self.group_ids))
+        # Leave a seat open; rolled back with the iteration
+        SavingsGroup.objects.filter(id=group.id).update(expected_members=F('expected_members') + 1)
+        join_request = GroupJoinRequest.objects.create(user=self._outsider(iteration), group=group)
+        client = self._client(group.admin)
+        url = reverse('group-request-action', kwargs={'pk': join_request.id})
+        return self._timed(lambda: client.post(url, {'action': 'approve'}))
+
+    def _contribute(self, iteration):
+        group = SavingsGroup.objects.get(id=self.rng.choice(self.group_ids))
+        membership = (
+            GroupMembership.objects.filter(group=group)
+            .exclude(contributions__cycle_number=group.current_cycle_number)
+            .select_related('user')
+            .first()
+        )
+        client = self._client(membership.user if membership else group.admin)
+        url = reverse('group-contribute', kwargs={'group_id': group.id})
+        return self._timed(lambda: client.post(url))
+
+    def _payout_scan(self, iteration):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            process_daily_payouts()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(captured), 200
@@ -0,0 +1,108 @@
+import asyncio
+import statistics
+import time
+from unittest import mock
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from accounts import seeding
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class FakeDawurobo:
+    """Answers every OTP call after ``latency`` seconds and counts calls in flight."""
+
+    def __init__(self, latency, blocking):
+        self.latency = latency
+        self.blocking = blocking
+        self.in_flight = 0
+        self.peak = 0
+
+    async def post(self, path, payload, timeout):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.blocking:
+                # What a requests.post call does to the worker
+                time.sleep(self.latency)
+            else:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, text='success')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests POST /api/auth/otp/send/ in one process through the ASGI application, with Dawurobo "
+        "replaced by a stub that answers after --latency seconds. Compares a blocking provider call "
+        "(a sync worker: one request at a time) with the async client."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight at once.")
+        parser.add_argument('--latency', type=float, default=0.3, help="Simulated Dawurobo response time.")
+        parser.add_argument('--skip-blocking', action='store_true', help="Only run the async client.")
+
+    def handle(self, *args, **options):
+        application = get_asgi_application()
+        modes = [False] if options['skip_blocking'] else [True, False]
+        results = {}
+        with override_settings(RATELIMIT_ENABLE=False):
+            for blocking in modes:
+                label = 'blocking call' if blocking else 'async client'
+                provider = FakeDawurobo(options['latency'], blocking)
+                with mock.patch('accounts.otp._post', side_effect=provider.post):
+                    results[label] = asyncio.run(
+                        self._run(application, options['requests'], options['concurrency'])
+                    )
+                self._print(label, results[label], provider.peak)
+
+        if len(results) == 2:
+            gain = results['async client']['throughput'] / results['blocking call']['throughput']
+            self.stdout.write(self.style.SUCCESS(f"Async client: {gain:.1f}x the throughput of a blocking call"))
+
+    async def _run(self, application, requests, concurrency):
+        url = reverse('otp-send')
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def send(client, index):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, data={'phone_number': seeding.phone_number(index)})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver', timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(send(client, index) for index in range(requests)))
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'elapsed': elapsed,
+            'throughput': requests / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'errors': errors,
+        }
+
+    def _print(self, label, result, peak):
+        self.stdout.write(
+            f"{label:<14} {result['elapsed']:7.2f}s  {result['throughput']:8.1f} req/s  "
+            f"p50 {result['p50'] * 1000:8.1f}ms  p95 {result['p95'] * 1000:8.1f}ms  "
+            f"peak provider calls in flight {peak:4d}  errors {result['errors']}"
+        )
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from accounts.rendering import absolute_url, render_many, render_template
+
+TEMPLATE_NAME = 'emails/payout_notification.html'
+
+
+class Command(BaseCommand):
+    help = "Compares payout notification rendering throughput with and without the rendering caches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        recipients = [
+            {
+                'beneficiary_name': f'Member {i}',
+                'group_name': f'Group {i % 500}',
+                'cycle': i % 12 + 1,
+                'amount': f"₵{500 + i % 100:,.2f}",
+                'momo_number': f'+23324{i:07d}',
+                'group_id': i % 500 + 1,
+            }
+            for i in range(count)
+        ]
+
+        self._report('uncached', count, self._uncached, recipients)
+        self._report('cached', count, self._cached, recipients)
+        self._report('cached, render_many', count, self._cached_many, recipients)
+
+    def _report(self, label, count, func, recipients):
+        started = time.perf_counter()
+        func(recipients)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<22} {elapsed:7.2f}s  {count / elapsed:9.1f} emails/s")
+
+    # Each variant keeps its rendered bodies, as a fan-out would before sending
+    def _uncached(self, recipients):
+        rendered = []
+        for recipient in recipients:
+            current_site = Site.objects.get_current()
+            protocol = "http" if settings.DEBUG else "https"
+            reverse('group-detail', kwargs={'id': recipient['group_id']})
+            dashboard_url = f"{protocol}://{current_site.domain}{reverse('dashboard')}"
+            rendered.append(render_to_string(TEMPLATE_NAME, dict(recipient, dashboard_url=dashboard_url)))
+        return rendered
+
+    def _cached(self, recipients):
+        rendered = []
+        for recipient in recipients:
+            absolute_url('group-detail', id=recipient['group_id'])
+            rendered.append(render_template(TEMPLATE_NAME, dict(recipient, dashboard_url=absolute_url('dashboard'))))
+        return rendered
+
+    def _cached_many(self, recipients):
+        dashboard_url = absolute_url('dashboard')
+        for recipient in recipients:
+            absolute_url('group-detail', id=recipient['group_id'])
+        return render_many(TEMPLATE_NAME, [dict(recipient, dashboard_url=dashboard_url) for recipient in recipients])
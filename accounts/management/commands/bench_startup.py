@@ -0,0 +1,99 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+ROLES = ('web', 'worker')
+
+# Run in a fresh interpreter: set Django up and load what the role needs before its first request or task
+STARTUP = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+if os.environ['SNAPPX_ROLE'] == 'worker':
+    from core.celery import app
+    app.loader.import_default_modules()
+else:
+    from django.core.asgi import get_asgi_application
+    from django.urls import get_resolver
+    get_asgi_application()
+    get_resolver().url_patterns
+setup_seconds = time.perf_counter() - started
+# Peak RSS of this program. ru_maxrss would count the forked parent's memory too.
+try:
+    with open('/proc/self/status') as status:
+        rss_kib = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except OSError:
+    rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'setup_seconds': setup_seconds,
+    'rss_mib': rss_kib / 1024,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold start per SNAPPX_ROLE: interpreter start to ready, Django setup and app "
+        "imports, peak resident memory and modules loaded, each in a fresh process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--roles', default=','.join(ROLES))
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                            help="Also list the N slowest top-level imports per role.")
+
+    def handle(self, *args, **options):
+        roles = options['roles'].split(',')
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise CommandError(f"Unknown roles: {', '.join(sorted(unknown))}")
+
+        for role in roles:
+            runs = [self._start(role) for _ in range(options['repeat'])]
+            self.stdout.write(
+                f"{role:<7} total {statistics.median(r['total_seconds'] for r in runs) * 1000:7.0f}ms  "
+                f"setup {statistics.median(r['setup_seconds'] for r in runs) * 1000:7.0f}ms  "
+                f"rss {statistics.median(r['rss_mib'] for r in runs):6.1f}MiB  "
+                f"modules {runs[0]['modules']}"
+            )
+            if options['importtime']:
+                for micros, module in self._slowest_imports(role, options['importtime']):
+                    self.stdout.write(f"        {micros / 1000:7.1f}ms  {module}")
+
+    def _env(self, role):
+        return {**os.environ, 'SNAPPX_ROLE': role}
+
+    def _start(self, role):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP], env=self._env(role), capture_output=True, text=True
+        )
+        total = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(f"{role} failed to start:\n{result.stderr}")
+        # Settings may print before the result line
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        run['total_seconds'] = total
+        return run
+
+    def _slowest_imports(self, role, count):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP], env=self._env(role), capture_output=True, text=True
+        )
+        imports = []
+        for line in result.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, module = line.split('|')
+            if not module.startswith('  '):
+                imports.append((int(cumulative), module.strip()))
+        return sorted(imports, reverse=True)[:count]
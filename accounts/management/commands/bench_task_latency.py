@@ -0,0 +1,75 @@
+import statistics
+import time
+import uuid
+
+from celery import shared_task
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+# Benchmark-only tasks, kept out of production workers. Start the workers with
+# --include accounts.management.commands.bench_task_latency to run them.
+PROBE_ROUTE = {'queue': 'interactive', 'priority': 0}
+PAYOUT_JOB_ROUTE = {'queue': 'payouts', 'priority': 6}
+
+
+@shared_task
+def latency_probe(run_id, index, sent_at):
+    """Records how long the probe waited in the queue."""
+    cache.set(f'latency-probe:{run_id}:{index}', time.time() - sent_at, timeout=3600)
+
+
+@shared_task
+def simulated_payout_job(seconds):
+    """Stands in for a long payout task when building a backlog."""
+    time.sleep(seconds)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures interactive-task queueing latency while a payout backlog is being worked. "
+        "Needs the broker and workers started with --include accounts.management.commands.bench_task_latency; "
+        "compare routed queues with --single-queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backlog', type=int, default=500, help="Simulated payout jobs to enqueue first.")
+        parser.add_argument('--job-seconds', type=float, default=0.2)
+        parser.add_argument('--probes', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.1, help="Seconds between probes.")
+        parser.add_argument('--timeout', type=float, default=300)
+        parser.add_argument(
+            '--single-queue', action='store_true',
+            help="Send everything to the default queue, as before queues were split."
+        )
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        backlog_options = {'queue': 'default'} if options['single_queue'] else PAYOUT_JOB_ROUTE
+        probe_options = {'queue': 'default'} if options['single_queue'] else PROBE_ROUTE
+
+        for _ in range(options['backlog']):
+            simulated_payout_job.apply_async((options['job_seconds'],), **backlog_options)
+        self.stdout.write(f"Enqueued {options['backlog']} payout jobs of {options['job_seconds']}s")
+
+        for index in range(options['probes']):
+            latency_probe.apply_async((run_id, index, time.time()), **probe_options)
+            time.sleep(options['interval'])
+
+        keys = [f'latency-probe:{run_id}:{index}' for index in range(options['probes'])]
+        deadline = time.monotonic() + options['timeout']
+        results = {}
+        while len(results) < len(keys) and time.monotonic() < deadline:
+            results = cache.get_many(keys)
+            time.sleep(0.5)
+
+        if not results:
+            self.stderr.write("No probes completed; are workers consuming the interactive queue?")
+            return
+
+        latencies = sorted(results.values())
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"probes {len(latencies)}/{len(keys)}  "
+            f"p50 {statistics.median(latencies) * 1000:.0f}ms  "
+            f"p95 {p95 * 1000:.0f}ms  max {latencies[-1] * 1000:.0f}ms"
+        )
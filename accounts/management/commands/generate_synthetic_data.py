@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the configured database with synthetic users, groups, join requests and contributions "
+        "for load testing. Uses PostgreSQL COPY; the same --seed on an empty database gives the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contributions', default='1M', help="Contributions to generate: 10k, 1M, 10M...")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-groups', type=int, default=2000, help="Groups written per transaction.")
+        parser.add_argument(
+            '--bulk-create', action='store_true',
+            help="Write with bulk_create instead of COPY (always the case off PostgreSQL)."
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help="Do not ask for confirmation."
+        )
+
+    def handle(self, *args, **options):
+        target = seeding.parse_count(options['contributions'])
+        database = connection.settings_dict['NAME']
+        if options['interactive']:
+            answer = input(
+                f"This adds about {target:,} contributions and their users and groups to '{database}'.\n"
+                "Type 'yes' to continue: "
+            )
+            if answer != 'yes':
+                raise CommandError("Cancelled.")
+
+        started = time.perf_counter()
+        written = seeding.generate(
+            target,
+            seed=options['seed'],
+            chunk_groups=options['chunk_groups'],
+            copy=False if options['bulk_create'] else None,
+            log=lambda line: self.stdout.write(f"{time.perf_counter() - started:7.1f}s  {line}"),
+        )
+        elapsed = time.perf_counter() - started
+
+        rows = sum(written.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s): "
+            + ', '.join(f'{name} {count:,}' for name, count in written.items())
+        ))
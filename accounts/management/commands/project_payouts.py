@@ -0,0 +1,52 @@
+import csv
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.projections import build_projection, load_active_schedules, store_projection
+
+
+class Command(BaseCommand):
+    help = "Projects daily payout counts and ₵ volume for active groups (MoMo float planning)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Number of days to project (default 90).")
+        parser.add_argument('--start', help="First projected day, YYYY-MM-DD (default today).")
+        parser.add_argument('--csv', dest='csv_path', help="Also write the projection to this CSV file.")
+        parser.add_argument('--no-store', action='store_true', help="Do not write the PayoutProjection table.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+
+        first_day = None
+        if options['start']:
+            try:
+                first_day = datetime.date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError("--start must be a date in YYYY-MM-DD format")
+
+        started = time.perf_counter()
+        schedules = load_active_schedules()
+        loaded = time.perf_counter()
+        projected_days = build_projection(first_day, options['days'], schedules=schedules)
+        computed = time.perf_counter()
+
+        if not options['no_store']:
+            store_projection(projected_days)
+
+        if options['csv_path']:
+            with open(options['csv_path'], 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(['day', 'payout_count', 'total_amount'])
+                for projected in projected_days:
+                    writer.writerow([projected.day.isoformat(), projected.payout_count, projected.total_amount])
+
+        total_amount = sum(projected.total_amount for projected in projected_days)
+        total_count = sum(projected.payout_count for projected in projected_days)
+        self.stdout.write(self.style.SUCCESS(
+            f"Projected {total_count} payouts worth ₵{total_amount:,.2f} over {options['days']} days "
+            f"for {len(schedules.intervals)} groups "
+            f"(load {loaded - started:.2f}s, compute {computed - loaded:.3f}s)"
+        ))
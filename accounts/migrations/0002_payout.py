@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 06:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle_number', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('notified', 'Beneficiary Notified'), ('disbursed', 'Disbursed')], db_index=True, default='pending', max_length=20)),
+                ('incomplete_alert_sent_at', models.DateTimeField(blank=True, help_text='When the group admin was told this cycle has missing contributions', null=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('disbursed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('beneficiary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='payouts_received', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payouts', to='accounts.savingsgroup')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('group', 'cycle_number')},
+            },
+        ),
+    ]
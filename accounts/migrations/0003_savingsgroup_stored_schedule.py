@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-19 06:26
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_schedule(apps, schema_editor):
+    SavingsGroup = apps.get_model('accounts', 'SavingsGroup')
+    today = timezone.now().date()
+
+    batch = []
+    for group in SavingsGroup.objects.filter(start_date__isnull=False).iterator(chunk_size=2000):
+        days_since_start = (today - group.start_date).days
+        cycle_length = group.payout_interval_days
+        group.current_cycle_number = (days_since_start // cycle_length) + 1
+        group.next_payout_date = today + datetime.timedelta(days=cycle_length - days_since_start % cycle_length)
+        batch.append(group)
+        if len(batch) >= 1000:
+            SavingsGroup.objects.bulk_update(batch, ['current_cycle_number', 'next_payout_date'])
+            batch = []
+    if batch:
+        SavingsGroup.objects.bulk_update(batch, ['current_cycle_number', 'next_payout_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_payout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savingsgroup',
+            name='current_cycle_number',
+            field=models.PositiveIntegerField(default=0, help_text='Cycle in progress (0 until the group starts)'),
+        ),
+        migrations.AddField(
+            model_name='savingsgroup',
+            name='next_payout_date',
+            field=models.DateField(blank=True, db_index=True, help_text='Date the next cycle starts and its payout is due', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgroup',
+            index=models.Index(fields=['status', 'next_payout_date'], name='group_status_next_payout_idx'),
+        ),
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-19 06:27
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_savingsgroup_stored_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savingsgroup',
+            index=models.Index(fields=['status', 'contribution_amount'], name='group_status_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgroup',
+            index=models.Index(models.F('status'), django.db.models.expressions.CombinedExpression(models.F('expected_members'), '-', models.F('current_members')), name='group_status_open_seats_idx'),
+        ),
+    ]
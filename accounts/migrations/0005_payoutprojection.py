@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_savingsgroup_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutProjection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('payout_count', models.PositiveIntegerField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('generated_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_stagedprofilepicture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payout',
+            name='submission_attempts',
+            field=models.PositiveIntegerField(default=0, help_text='How many times the payout was put in a batch; retries first check the provider'),
+        ),
+    ]
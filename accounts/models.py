@@ -57,6 +57,20 @@ class Profile(models.Model):
         return self.full_name
 
 
+class StagedProfilePicture(models.Model):
+    """
+    A profile picture received at signup, held until the process_profile_picture
+    task uploads it to Cloudinary and sets Profile.profile_picture.
+    """
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, related_name='staged_picture')
+    image = models.BinaryField()
+    file_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Staged picture for {self.profile}"
+
+
 def validate_image_extension(value):
     ext = os.path.splitext(value.name)[1].lower()
     valid_extensions = ['.jpg', '.jpeg', '.png']
@@ -93,6 +107,27 @@ class GroupAdminKYC(models.Model):
     verified_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='verified_kycs')
     created_at = models.DateTimeField(auto_now_add=True)
 
+class SavingsGroupQuerySet(models.QuerySet):
+    def due_for_rollover(self, today):
+        """Started groups whose stored schedule is behind ``today``."""
+        return self.filter(start_date__isnull=False).filter(
+            models.Q(next_payout_date__lte=today) | models.Q(next_payout_date__isnull=True)
+        )
+
+    def paying_out_on(self, day):
+        """
+        Groups whose new cycle (and so its payout) starts on ``day``.
+        Right after rollover their next payout is exactly one interval away,
+        so this is an index lookup on next_payout_date per interval.
+        """
+        condition = models.Q()
+        for interval in set(SavingsGroup.PAYOUT_INTERVALS.values()):
+            condition |= models.Q(
+                payout_interval_days=interval,
+                next_payout_date=day + datetime.timedelta(days=interval)
+            )
+        return self.filter(condition, start_date__lte=day)
+
 class SavingsGroup(models.Model):
     FREQUENCY_CHOICES = (
         ('daily', 'Daily'),
@@ -107,6 +142,14 @@ class SavingsGroup(models.Model):
         ('suspended', 'Suspended'),
     )
 
+    PAYOUT_INTERVALS = {
+        'daily': 1,
+        'weekly': 7,
+        'monthly': 30,
+    }
+
+    SCHEDULE_FIELDS = ['current_cycle_number', 'next_payout_date']
+
     start_date = models.DateField(
         null=True, blank=True,
         help_text="Date when the group officially starts contributing (set when activated)"
@@ -117,36 +160,49 @@ class SavingsGroup(models.Model):
         help_text="Computed from frequency: daily=1, weekly=7, monthly≈30"
     )
 
+    # Stored schedule, advanced by the roll_over_group_cycles task
+    current_cycle_number = models.PositiveIntegerField(
+        default=0,
+        help_text="Cycle in progress (0 until the group starts)"
+    )
+    next_payout_date = models.DateField(
+        null=True, blank=True, db_index=True,
+        help_text="Date the next cycle starts and its payout is due"
+    )
+
+    objects = SavingsGroupQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
-        if self.frequency == 'daily':
-            self.payout_interval_days = 1
-        elif self.frequency == 'weekly':
-            self.payout_interval_days = 7
-        elif self.frequency == 'monthly':
-            self.payout_interval_days = 30
-        super().save(*args, **kwargs)
+        self.payout_interval_days = self.PAYOUT_INTERVALS.get(self.frequency, self.payout_interval_days)
+        self.refresh_schedule()
 
-    @property
-    def total_pot_per_cycle(self):
-        return self.contribution_amount * self.expected_members
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_date', 'frequency'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'payout_interval_days', *self.SCHEDULE_FIELDS}
+        super().save(*args, **kwargs)
 
-    @property
-    def next_payout_date(self):
+    def refresh_schedule(self, today=None):
+        """Recomputes the stored cycle number and next payout date for ``today``."""
         if not self.start_date:
-            return None
-        today = timezone.now().date()
+            self.current_cycle_number = 0
+            self.next_payout_date = None
+            return
+
+        today = today or timezone.now().date()
         days_since_start = (today - self.start_date).days
         cycle_length = self.payout_interval_days
 
-        # Next payout is at the end of the current cycle
-        days_into_current_cycle = days_since_start % cycle_length
-        days_to_next_payout = cycle_length - days_into_current_cycle
+        self.current_cycle_number = (days_since_start // cycle_length) + 1
 
+        # Next payout is at the end of the current cycle.
         # If exactly on payout day, next one is in full cycle
-        if days_to_next_payout == 0:
-            days_to_next_payout = cycle_length
+        days_into_current_cycle = days_since_start % cycle_length
+        days_to_next_payout = cycle_length - days_into_current_cycle
+        self.next_payout_date = today + datetime.timedelta(days=days_to_next_payout)
 
-        return today + datetime.timedelta(days=days_to_next_payout)
+    @property
+    def total_pot_per_cycle(self):
+        return self.contribution_amount * self.expected_members
 
     @property
     def days_until_next_payout(self):
@@ -156,15 +212,6 @@ class SavingsGroup(models.Model):
         days_left = (self.next_payout_date - today).days
         return days_left if days_left > 0 else 0  # today = 0, not negative
 
-    @property
-    def current_cycle_number(self):
-        if not self.start_date:
-            return 0
-        # Use timezone.now() from django.utils
-        days_since_start = (timezone.now().date() - self.start_date).days
-        return (days_since_start // self.payout_interval_days) + 1
-
-
     name = models.CharField(max_length=255)
     admin = models.ForeignKey(User, on_delete=models.PROTECT, related_name='admin_of_groups')
     group_name = models.CharField(max_length=255, unique=True)
@@ -186,9 +233,20 @@ class SavingsGroup(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_payout_date'], name='group_status_next_payout_idx'),
+            # Catalog filters and ordering (AllGroupsListView)
+            models.Index(fields=['status', 'contribution_amount'], name='group_status_amount_idx'),
+            models.Index(
+                models.F('status'),
+                models.F('expected_members') - models.F('current_members'),
+                name='group_status_open_seats_idx'
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.group_name} by {self.admin.profile.full_name}"
+        # Only local fields: admin lists and logs format groups in bulk
+        return f"{self.group_name} (#{self.pk})"
 
     def clean(self):
         if self.current_members > self.expected_members:
@@ -299,3 +357,171 @@ class Contribution(models.Model):
 
     class Meta:
         unique_together = ('membership', 'cycle_number')
+
+class DisbursementBatch(models.Model):
+    """One bulk-transfer request sent to the MoMo disbursement provider."""
+    STATUS_CHOICES = (
+        ('submitting', 'Submitting'),
+        ('submitted', 'Submitted'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    provider = models.CharField(max_length=50)
+    provider_reference = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='submitting', db_index=True)
+    item_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.provider} batch {self.pk} ({self.status})"
+
+class Payout(models.Model):
+    """
+    Ledger of payouts, one row per group cycle.
+    The scheduler claims rows atomically so a cycle is only ever paid out once.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('notified', 'Beneficiary Notified'),
+        ('disbursed', 'Disbursed'),
+        ('failed', 'Disbursement Failed'),
+    )
+
+    group = models.ForeignKey(SavingsGroup, on_delete=models.PROTECT, related_name='payouts')
+    cycle_number = models.PositiveIntegerField()
+    beneficiary = models.ForeignKey(
+        User, null=True, blank=True,
+        on_delete=models.PROTECT,
+        related_name='payouts_received'
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    incomplete_alert_sent_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="When the group admin was told this cycle has missing contributions"
+    )
+    notified_at = models.DateTimeField(null=True, blank=True)
+    disbursed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Disbursement through the MoMo provider
+    batch = models.ForeignKey(
+        DisbursementBatch, null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='payouts'
+    )
+    submission_attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="How many times the payout was put in a batch; retries first check the provider"
+    )
+    failure_reason = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('group', 'cycle_number')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Payout for group {self.group_id} - Cycle {self.cycle_number} ({self.status})"
+
+    @property
+    def transfer_reference(self):
+        """Idempotency key sent to the provider, so a payout can never be transferred twice."""
+        return f"snappx-payout-{self.pk}"
+
+class PayoutProjection(models.Model):
+    """Projected payouts per day, written by the project_payouts command for MoMo float planning."""
+    day = models.DateField(unique=True)
+    payout_count = models.PositiveIntegerField()
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day}: {self.payout_count} payouts, ₵{self.total_amount:,.2f}"
+
+class Notification(models.Model):
+    """
+    Outbox of notifications to deliver. Rows are written once per event
+    (dedupe_key is unique) and delivered by the drain_notification_outbox task,
+    which retries failures with exponential backoff.
+    """
+    CHANNEL_CHOICES = (
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    )
+
+    KIND_CHOICES = (
+        ('join_request', 'New Join Request'),
+        ('join_response', 'Join Request Response'),
+        ('payout', 'Payout Notification'),
+        ('incomplete_contributions', 'Incomplete Contributions Alert'),
+    )
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default='email')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+
+    # Delivery record: who it went to and the provider's id for it
+    recipient = models.CharField(max_length=255, blank=True)
+    provider_reference = models.CharField(max_length=100, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} via {self.channel} ({self.status})"
+
+
+class UserNotification(models.Model):
+    """
+    In-app feed entry shown to a user, written by the same events that send
+    notification emails and SMS.
+    """
+    KIND_CHOICES = Notification.KIND_CHOICES
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    # Ids the client needs to deep link, e.g. {"group_id": 3}
+    data = models.JSONField(default=dict, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='feed_user_created_idx'),
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='feed_user_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} for {self.user.email}"
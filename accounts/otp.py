@@ -0,0 +1,122 @@
+"""
+Dawurobo OTP calls for the async auth views.
+
+Under ASGI, calls go through one httpx.AsyncClient per event loop, which keeps
+connections to Dawurobo open between requests. While a view awaits the provider
+the worker serves other requests, so one ASGI process can have hundreds of OTP
+calls in flight. core.asgi turns this on with keep_clients_open().
+
+Under WSGI every request runs on an event loop of its own, so each call opens a
+client and closes it when done.
+"""
+import asyncio
+import contextlib
+import logging
+import weakref
+
+import httpx
+from django.conf import settings
+
+from core.instrumentation import track_outbound
+
+logger = logging.getLogger(__name__)
+
+DAWUROBO_BASE = "https://devs.sms.api.dawurobo.com/v1/otp"
+
+# A client is bound to the loop it was created on
+_clients = weakref.WeakKeyDictionary()
+_keep_clients_open = False
+
+
+def keep_clients_open():
+    """Reuses one client per event loop; only for servers whose loop outlives a request."""
+    global _keep_clients_open
+    _keep_clients_open = True
+
+
+def _new_client():
+    return httpx.AsyncClient(
+        base_url=DAWUROBO_BASE,
+        headers={
+            "accept": "application/json",
+            "x-api-key": settings.DAWUROBO_API_KEY,
+            "x-access-token": settings.DAWUROBO_ACCESS_TOKEN,
+        },
+        limits=httpx.Limits(
+            max_connections=settings.DAWUROBO_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DAWUROBO_MAX_CONNECTIONS,
+        ),
+    )
+
+
+@contextlib.asynccontextmanager
+async def _client():
+    if not _keep_clients_open:
+        async with _new_client() as client:
+            yield client
+        return
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _new_client()
+    yield client
+
+
+async def _post(path, payload, timeout):
+    with track_outbound('dawurobo'):
+        async with _client() as client:
+            return await client.post(path, json=payload, timeout=timeout)
+
+
+def _clean_number(phone_number):
+    return phone_number.replace("+", "").replace(" ", "")
+
+
+async def send_otp(phone_number: str) -> dict:
+    """Asks Dawurobo to text a verification code to ``phone_number``."""
+    payload = {
+        "senderid": settings.DAWUROBO_SENDER_ID,
+        "number": _clean_number(phone_number),
+        "messagetemplate": "Your SnappX verification code is: %OTPCODE%. Expires in %EXPIRY% minutes.",
+        "expiry": 10,
+        "length": 6,
+        "type": "NUMERIC"
+    }
+
+    try:
+        response = await _post("/generate", payload, timeout=30)
+        # 409: a code is already pending for this number
+        if response.status_code in (200, 201, 409):
+            logger.info(f"OTP sent successfully to {phone_number}")
+            return {"success": True, "status_code": response.status_code}
+
+        response.raise_for_status()
+        return {"success": True}
+
+    except httpx.HTTPError as e:
+        logger.error(f"Dawurobo send error: {e}")
+        if isinstance(e, httpx.HTTPStatusError):
+            logger.error(f"Response: {e.response.text}")
+        return {"success": False, "error": str(e)}
+
+
+async def verify_and_invalidate_otp(phone_number: str, code: str) -> bool:
+    """Checks ``code`` and invalidates it straight away, so it can't be reused."""
+    clean_number = _clean_number(phone_number)
+
+    try:
+        verify_resp = await _post("/verify", {"otpcode": code.upper(), "number": clean_number}, timeout=10)
+        success = verify_resp.status_code == 200 and "success" in verify_resp.text.lower()
+
+        if success:
+            await _post("/invalidate", {"number": clean_number}, timeout=10)
+            logger.info(f"OTP verified and invalidated for {phone_number}")
+            return True
+        else:
+            logger.info(f"Invalid OTP attempt: {verify_resp.text}")
+            return False
+
+    except Exception as e:
+        logger.error(f"OTP verify/invalidate failed: {e}")
+        return False
@@ -0,0 +1,84 @@
+"""
+Durable notification outbox.
+
+Events write a Notification row with a dedupe key instead of sending straight
+away; writing the same event twice is a no-op. The drainer claims due rows in
+batches with SELECT ... FOR UPDATE SKIP LOCKED, so several drainers can run side
+by side, and failed deliveries are retried with exponential backoff.
+"""
+import datetime
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Notification
+
+
+def enqueue(kind, dedupe_key, payload, channel='email'):
+    """Adds a notification to the outbox. Returns False if it was already there."""
+    try:
+        with transaction.atomic():
+            Notification.objects.create(channel=channel, kind=kind, dedupe_key=dedupe_key, payload=payload)
+    except IntegrityError:
+        return False
+    return True
+
+
+def claim_due(batch_size=100, channel='email'):
+    """
+    Claims up to ``batch_size`` due notifications. Claimed rows are leased by
+    moving next_attempt_at forward, so rows held by a crashed drainer are
+    picked up again once the lease runs out.
+    """
+    now = timezone.now()
+    lease_until = now + datetime.timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(channel=channel, status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(next_attempt_at=lease_until)
+    return notifications
+
+
+def mark_sent(notification, recipient='', provider_reference=''):
+    Notification.objects.filter(pk=notification.pk).update(
+        status='sent',
+        sent_at=timezone.now(),
+        attempts=notification.attempts + 1,
+        last_error='',
+        recipient=recipient,
+        provider_reference=provider_reference,
+    )
+
+
+def defer(notifications, seconds):
+    """Pushes notifications back without counting an attempt, e.g. when rate limited."""
+    Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+        next_attempt_at=timezone.now() + datetime.timedelta(seconds=seconds)
+    )
+
+
+def mark_failed(notification, error, permanent=False):
+    """Schedules a retry with exponential backoff, or gives up after NOTIFICATION_MAX_ATTEMPTS."""
+    attempts = notification.attempts + 1
+    if permanent or attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        Notification.objects.filter(pk=notification.pk).update(
+            status='failed', attempts=attempts, last_error=str(error)
+        )
+        return
+
+    delay = min(
+        settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.NOTIFICATION_RETRY_MAX_SECONDS,
+    )
+    # Jitter keeps retries of a failed burst from all landing at once
+    delay *= random.uniform(0.8, 1.2)
+    Notification.objects.filter(pk=notification.pk).update(
+        attempts=attempts,
+        next_attempt_at=timezone.now() + datetime.timedelta(seconds=delay),
+        last_error=str(error),
+    )
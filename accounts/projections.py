@@ -0,0 +1,131 @@
+"""
+Vectorised payout calendar for capacity planning.
+
+Every active group pays out on start_date + k * payout_interval_days (k >= 0),
+so instead of walking groups one by one we load the schedule columns into
+NumPy arrays and build per-day counts and ₵ totals with a handful of array
+operations per distinct payout interval.
+"""
+import datetime
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PayoutProjection, SavingsGroup
+
+
+@dataclass
+class GroupSchedules:
+    start_days: np.ndarray   # start_date as proleptic ordinals
+    intervals: np.ndarray    # payout_interval_days
+    pots: np.ndarray         # payout per cycle in pesewas (amount * expected_members)
+
+
+@dataclass
+class ProjectedDay:
+    day: datetime.date
+    payout_count: int
+    total_amount: Decimal
+
+
+def load_active_schedules(chunk_size=50000):
+    """Streams active, started groups into typed arrays without building model instances."""
+    rows = SavingsGroup.objects.filter(
+        status='active',
+        start_date__isnull=False
+    ).values_list('start_date', 'payout_interval_days', 'contribution_amount', 'expected_members')
+
+    start_days, intervals, pots = array('q'), array('q'), array('q')
+    for start_date, interval, amount, members in rows.iterator(chunk_size=chunk_size):
+        start_days.append(start_date.toordinal())
+        intervals.append(interval)
+        pots.append(int(amount * 100) * members)
+
+    return GroupSchedules(
+        start_days=np.frombuffer(start_days, dtype=np.int64),
+        intervals=np.frombuffer(intervals, dtype=np.int64),
+        pots=np.frombuffer(pots, dtype=np.int64),
+    )
+
+
+def project_daily_payouts(schedules, first_day, days=90):
+    """
+    Returns ``(counts, totals)`` arrays of length ``days``; totals are in pesewas.
+
+    For each interval i, a group's payouts inside the window are its first
+    payout offset o (o < days) followed by o + i, o + 2i, ... . A histogram of
+    first offsets, folded into rows of width i and summed down the columns,
+    gives the per-day totals without materialising one entry per payout.
+    """
+    day0 = first_day.toordinal()
+    counts = np.zeros(days, dtype=np.int64)
+    totals = np.zeros(days, dtype=np.int64)
+
+    for interval in np.unique(schedules.intervals):
+        if interval <= 0:
+            continue
+        mask = schedules.intervals == interval
+        start_offsets = schedules.start_days[mask] - day0
+        pots = schedules.pots[mask]
+
+        # First payout on or after first_day
+        first_offsets = np.where(start_offsets >= 0, start_offsets, start_offsets % interval)
+        in_window = first_offsets < days
+        first_offsets = first_offsets[in_window]
+
+        first_counts = np.bincount(first_offsets, minlength=days)
+        # Summed in integer pesewas: bincount's weights would go through float64
+        first_totals = np.zeros(days, dtype=np.int64)
+        np.add.at(first_totals, first_offsets, pots[in_window])
+
+        counts += _repeat_every(first_counts, interval, days)
+        totals += _repeat_every(first_totals, interval, days)
+
+    return counts, totals
+
+
+def _repeat_every(first, interval, days):
+    """out[d] = first[d] + first[d - interval] + first[d - 2 * interval] + ..."""
+    rows = -(-days // interval)
+    padded = np.zeros(rows * interval, dtype=np.int64)
+    padded[:days] = first
+    return padded.reshape(rows, interval).cumsum(axis=0).ravel()[:days]
+
+
+def build_projection(first_day=None, days=90, schedules=None):
+    first_day = first_day or timezone.now().date()
+    if schedules is None:
+        schedules = load_active_schedules()
+    counts, totals = project_daily_payouts(schedules, first_day, days)
+    return [
+        ProjectedDay(
+            day=first_day + datetime.timedelta(days=offset),
+            payout_count=int(counts[offset]),
+            total_amount=Decimal(int(totals[offset])).scaleb(-2),
+        )
+        for offset in range(days)
+    ]
+
+
+@transaction.atomic
+def store_projection(projected_days):
+    """Upserts the projection into the PayoutProjection reporting table."""
+    generated_at = timezone.now()
+    PayoutProjection.objects.bulk_create(
+        [
+            PayoutProjection(
+                day=projected.day,
+                payout_count=projected.payout_count,
+                total_amount=projected.total_amount,
+                generated_at=generated_at,
+            )
+            for projected in projected_days
+        ],
+        update_conflicts=True,
+        unique_fields=['day'],
+        update_fields=['payout_count', 'total_amount', 'generated_at'],
+    )
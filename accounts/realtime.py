@@ -0,0 +1,216 @@
+"""
+Real-time events pushed to connected clients.
+
+View and task code calls publish() after its transaction commits. Events go to
+a Redis channel per user; every ASGI process holds one pub/sub connection,
+subscribed to the users connected to it, and fans each message out to that
+user's open streams. If the connection drops, it is reopened and subscribed
+again to every user with an open stream.
+
+REALTIME_BROKER='local' replaces Redis with an in-process broker, for
+development and tests with a single process.
+
+EventSource can't send an Authorization header, so a client first trades its
+access token for a stream ticket: a random string kept in the cache for
+REALTIME_TICKET_SECONDS that opens one stream. Only the ticket ever appears in
+a URL, and so in access logs.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import secrets
+import threading
+from collections import defaultdict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'snappx:events:'
+
+
+def _channel(user_id):
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+def _ticket_key(ticket):
+    return f'stream-ticket:{ticket}'
+
+
+def issue_stream_ticket(user_id):
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user_id, timeout=settings.REALTIME_TICKET_SECONDS)
+    return ticket
+
+
+async def redeem_stream_ticket(ticket):
+    """Returns the ticket's user id, or None if it expired or was already used."""
+    key = _ticket_key(ticket)
+    user_id = await cache.aget(key)
+    # Of two concurrent redemptions only one deletes the key
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
+
+
+def _offer(queue, message):
+    # A stream that stopped reading loses events rather than growing without bound
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning("Dropping real-time event for a slow stream")
+
+
+class LocalBroker:
+    """In-process fan-out: one asyncio queue per open stream."""
+
+    def __init__(self):
+        self._listeners = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        self._dispatch(user_id, message)
+
+    def _dispatch(self, user_id, message):
+        with self._lock:
+            listeners = list(self._listeners.get(user_id, ()))
+        for loop, queue in listeners:
+            # publish() may be called from a sync thread
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+    async def _on_first_listener(self, user_id):
+        pass
+
+    async def _on_last_listener(self, user_id):
+        pass
+
+    @contextlib.asynccontextmanager
+    async def subscription(self, user_id):
+        """Queue receiving the user's messages while the context is open."""
+        listener = (asyncio.get_running_loop(), asyncio.Queue(maxsize=settings.REALTIME_STREAM_BUFFER))
+        with self._lock:
+            first = not self._listeners[user_id]
+            self._listeners[user_id].add(listener)
+        try:
+            if first:
+                await self._on_first_listener(user_id)
+            yield listener[1]
+        finally:
+            with self._lock:
+                self._listeners[user_id].discard(listener)
+                last = not self._listeners[user_id]
+                if last:
+                    del self._listeners[user_id]
+            if last:
+                await self._on_last_listener(user_id)
+
+
+class RedisBroker(LocalBroker):
+    """Fans out Redis pub/sub messages over a single connection per process."""
+    reconnect_delay = 1
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._publisher = redis.Redis.from_url(url)
+        self._client = None
+        self._pubsub = None
+        self._reader = None
+        # Serializes (re)connecting, subscribing and unsubscribing
+        self._reader_lock = None
+
+    def publish(self, user_id, message):
+        self._publisher.publish(_channel(user_id), message)
+
+    def _subscription_lock(self):
+        if self._reader_lock is None:
+            self._reader_lock = asyncio.Lock()
+        return self._reader_lock
+
+    async def _connect(self):
+        """Opens a pub/sub connection subscribed to every user with an open stream."""
+        if self._client is not None:
+            with contextlib.suppress(Exception):
+                await self._pubsub.aclose()
+                await self._client.aclose()
+            self._client = self._pubsub = None
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        with self._lock:
+            channels = [_channel(user_id) for user_id in self._listeners]
+        # listen() needs at least one subscription before it starts reading
+        await pubsub.subscribe(f'{CHANNEL_PREFIX}ping', *channels)
+        self._client, self._pubsub = client, pubsub
+
+    async def _read(self):
+        """Reads and dispatches messages, reconnecting whenever the connection drops."""
+        while True:
+            try:
+                async with self._subscription_lock():
+                    await self._connect()
+                async for item in self._pubsub.listen():
+                    if item['type'] != 'message':
+                        continue
+                    user_id = int(item['channel'].decode()[len(CHANNEL_PREFIX):])
+                    self._dispatch(user_id, item['data'].decode())
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Real-time pub/sub connection lost, reconnecting: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _on_first_listener(self, user_id):
+        async with self._subscription_lock():
+            if self._reader is None or self._reader.done():
+                # Connects and subscribes to the listener registry, this user included
+                self._reader = asyncio.create_task(self._read())
+                return
+            if self._pubsub is None:
+                # Reconnecting; the new connection subscribes to the user
+                return
+            try:
+                await self._pubsub.subscribe(_channel(user_id))
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Could not subscribe to events for user {user_id}, left to the reconnect: {e}")
+
+    async def _on_last_listener(self, user_id):
+        async with self._subscription_lock():
+            with self._lock:
+                if self._listeners.get(user_id):
+                    # A stream for the user opened while this one closed
+                    return
+            if self._pubsub is not None:
+                with contextlib.suppress(redis.RedisError, OSError):
+                    await self._pubsub.unsubscribe(_channel(user_id))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        if settings.REALTIME_BROKER == 'local':
+            _broker = LocalBroker()
+        else:
+            _broker = RedisBroker(settings.REALTIME_REDIS_URL)
+    return _broker
+
+
+def publish(user_ids, event, data):
+    """Pushes an event to each user's open streams once the current transaction commits."""
+    message = json.dumps({'event': event, 'data': data}, default=str)
+
+    def send():
+        broker = get_broker()
+        for user_id in set(user_ids):
+            try:
+                broker.publish(user_id, message)
+            except redis.RedisError as e:
+                # Clients fall back to fetching on reconnect; never fail the request
+                logger.warning(f"Could not publish '{event}' to user {user_id}: {e}")
+
+    transaction.on_commit(send)
@@ -0,0 +1,60 @@
+"""
+Per-process caches for rendering notification emails.
+
+Every notification needs the site's base URL, a reversed deep link and a
+template. These rarely change, so they are resolved once per process:
+  - the base URL from the Sites framework, cleared when a Site is saved
+  - each URL pattern as a format string, e.g. ``https://snappx.app/api/accounts/groups/{id}/``
+  - each compiled template
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import get_template
+from django.urls import reverse
+
+
+@functools.lru_cache(maxsize=None)
+def site_base_url():
+    protocol = "http" if settings.DEBUG else "https"
+    return f"{protocol}://{Site.objects.get_current().domain}"
+
+
+@functools.lru_cache(maxsize=None)
+def _url_pattern(viewname, kwarg_names):
+    # Reverse once with numeric placeholders (accepted by int and str converters),
+    # then swap them for format fields
+    placeholders = {name: str(10 ** 17 + position) for position, name in enumerate(kwarg_names)}
+    path = reverse(viewname, kwargs=placeholders)
+    for name, placeholder in placeholders.items():
+        path = path.replace(placeholder, '{' + name + '}')
+    return site_base_url() + path
+
+
+def absolute_url(viewname, **kwargs):
+    """Absolute URL for ``viewname``; raises NoReverseMatch like reverse()."""
+    return _url_pattern(viewname, tuple(sorted(kwargs))).format(**kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_template(template_name):
+    return get_template(template_name)
+
+
+def render_template(template_name, context):
+    return compiled_template(template_name).render(context)
+
+
+def render_many(template_name, contexts):
+    """Renders one compiled template for many recipients."""
+    template = compiled_template(template_name)
+    return [template.render(context) for context in contexts]
+
+
+@receiver([post_save, post_delete], sender=Site)
+def clear_url_caches(**kwargs):
+    site_base_url.cache_clear()
+    _url_pattern.cache_clear()
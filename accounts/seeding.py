@@ -0,0 +1,303 @@
+"""
+Synthetic datasets for benchmarks and load tests.
+
+A DatasetProfile describes the shape of the data: group sizes, the
+daily/weekly/monthly mix, how long groups have been running, how reliably
+members pay and how many join requests are rejected or left pending.
+
+generate() builds rows a chunk of groups at a time, with primary keys assigned
+up front so the same seed always produces the same rows, and writes each table
+with PostgreSQL COPY (bulk_create on other databases). Sequences are reset at
+the end. Nothing else should write to these tables while it runs.
+"""
+import datetime
+import random
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Contribution, GroupJoinRequest, GroupMembership, PayoutOrder, Profile, SavingsGroup, User
+
+# Every generated user can log in with this password
+BENCH_PASSWORD = 'Bench-pass-123'
+
+# In foreign key order
+MODELS = [User, Profile, SavingsGroup, GroupMembership, PayoutOrder, GroupJoinRequest, Contribution]
+
+
+@dataclass(frozen=True)
+class DatasetProfile:
+    # Values are relative weights
+    group_sizes: dict = field(default_factory=lambda: {5: 25, 8: 20, 10: 25, 12: 15, 15: 10, 20: 5})
+    frequencies: dict = field(default_factory=lambda: {'daily': 15, 'weekly': 55, 'monthly': 30})
+    amounts: dict = field(default_factory=lambda: {
+        'daily': ['5.00', '10.00', '20.00'],
+        'weekly': ['20.00', '50.00', '100.00'],
+        'monthly': ['100.00', '200.00', '500.00', '1000.00'],
+    })
+    # Cycles run so far, exponentially distributed: most groups are young
+    mean_cycles: float = 6
+    max_cycles: int = 52
+    # Groups still recruiting: open seats, not started, no contributions
+    filling_share: float = 0.1
+    # Seats taken by someone already in another group
+    returning_member_share: float = 0.45
+    # Beta distribution of a member's chance to pay any given cycle
+    reliability: tuple = (8, 1.5)
+    unverified_share: float = 0.03
+    rejected_requests_per_seat: float = 0.3
+    pending_requests_per_open_seat: float = 1.5
+
+
+REALISTIC = DatasetProfile()
+
+
+def parse_count(value):
+    """Accepts 10000, 10k, 1M or 10M."""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip().lower()
+    if value[-1:] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def phone_number(index):
+    return f'+23320{index:07d}'
+
+
+def generate(contributions, seed=0, profile=REALISTIC, chunk_groups=2000, copy=None, log=print):
+    """Adds groups until about ``contributions`` contributions exist; returns the rows written per table."""
+    if copy is None:
+        copy = connection.vendor == 'postgresql'
+    generator = Generator(profile, seed, copy)
+    while generator.written[Contribution] < contributions:
+        with transaction.atomic():
+            generator.write_chunk(chunk_groups, contributions - generator.written[Contribution])
+        log(', '.join(f'{model.__name__} {count}' for model, count in generator.written.items()))
+    generator.reset_sequences()
+    return {model.__name__: count for model, count in generator.written.items()}
+
+
+def create_users(indexes, password):
+    """Bulk-creates verified users with profiles; ``password`` is already hashed."""
+    users = User.objects.bulk_create([
+        User(
+            username=f'bench{index}', email=f'bench{index}@example.com', phone_number=phone_number(index),
+            password=password, is_verified=True,
+        )
+        for index in indexes
+    ])
+    Profile.objects.bulk_create([
+        Profile(
+            user=user, full_name=f'Bench Member {index}', date_of_birth=datetime.date(1990, 1, 1),
+            user_type='worker', ghana_post_address='GA-123-4567', momo_provider='mtn',
+            momo_number=phone_number(index), momo_name=f'Bench Member {index}',
+        )
+        for index, user in zip(indexes, users)
+    ])
+    return [user.pk for user in users]
+
+
+class Table:
+    """Column layout of a model, for building rows without model instances."""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = model._meta.concrete_fields
+        self.attnames = [f.attname for f in self.fields]
+        self.positions = {name: position for position, name in enumerate(self.attnames)}
+        self.defaults = [f.get_default() for f in self.fields]
+
+    def row(self, values):
+        row = self.defaults.copy()
+        for name, value in values.items():
+            row[self.positions[name]] = value
+        return row
+
+
+class Generator:
+    """Builds and writes chunks of groups with their members, requests and contributions."""
+
+    def __init__(self, profile, seed, copy):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.copy = copy
+        self.today = timezone.now().date()
+        self.now = timezone.now()
+        self.password = make_password(BENCH_PASSWORD)
+        self.tables = {model: Table(model) for model in MODELS}
+        self.next_id = {model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1 for model in MODELS}
+        self.written = {model: 0 for model in MODELS}
+        self.user_ids = []
+
+        self.sizes, self.size_weights = zip(*profile.group_sizes.items())
+        self.frequencies, self.frequency_weights = zip(*profile.frequencies.items())
+        self.amounts = {
+            frequency: [Decimal(amount) for amount in amounts] for frequency, amounts in profile.amounts.items()
+        }
+
+    def _add(self, rows, model, **values):
+        """Appends a row for ``model`` with the next primary key; returns the key."""
+        pk = self.next_id[model]
+        self.next_id[model] += 1
+        rows[model].append(self.tables[model].row(dict(values, id=pk)))
+        return pk
+
+    def _at(self, day, spread_days=1):
+        """A random moment during the ``spread_days`` from ``day``."""
+        moment = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+        return moment + datetime.timedelta(minutes=self.rng.randrange(spread_days * 24 * 60))
+
+    def write_chunk(self, group_count, contributions):
+        """Writes up to ``group_count`` groups, stopping early once ``contributions`` are reached."""
+        rows = {model: [] for model in MODELS}
+        for _ in range(group_count):
+            self._group(rows)
+            if len(rows[Contribution]) >= contributions:
+                break
+        for model in MODELS:
+            self._write(model, rows[model])
+            self.written[model] += len(rows[model])
+
+    def _member(self, rows, taken, joined):
+        """A user for one seat or request: someone from another group, or a new sign-up."""
+        if self.user_ids and self.rng.random() < self.profile.returning_member_share:
+            for _ in range(5):
+                user_id = self.rng.choice(self.user_ids)
+                if user_id not in taken:
+                    taken.add(user_id)
+                    return user_id
+
+        index = self.next_id[User]
+        user_id = self._add(
+            rows, User, username=f'bench{index}', email=f'bench{index}@example.com',
+            phone_number=phone_number(index), password=self.password, is_verified=True,
+            date_joined=self._at(joined - datetime.timedelta(days=30), 30),
+        )
+        self._add(
+            rows, Profile, user_id=user_id, full_name=f'Bench Member {index}',
+            date_of_birth=datetime.date(1990, 1, 1), user_type='worker', ghana_post_address='GA-123-4567',
+            momo_provider='mtn', momo_number=phone_number(index), momo_name=f'Bench Member {index}',
+        )
+        self.user_ids.append(user_id)
+        taken.add(user_id)
+        return user_id
+
+    def _group(self, rows):
+        profile = self.profile
+        rng = self.rng
+        size = rng.choices(self.sizes, self.size_weights)[0]
+        frequency = rng.choices(self.frequencies, self.frequency_weights)[0]
+        interval = SavingsGroup.PAYOUT_INTERVALS[frequency]
+        filling = rng.random() < profile.filling_share
+
+        if filling:
+            start_date = None
+            created = self.today - datetime.timedelta(days=rng.randrange(30))
+            member_count = rng.randrange(1, size)
+        else:
+            cycles = min(profile.max_cycles, 1 + int(rng.expovariate(1 / profile.mean_cycles)))
+            start_date = self.today - datetime.timedelta(days=(cycles - 1) * interval + rng.randrange(interval))
+            created = start_date - datetime.timedelta(days=rng.randrange(1, 21))
+            member_count = size
+
+        # The stored schedule is normally filled in by save()
+        schedule = SavingsGroup(start_date=start_date, payout_interval_days=interval)
+        schedule.refresh_schedule(self.today)
+        current_cycle = schedule.current_cycle_number
+
+        taken = set()
+        member_ids = [self._member(rows, taken, created) for _ in range(member_count)]
+        admin_id = member_ids[0]
+        amount = rng.choice(self.amounts[frequency])
+        group_id = self.next_id[SavingsGroup]
+        self._add(
+            rows, SavingsGroup,
+            group_name=f'Bench group {group_id}',
+            description=f'{frequency.title()} savings group of {size}',
+            admin_id=admin_id,
+            contribution_amount=amount,
+            frequency=frequency,
+            payout_timeline_days=interval,
+            payout_interval_days=interval,
+            expected_members=size,
+            current_members=member_count,
+            status='active',
+            is_public=rng.random() < 0.7,
+            start_date=start_date,
+            current_cycle_number=current_cycle,
+            next_payout_date=schedule.next_payout_date,
+            created_at=self._at(created),
+            approved_at=self._at(created),
+        )
+
+        recruiting_days = max(1, ((start_date or self.today) - created).days)
+        membership_ids = []
+        for user_id in member_ids:
+            joined = self._at(created + datetime.timedelta(days=rng.randrange(recruiting_days)))
+            membership_ids.append(self._add(rows, GroupMembership, user_id=user_id, group_id=group_id, joined_at=joined))
+            if user_id != admin_id:
+                self._add(
+                    rows, GroupJoinRequest, user_id=user_id, group_id=group_id, status='approved',
+                    requested_at=joined - datetime.timedelta(hours=rng.randrange(1, 48)),
+                    handled_by_id=admin_id, handled_at=joined,
+                )
+
+        # Join-request churn: people turned away, and people waiting on a seat
+        rejected = int(rng.expovariate(1 / (profile.rejected_requests_per_seat * size)))
+        pending = round(profile.pending_requests_per_open_seat * (size - member_count)) if filling else 0
+        for index in range(rejected + pending):
+            requested = self._at(created, 30)
+            is_pending = index >= rejected
+            self._add(
+                rows, GroupJoinRequest, user_id=self._member(rows, taken, created), group_id=group_id,
+                requested_at=requested,
+                status='pending' if is_pending else 'rejected',
+                handled_by_id=None if is_pending else admin_id,
+                handled_at=None if is_pending else requested + datetime.timedelta(hours=rng.randrange(1, 72)),
+            )
+
+        if filling:
+            return
+
+        positions = list(range(1, size + 1))
+        rng.shuffle(positions)
+        for membership_id, position in zip(membership_ids, positions):
+            self._add(rows, PayoutOrder, group_id=group_id, membership_id=membership_id, position=position)
+            reliability = rng.betavariate(*profile.reliability)
+            for cycle in range(1, current_cycle + 1):
+                # The cycle in progress is only partly paid so far
+                chance = reliability / 2 if cycle == current_cycle else reliability
+                if rng.random() >= chance:
+                    continue
+                cycle_start = start_date + datetime.timedelta(days=(cycle - 1) * interval)
+                self._add(
+                    rows, Contribution, membership_id=membership_id, amount=amount, cycle_number=cycle,
+                    paid_at=min(self._at(cycle_start, interval), self.now),
+                    is_verified=rng.random() >= profile.unverified_share,
+                )
+
+    def _write(self, model, rows):
+        if not rows:
+            return
+        table = self.tables[model]
+        if not self.copy:
+            # auto_now_add fields get the current time on this path
+            model.objects.bulk_create([model(**dict(zip(table.attnames, row))) for row in rows], batch_size=5000)
+            return
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(f.column) for f in table.fields)
+        with connection.cursor() as cursor:
+            with cursor.copy(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
@@ -1,6 +1,6 @@
 from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import GroupAdminKYC, Profile, SavingsGroup, GroupJoinRequest, GroupMembership, Contribution
+from .models import GroupAdminKYC, Profile, SavingsGroup, GroupJoinRequest, GroupMembership, Contribution, UserNotification
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import GroupAdminKYC, SavingsGroup
 from django.contrib.auth import get_user_model
@@ -9,6 +9,8 @@ from django.conf import settings
 from django.db.models import Sum
 from drf_spectacular.utils import extend_schema_field, OpenApiTypes
 
+from .kyc import IMAGE_FIELDS as KYC_IMAGE_FIELDS, upload_images as upload_kyc_images
+
 User = get_user_model()
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -167,7 +169,7 @@ class GroupAdminKYCSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context['request'].user
-        return GroupAdminKYC.objects.create(user=user, **validated_data)
+        return GroupAdminKYC.objects.create(user=user, **upload_kyc_images(validated_data))
 
 class SavingsGroupCreateSerializer(serializers.ModelSerializer):
     kyc = GroupAdminKYCSerializer(required=True)
@@ -200,17 +202,16 @@ class SavingsGroupCreateSerializer(serializers.ModelSerializer):
                     kyc_fields[field_name].required = False
 
     def create(self, validated_data):
-        kyc_data = validated_data.pop('kyc')
+        kyc_data = validated_data.pop('kyc', {})
         user = self.context['request'].user
 
         kyc_exists = getattr(self, 'kyc_exists', GroupAdminKYC.objects.filter(user=user).exists())
 
         if not kyc_exists:
+            # Uploaded together up front; CloudinaryField then just stores the results
             GroupAdminKYC.objects.create(
                 user=user,
-                ghana_card_front=kyc_data.get('ghana_card_front'),
-                ghana_card_back=kyc_data.get('ghana_card_back'),
-                live_photo=kyc_data.get('live_photo')
+                **upload_kyc_images({name: kyc_data.get(name) for name in KYC_IMAGE_FIELDS})
             )
         else:
             pass
@@ -296,31 +297,36 @@ class GroupDashboardCardSerializer(serializers.ModelSerializer):
     def get_next_payout_days(self, obj):
         return obj.days_until_next_payout
 
+    # DashboardView annotates user_contribution_total and current_cycle_total;
+    # the queries below only run for groups loaded without them.
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_user_total_contribution(self, obj):
-        user = self.context['request'].user
-        membership = GroupMembership.objects.filter(user=user, group=obj).first()
-        if not membership:
-            return 0.0
-        total = membership.contributions.aggregate(total=Sum('amount'))['total']
+        if hasattr(obj, 'user_contribution_total'):
+            total = obj.user_contribution_total
+        else:
+            user = self.context['request'].user
+            total = Contribution.objects.filter(
+                membership__user=user,
+                membership__group=obj
+            ).aggregate(total=Sum('amount'))['total']
         return float(total) if total else 0.0
 
+    def _current_cycle_total(self, obj):
+        if hasattr(obj, 'current_cycle_total'):
+            return obj.current_cycle_total or 0
+        return Contribution.objects.filter(
+            membership__group=obj,
+            cycle_number=obj.current_cycle_number
+        ).aggregate(total=Sum('amount'))['total'] or 0
+
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_total_saved(self, obj):
-        current_cycle = obj.current_cycle_number
-        total = Contribution.objects.filter(
-            membership__group=obj,
-            cycle_number=current_cycle
-        ).aggregate(total=Sum('amount'))['total']
+        total = self._current_cycle_total(obj)
         return float(total) if total else 0.0
 
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_progress_percentage(self, obj):
-        current_cycle = obj.current_cycle_number
-        total_contributed = Contribution.objects.filter(
-            membership__group=obj,
-            cycle_number=current_cycle
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_contributed = self._current_cycle_total(obj)
 
         expected_per_cycle = obj.contribution_amount * obj.expected_members
         if expected_per_cycle == 0:
@@ -347,3 +353,35 @@ class DashboardResponseSerializer(serializers.Serializer):
         many=True,
         help_text='List of active groups the authenticated user is a member of.'
     )
+
+
+class UserNotificationSerializer(serializers.ModelSerializer):
+    """An entry in the user's in-app notification feed."""
+
+    class Meta:
+        model = UserNotification
+        fields = ['id', 'kind', 'title', 'body', 'data', 'is_read', 'created_at']
+        read_only_fields = fields
+
+
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    """Marks specific feed entries read, or all of them."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=500,
+        help_text="Ids of the entries to mark read."
+    )
+    all = serializers.BooleanField(
+        default=False,
+        help_text="Mark every unread entry read instead."
+    )
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and not attrs['all']:
+            raise serializers.ValidationError("Provide 'ids' or set 'all' to true.")
+        return attrs
+
+
+class UnreadCountSerializer(serializers.Serializer):
+    unread_count = serializers.IntegerField()
@@ -0,0 +1,160 @@
+"""
+SMS notifications through Dawurobo.
+
+Outbox rows on the 'sms' channel are sent in provider bulk calls over one pooled
+HTTP client per process. Sends are throttled per sender ID with a fixed-window
+counter in the cache, so every worker shares the same budget.
+
+The provider is chosen with SMS_PROVIDER. With it set to '' SMS is switched
+off: no 'sms' rows are queued and the drain leaves the channel alone.
+FakeSmsProvider keeps messages in memory, for development and tests.
+"""
+import time
+from dataclasses import dataclass
+
+import httpx
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from core.instrumentation import track_outbound
+
+
+@dataclass
+class SmsMessage:
+    reference: str
+    number: str
+    text: str
+
+
+@dataclass
+class SmsResult:
+    reference: str
+    success: bool
+    provider_reference: str = ''
+    error: str = ''
+
+
+class SmsProvider:
+    """Interface every provider implements."""
+    name = ''
+    max_batch_size = 100
+
+    def send_bulk(self, sender_id, messages):
+        """Sends messages in one call; returns an SmsResult for each."""
+        raise NotImplementedError
+
+
+class DawuroboSmsProvider(SmsProvider):
+    name = 'dawurobo'
+    max_batch_size = 100
+    base_url = 'https://devs.sms.api.dawurobo.com/v1/sms'
+
+    def __init__(self, transport=None):
+        # One keep-alive client per process instead of a new connection per call
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers={
+                'accept': 'application/json',
+                'x-api-key': settings.DAWUROBO_API_KEY,
+                'x-access-token': settings.DAWUROBO_ACCESS_TOKEN,
+            },
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            timeout=30,
+            transport=transport,
+        )
+
+    def send_bulk(self, sender_id, messages):
+        with track_outbound('dawurobo'):
+            response = self.client.post('/bulk', json={
+                'senderid': sender_id,
+                'messages': [
+                    {'number': message.number, 'message': message.text, 'reference': message.reference}
+                    for message in messages
+                ],
+            })
+        response.raise_for_status()
+
+        # Recipients missing from the response were accepted without a message id
+        reported = {str(item.get('reference')): item for item in response.json().get('data') or []}
+        results = []
+        for message in messages:
+            item = reported.get(message.reference, {})
+            if str(item.get('status', 'success')).lower() in ('success', 'sent', 'queued'):
+                results.append(SmsResult(message.reference, True, str(item.get('messageid', ''))))
+            else:
+                results.append(SmsResult(message.reference, False, error=item.get('message', 'Rejected by provider')))
+        return results
+
+    def close(self):
+        self.client.close()
+
+
+class FakeSmsProvider(SmsProvider):
+    """In-process stand-in that accepts every message except to SMS_FAKE_FAILING_NUMBERS."""
+    name = 'fake'
+    max_batch_size = 100
+
+    def __init__(self):
+        self.failing_numbers = set(getattr(settings, 'SMS_FAKE_FAILING_NUMBERS', []))
+        self.sent = []
+        self.calls = 0
+
+    def send_bulk(self, sender_id, messages):
+        self.calls += 1
+        results = []
+        for message in messages:
+            if message.number in self.failing_numbers:
+                results.append(SmsResult(message.reference, False, error='Invalid number'))
+            else:
+                self.sent.append(message)
+                results.append(SmsResult(message.reference, True, f'fake-{len(self.sent)}'))
+        return results
+
+
+_provider = None
+
+
+def is_enabled():
+    return bool(settings.SMS_PROVIDER)
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        if not is_enabled():
+            # Never fall back to the fake: it would record messages as sent
+            raise ImproperlyConfigured("Set SMS_PROVIDER to send SMS notifications")
+        _provider = import_string(settings.SMS_PROVIDER)()
+    return _provider
+
+
+@worker_process_shutdown.connect
+def close_provider(**kwargs):
+    if _provider is not None and hasattr(_provider, 'close'):
+        _provider.close()
+
+
+class SenderRateLimiter:
+    """Fixed-window limit of SMS_RATE_LIMIT_PER_MINUTE messages per sender ID."""
+    window_seconds = 60
+
+    def __init__(self, sender_id, limit=None):
+        self.sender_id = sender_id
+        self.limit = limit if limit is not None else settings.SMS_RATE_LIMIT_PER_MINUTE
+
+    def _key(self, window):
+        return f'sms-rate:{self.sender_id}:{window}'
+
+    def acquire(self, count):
+        """Reserves up to ``count`` sends in the current window; returns how many were granted."""
+        window = int(time.time() // self.window_seconds)
+        key = self._key(window)
+        cache.add(key, 0, timeout=self.window_seconds * 2)
+        used = cache.incr(key, count)
+        return max(0, min(count, self.limit - (used - count)))
+
+    def window_resets_in(self):
+        return self.window_seconds - time.time() % self.window_seconds
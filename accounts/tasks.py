@@ -1,129 +1,43 @@
-import requests
+import datetime
+from decimal import Decimal
+
+import cloudinary.uploader
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.contrib.sites.models import Site
-from django.urls import NoReverseMatch, reverse
+from django.db import transaction
+from django.urls import NoReverseMatch
 from celery import shared_task
+from core.instrumentation import track_outbound
+from core.locks import single_flight
 from django.utils import timezone
-from .models import SavingsGroup, Contribution, PayoutOrder
-
-# Dawurobo API constants
-DAWUROBO_BASE = "https://devs.sms.api.dawurobo.com/v1/otp"
-
-HEADERS = {
-    "accept": "application/json",
-    "x-api-key": settings.DAWUROBO_API_KEY,
-    "x-access-token": settings.DAWUROBO_ACCESS_TOKEN,
-    "Content-Type": "application/json"
-}
-
-
-def send_dawurobo_otp_sync(phone_number: str) -> dict:
-    """
-    Synchronous version used in local development.
-    Works exactly like the old .delay() version but runs immediately.
-    """
-    payload = {
-        "senderid": settings.DAWUROBO_SENDER_ID,
-        "number": phone_number.replace("+", "").replace(" ", ""),
-        "messagetemplate": "Your SnappX verification code is: %OTPCODE%. Expires in %EXPIRY% minutes.",
-        "expiry": 10,
-        "length": 6,
-        "type": "NUMERIC"
-    }
-
-    try:
-        response = requests.post(
-            f"{DAWUROBO_BASE}/generate",
-            json=payload,
-            headers=HEADERS,
-            timeout=30
-        )
-
-        if response.status_code in (200, 201, 409):
-            print(f"OTP sent successfully to {phone_number}")
-            return {"success": True, "status_code": response.status_code}
-
-        response.raise_for_status()
-        return {"success": True}
+from . import feed, outbox, sms
+from .models import SavingsGroup, Contribution, PayoutOrder, Payout, Profile, StagedProfilePicture
+from .disbursements import reconcile_batches, submit_due_payouts
+from .mail import build_email, mailer
+from .rendering import absolute_url, render_template
 
-    except requests.exceptions.RequestException as e:
-        print(f"DAWUROBO SEND ERROR → {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response: {e.response.text}")
-        return {"success": False, "error": str(e)}
 
+def build_join_request_email(request_id):
+    """Email to the Group Admin about a new join request."""
+    from .models import GroupJoinRequest
 
-def verify_and_invalidate_otp_sync(phone_number: str, code: str) -> bool:
-    """
-    Secure synchronous verification + immediate invalidation.
-    Used for signup verification and password reset.
-    """
-    clean_number = phone_number.replace("+", "").replace(" ", "")
-    verify_payload = {"otpcode": code.upper(), "number": clean_number}
-
-    try:
-        verify_resp = requests.post(
-            f"{DAWUROBO_BASE}/verify",
-            json=verify_payload,
-            headers=HEADERS,
-            timeout=10
-        )
-
-        success = verify_resp.status_code == 200 and "success" in verify_resp.text.lower()
-
-        if success:
-            # Immediately invalidate to prevent reuse
-            requests.post(
-                f"{DAWUROBO_BASE}/invalidate",
-                json={"number": clean_number},
-                headers=HEADERS,
-                timeout=10
-            )
-            print(f"OTP verified and invalidated for {phone_number}")
-            return True
-        else:
-            print(f"Invalid OTP attempt: {verify_resp.text}")
-            return False
-
-    except Exception as e:
-        print(f"OTP verify/invalidate failed: {e}")
-        return False
-
-
-@shared_task
-def send_group_join_request_email_async(request_id: int):
-    """
-    Celery task to send an email to the Group Admin notifying them
-    of a new join request.
-    """
     try:
-        from .models import GroupJoinRequest
-
         join_request = GroupJoinRequest.objects.select_related(
-            'group__admin', 'user__profile'
+            'group__admin__profile', 'user__profile'
         ).get(pk=request_id)
-
     except GroupJoinRequest.DoesNotExist:
         print(f"ERROR: GroupJoinRequest with ID {request_id} not found.")
-        return False
+        return None
 
     group = join_request.group
     admin_user = group.admin
     requester_name = join_request.user.profile.full_name
 
     # Construct the Deep Link URL
-    current_site = Site.objects.get_current()
-    protocol = "http" if settings.DEBUG else "https"
-
     try:
-        relative_url = reverse('group-requests-list', kwargs={'group_id': group.id})
+        full_review_url = absolute_url('group-requests-list', group_id=group.id)
     except NoReverseMatch:
         print("URL Reverse Match Error: Check URL configuration for 'group-requests-list'")
-        return False
-
-    full_review_url = f"{protocol}://{current_site.domain}{relative_url}"
+        return None
 
     # Render Email Content
     context = {
@@ -133,41 +47,28 @@ def send_group_join_request_email_async(request_id: int):
         'review_url': full_review_url,
     }
 
-    email_html_content = render_to_string('emails/new_join_request.html', context)
+    email_html_content = render_template('emails/new_join_request.html', context)
     email_text_content = f"A new user, {requester_name}, has requested to join your group: {group.group_name}. Review the request here: {full_review_url}"
 
-    # Send Email
-    try:
-        send_mail(
-            subject=f"🚀 New Join Request for '{group.group_name}'",
-            message=email_text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[admin_user.email],
-            html_message=email_html_content,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"EMAIL SEND ERROR for Group ID {group.id}: {e}")
-        return False
+    return build_email(
+        subject=f"🚀 New Join Request for '{group.group_name}'",
+        text=email_text_content,
+        recipient=admin_user.email,
+        html=email_html_content,
+    )
 
 
-@shared_task
-def send_group_join_response_email_async(request_id: int, action: str):
-    """
-    Celery task to send an email to the applicant (user) notifying them
-    that their join request has been approved or rejected by the admin.
-    """
-    try:
-        from .models import GroupJoinRequest
+def build_join_response_email(request_id, action):
+    """Email to the applicant saying their join request was approved or rejected."""
+    from .models import GroupJoinRequest
 
+    try:
         join_request = GroupJoinRequest.objects.select_related(
-            'group__admin', 'user__profile'
+            'group__admin__profile', 'user__profile'
         ).get(pk=request_id)
-
     except GroupJoinRequest.DoesNotExist:
         print(f"ERROR: GroupJoinRequest with ID {request_id} not found for response.")
-        return False
+        return None
 
     group = join_request.group
     applicant_user = join_request.user
@@ -176,29 +77,22 @@ def send_group_join_response_email_async(request_id: int, action: str):
     clean_group_name = group.group_name.strip('*').strip()
 
     # Construct the Deep Link URL
-    current_site = Site.objects.get_current()
-    protocol = "http" if settings.DEBUG else "https"
-
     try:
-        relative_url = reverse('group-detail', kwargs={'id': group.id})
+        full_group_url = absolute_url('group-detail', id=group.id)
     except NoReverseMatch:
         print("URL Reverse Match Error: Check URL configuration for 'group-detail'")
-        relative_url = reverse('group_list_all')
-
-    full_group_url = f"{protocol}://{current_site.domain}{relative_url}"
+        full_group_url = absolute_url('all-groups')
 
     # Determine Subject and Template based on action
     if action == 'approved':
         subject = f"🎉 Welcome! You've Joined '{clean_group_name}'"
         template_name = 'emails/join_request_approved.html'
-        message_prefix = "Congratulations! Your request to join"
     elif action == 'rejected':
         subject = f"😔 Update: Request to Join '{clean_group_name}'"
         template_name = 'emails/join_request_rejected.html'
-        message_prefix = "Unfortunately, your request to join"
     else:
         print(f"ERROR: Invalid action '{action}' passed to email task.")
-        return False
+        return None
 
     # Render Email Content
     context = {
@@ -209,40 +103,409 @@ def send_group_join_response_email_async(request_id: int, action: str):
         'admin_name': group.admin.profile.full_name,
     }
 
-    email_html_content = render_to_string(template_name, context)
+    email_html_content = render_template(template_name, context)
     email_text_content = (
-    f"Update for group '{clean_group_name}': Your request was {action}. "
-    f"Log in to view details: {full_group_url}"
-)
+        f"Update for group '{clean_group_name}': Your request was {action}. "
+        f"Log in to view details: {full_group_url}"
+    )
+
+    return build_email(
+        subject=subject,
+        text=email_text_content,
+        recipient=applicant_user.email,
+        html=email_html_content,
+    )
+
+
+def build_payout_email(beneficiary_id, group_id, cycle, amount):
+    """Email to the beneficiary that their payout has been processed."""
+    from .models import User
+
+    try:
+        beneficiary = User.objects.select_related('profile').get(pk=beneficiary_id)
+        group = SavingsGroup.objects.get(pk=group_id)
+    except (User.DoesNotExist, SavingsGroup.DoesNotExist):
+        print(f"ERROR: User ID {beneficiary_id} or Group ID {group_id} not found.")
+        return None
+
+    beneficiary_name = beneficiary.profile.full_name
+    group_name = group.group_name.strip('*').strip()
+    momo_number = str(beneficiary.profile.momo_number)
+    formatted_amount = f"₵{Decimal(str(amount)):,.2f}"
 
-    # Send Email
     try:
-        send_mail(
-            subject=subject,
-            message=email_text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[applicant_user.email],
-            html_message=email_html_content,
-            fail_silently=False,
+        full_dashboard_url = absolute_url('dashboard')
+    except NoReverseMatch:
+        print("URL Reverse Match Error: Check URL configuration for 'dashboard'")
+        full_dashboard_url = absolute_url('group-detail', id=group.id)
+
+    # Render Email Content
+    context = {
+        'beneficiary_name': beneficiary_name,
+        'group_name': group_name,
+        'cycle': cycle,
+        'amount': formatted_amount,
+        'momo_number': momo_number,
+        'dashboard_url': full_dashboard_url,
+    }
+    email_html_content = render_template('emails/payout_notification.html', context)
+    email_text_content = (
+        f"Congratulations, {beneficiary_name}! Your payout of {formatted_amount} "
+        f"for cycle {cycle} in '{group_name}' has been processed. "
+        f"It will be sent to your MoMo account: {momo_number}. "
+        f"View your dashboard: {full_dashboard_url}"
+    )
+
+    return build_email(
+        subject=f"🎉 Payout Processed from '{group_name}'!",
+        text=email_text_content,
+        recipient=beneficiary.email,
+        html=email_html_content,
+    )
+
+
+def build_incomplete_contributions_email(group_id, cycle, verified, expected):
+    """Email to the Group Admin that a payout was skipped for missing contributions."""
+    try:
+        group = SavingsGroup.objects.select_related('admin').get(pk=group_id)
+    except SavingsGroup.DoesNotExist:
+        print(f"ERROR: Group ID {group_id} not found.")
+        return None
+
+    return build_email(
+        subject=f"Incomplete Contributions for {group.group_name}",
+        text=f"Cycle {cycle} in {group.group_name} has only {verified}/{expected} verified contributions. Payout skipped.",
+        recipient=group.admin.email,
+    )
+
+
+def build_join_response_sms(request_id, action):
+    from .models import GroupJoinRequest
+
+    join_request = GroupJoinRequest.objects.select_related('group', 'user__profile').filter(pk=request_id).first()
+    if join_request is None or action not in ('approved', 'rejected'):
+        return None
+
+    group_name = join_request.group.group_name.strip('*').strip()
+    if action == 'approved':
+        text = f"SnappX: Your request to join '{group_name}' was approved. Welcome aboard!"
+    else:
+        text = f"SnappX: Your request to join '{group_name}' was not approved this time."
+    return str(join_request.user.profile.momo_number), text
+
+
+def build_payout_sms(beneficiary_id, group_id, cycle, amount):
+    from .models import Profile
+
+    profile = Profile.objects.filter(user_id=beneficiary_id).first()
+    group = SavingsGroup.objects.filter(pk=group_id).first()
+    if profile is None or group is None:
+        return None
+
+    group_name = group.group_name.strip('*').strip()
+    text = (
+        f"SnappX: Your payout of GHS {Decimal(str(amount)):,.2f} for cycle {cycle} "
+        f"in '{group_name}' is on its way to {profile.momo_number}."
+    )
+    return str(profile.momo_number), text
+
+
+# Notification kind -> builder called with the notification payload
+EMAIL_BUILDERS = {
+    'join_request': build_join_request_email,
+    'join_response': build_join_response_email,
+    'payout': build_payout_email,
+    'incomplete_contributions': build_incomplete_contributions_email,
+}
+
+# SMS builders return (number, text)
+SMS_BUILDERS = {
+    'join_response': build_join_response_sms,
+    'payout': build_payout_sms,
+}
+
+
+def _queue(kind, key, payload, channels=('email',)):
+    queued = False
+    for channel in channels:
+        if channel == 'sms' and not sms.is_enabled():
+            continue
+        # Email keys carry no prefix so they match rows written before SMS existed
+        dedupe_key = key if channel == 'email' else f"{channel}:{key}"
+        queued = outbox.enqueue(kind, dedupe_key, payload, channel=channel) or queued
+    if queued:
+        # Deliver right after the writing transaction commits instead of waiting for beat.
+        # Robust: with the broker down the beat drain still delivers it.
+        transaction.on_commit(lambda: drain_notification_outbox.delay(), robust=True)
+    return queued
+
+
+def notify_join_request(join_request):
+    group = join_request.group
+    # A re-submitted request gets a new requested_at and so a new notification
+    queued = _queue(
+        'join_request',
+        f"join_request:{join_request.pk}:{join_request.requested_at.timestamp():.0f}",
+        {'request_id': join_request.pk},
+    )
+    # Feed entries follow the outbox dedupe, so a retried event adds one entry
+    if queued:
+        feed.push(
+            group.admin_id, 'join_request', "New join request",
+            f"{join_request.user.profile.full_name} has requested to join {group.group_name}.",
+            {'group_id': group.id, 'request_id': join_request.pk},
         )
-        print(f"Group join response '{action}' email sent to {applicant_user.email}")
-        return True
-    except Exception as e:
-        print(f"EMAIL SEND ERROR for Request ID {request_id}: {e}")
+    return queued
+
+
+def notify_join_response(join_request, action):
+    group_name = join_request.group.group_name.strip('*').strip()
+    # A rejected request can be re-submitted and handled again: key on when it was handled
+    handled_at = join_request.handled_at or join_request.requested_at
+    queued = _queue(
+        'join_response',
+        f"join_response:{join_request.pk}:{action}:{handled_at.timestamp():.0f}",
+        {'request_id': join_request.pk, 'action': action},
+        channels=('email', 'sms'),
+    )
+    if queued:
+        feed.push(
+            join_request.user_id, 'join_response', f"Join request {action}",
+            f"Your request to join {group_name} was {action}.",
+            {'group_id': join_request.group_id, 'request_id': join_request.pk},
+        )
+    return queued
+
+
+def notify_payout(payout):
+    queued = _queue(
+        'payout',
+        f"payout:{payout.group_id}:{payout.cycle_number}:{payout.beneficiary_id}",
+        {
+            'beneficiary_id': payout.beneficiary_id,
+            'group_id': payout.group_id,
+            'cycle': payout.cycle_number,
+            'amount': str(payout.amount),
+        },
+        channels=('email', 'sms'),
+    )
+    if queued:
+        feed.push(
+            payout.beneficiary_id, 'payout', "Payout processed",
+            f"Your payout of ₵{payout.amount:,.2f} for cycle {payout.cycle_number} in "
+            f"{payout.group.group_name.strip('*').strip()} has been processed.",
+            {'group_id': payout.group_id, 'cycle': payout.cycle_number},
+        )
+    return queued
+
+
+def notify_incomplete_contributions(group, cycle, verified, expected):
+    queued = _queue(
+        'incomplete_contributions',
+        f"incomplete_contributions:{group.pk}:{cycle}",
+        {'group_id': group.pk, 'cycle': cycle, 'verified': verified, 'expected': expected},
+    )
+    if queued:
+        feed.push(
+            group.admin_id, 'incomplete_contributions', "Payout skipped",
+            f"Cycle {cycle} in {group.group_name} has only {verified}/{expected} verified contributions.",
+            {'group_id': group.id, 'cycle': cycle},
+        )
+    return queued
+
+
+@shared_task
+def send_group_join_request_email_async(request_id: int):
+    """
+    Queues the email notifying the Group Admin of a new join request.
+    Delivery (and retrying) is left to drain_notification_outbox.
+    """
+    from .models import GroupJoinRequest
+
+    join_request = GroupJoinRequest.objects.filter(pk=request_id).first()
+    if join_request is None:
+        print(f"ERROR: GroupJoinRequest with ID {request_id} not found.")
+        return False
+    return notify_join_request(join_request)
+
+
+@shared_task
+def send_group_join_response_email_async(request_id: int, action: str):
+    """
+    Queues the email and SMS notifying the applicant that their join
+    request has been approved or rejected by the admin.
+    """
+    from .models import GroupJoinRequest
+
+    join_request = GroupJoinRequest.objects.filter(pk=request_id).first()
+    if join_request is None:
+        print(f"ERROR: GroupJoinRequest with ID {request_id} not found for response.")
         return False
+    return notify_join_response(join_request, action)
+
+
+def _build(builders, notification):
+    """Returns the built message, or None after recording why there is nothing to send."""
+    builder = builders.get(notification.kind)
+    try:
+        message = builder(**notification.payload) if builder else None
+    except Exception as e:
+        outbox.mark_failed(notification, f"Render error: {e}")
+        return None
+    if message is None:
+        outbox.mark_failed(notification, "Nothing to send", permanent=True)
+    return message
+
+
+def _deliver_emails(notifications):
+    delivered = 0
+    for notification in notifications:
+        message = _build(EMAIL_BUILDERS, notification)
+        if message is None:
+            continue
+
+        # Sent one at a time so each failure is recorded against its own row
+        try:
+            mailer.send(message)
+        except Exception as e:
+            print(f"EMAIL SEND ERROR for notification {notification.pk}: {e}")
+            outbox.mark_failed(notification, e)
+            continue
+        outbox.mark_sent(notification, recipient=message.to[0])
+        delivered += 1
+    return delivered
+
+
+def _deliver_sms(notifications):
+    provider = sms.get_provider()
+    limiter = sms.SenderRateLimiter(settings.DAWUROBO_SENDER_ID)
+
+    messages = {}
+    for notification in notifications:
+        built = _build(SMS_BUILDERS, notification)
+        if built is not None:
+            number, text = built
+            messages[notification.pk] = (notification, sms.SmsMessage(str(notification.pk), number, text))
+    pending = list(messages.values())
+
+    granted = limiter.acquire(len(pending))
+    if granted < len(pending):
+        # Over the sender's budget: try the rest in the next window
+        outbox.defer([notification for notification, _ in pending[granted:]], limiter.window_resets_in())
+        pending = pending[:granted]
+
+    delivered = 0
+    batch_size = min(settings.SMS_BATCH_SIZE, provider.max_batch_size)
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        try:
+            results = provider.send_bulk(settings.DAWUROBO_SENDER_ID, [message for _, message in chunk])
+        except Exception as e:
+            print(f"SMS SEND ERROR for {len(chunk)} notifications: {e}")
+            for notification, _ in chunk:
+                outbox.mark_failed(notification, e)
+            continue
+
+        for result in results:
+            notification, message = messages[int(result.reference)]
+            if result.success:
+                outbox.mark_sent(notification, recipient=message.number, provider_reference=result.provider_reference)
+                delivered += 1
+            else:
+                # Rejected numbers won't start working on retry
+                outbox.mark_failed(notification, result.error, permanent=True)
+    return delivered
+
+
+DELIVERY_HANDLERS = {
+    'email': _deliver_emails,
+    'sms': _deliver_sms,
+}
+
+
+@shared_task
+@single_flight('drain-notification-outbox', ttl=120)
+def drain_notification_outbox():
+    """
+    Delivers due notifications from the outbox. Failed sends are retried with
+    exponential backoff; notifications whose subject no longer exists are failed.
+    """
+    delivered = 0
+    for channel, deliver in DELIVERY_HANDLERS.items():
+        if channel == 'sms' and not sms.is_enabled():
+            # Rows queued before SMS was switched off wait until it is back on
+            continue
+        while True:
+            notifications = outbox.claim_due(settings.NOTIFICATION_BATCH_SIZE, channel=channel)
+            if not notifications:
+                break
+            delivered += deliver(notifications)
+            if len(notifications) < settings.NOTIFICATION_BATCH_SIZE:
+                break
+    return delivered
 
 @shared_task
+def roll_over_group_cycles():
+    """
+    Advances the stored current_cycle_number / next_payout_date of every
+    group whose next payout date has been reached.
+    """
+    today = timezone.now().date()
+    stale_groups = SavingsGroup.objects.due_for_rollover(today).only(
+        'id', 'start_date', 'payout_interval_days', *SavingsGroup.SCHEDULE_FIELDS
+    )
+
+    batch = []
+    rolled_over = 0
+    for group in stale_groups.iterator(chunk_size=2000):
+        group.refresh_schedule(today)
+        batch.append(group)
+        if len(batch) >= 1000:
+            SavingsGroup.objects.bulk_update(batch, SavingsGroup.SCHEDULE_FIELDS)
+            rolled_over += len(batch)
+            batch = []
+    if batch:
+        SavingsGroup.objects.bulk_update(batch, SavingsGroup.SCHEDULE_FIELDS)
+        rolled_over += len(batch)
+    return rolled_over
+
+@shared_task(acks_late=True)
+@single_flight('process-daily-payouts', ttl=120)
 def process_daily_payouts():
+    """
+    Pays out every group whose cycle falls due today.
+    Each (group, cycle) is claimed through the Payout ledger, so running this
+    task every few minutes notifies the beneficiary and alerts the admin only once.
+    """
     today = timezone.now().date()
-    active_groups = SavingsGroup.objects.filter(
-        status='active',
-        start_date__lte=today
+
+    # Make sure stored schedules are current before relying on them
+    roll_over_group_cycles()
+
+    due_groups = [
+        (group, group.current_cycle_number)
+        for group in SavingsGroup.objects.filter(status='active')
+        .paying_out_on(today)
+        .select_related('admin')
+    ]
+
+    if not due_groups:
+        return
+
+    # Cycles already paid out are skipped without re-counting contributions
+    handled_cycles = set(
+        Payout.objects.filter(group__in=[group for group, _ in due_groups])
+        .exclude(status='pending')
+        .values_list('group_id', 'cycle_number')
     )
-    for group in active_groups:
-        days_since_start = (today - group.start_date).days
-        if days_since_start % group.payout_interval_days != 0:
+
+    for group, current_cycle in due_groups:
+        if (group.id, current_cycle) in handled_cycles:
+            continue
+
+        payout, _ = Payout.objects.get_or_create(group=group, cycle_number=current_cycle)
+        if payout.status != 'pending':
             continue
-        current_cycle = group.current_cycle_number
 
         # Verify all contributions for this cycle
         expected_contributions = group.expected_members
@@ -252,18 +515,22 @@ def process_daily_payouts():
             is_verified=True
         ).count()
         if verified_contributions < expected_contributions:
-            send_mail(
-                subject=f"Incomplete Contributions for {group.group_name}",
-                message=f"Cycle {current_cycle} in {group.group_name} has only {verified_contributions}/{expected_contributions} verified contributions. Payout skipped.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[group.admin.email]
-            )
+            # Alert the admin once per cycle; later runs keep re-checking silently
+            with transaction.atomic():
+                alert_claimed = Payout.objects.filter(
+                    pk=payout.pk,
+                    incomplete_alert_sent_at__isnull=True
+                ).update(incomplete_alert_sent_at=timezone.now())
+                if alert_claimed:
+                    notify_incomplete_contributions(
+                        group, current_cycle, verified_contributions, expected_contributions
+                    )
             continue
 
         # Determine beneficiary (rotates through positions)
         position = ((current_cycle - 1) % group.expected_members) + 1
         try:
-            payout_order = PayoutOrder.objects.get(
+            payout_order = PayoutOrder.objects.select_related('membership__user').get(
                 group=group,
                 position=position
             )
@@ -273,15 +540,38 @@ def process_daily_payouts():
         # Calculate pot
         total_pot = group.total_pot_per_cycle
 
-        # Trigger disbursement (manual email for now. I'll use Paystack/Hubtel API call later)
-        send_payout_notification_email_async.delay(
-            beneficiary_id=beneficiary.id,
-            group_id=group.id,
-            cycle=current_cycle,
-            amount=float(total_pot)
-        )
+        # Claim the cycle: only the run that moves it out of 'pending' notifies.
+        # The notification is written in the same transaction, so it can't be lost.
+        with transaction.atomic():
+            claimed = Payout.objects.filter(pk=payout.pk, status='pending').update(
+                status='notified',
+                beneficiary=beneficiary,
+                amount=total_pot,
+                notified_at=timezone.now()
+            )
+            if not claimed:
+                continue
+            payout.beneficiary = beneficiary
+            payout.amount = total_pot
+            notify_payout(payout)
         print(f"Payout processed for {beneficiary.email} in {group.group_name} - Cycle {current_cycle}")
 
+@shared_task(acks_late=True)
+@single_flight('disburse-due-payouts', ttl=300)
+def disburse_due_payouts():
+    """Sends notified payouts to the MoMo provider in bulk-transfer batches."""
+    submitted = submit_due_payouts()
+    if submitted:
+        print(f"Submitted {submitted} payouts for disbursement")
+    return submitted
+
+
+@shared_task(acks_late=True)
+@single_flight('reconcile-disbursements', ttl=300)
+def reconcile_disbursements():
+    """Marks submitted payouts disbursed or failed once the provider settles them."""
+    return reconcile_batches()
+
 @shared_task
 def send_payout_notification_email_async(
     beneficiary_id: int,
@@ -290,61 +580,63 @@ def send_payout_notification_email_async(
     amount: float
 ) -> bool:
     """
-    Celery task to send a payout notification email to the beneficiary.
+    Queues the payout notification email and SMS to the beneficiary.
     """
-    try:
-        from .models import SavingsGroup, User
-        beneficiary = User.objects.select_related('profile').get(pk=beneficiary_id)
-        group = SavingsGroup.objects.get(pk=group_id)
-    except (User.DoesNotExist, SavingsGroup.DoesNotExist):
-        print(f"ERROR: User ID {beneficiary_id} or Group ID {group_id} not found.")
-        return False
+    payout = Payout(group_id=group_id, cycle_number=cycle, beneficiary_id=beneficiary_id, amount=amount)
+    return notify_payout(payout)
 
-    beneficiary_name = beneficiary.profile.full_name
-    group_name = group.group_name.strip('*').strip()
-    momo_number = str(beneficiary.profile.momo_number)
-    formatted_amount = f"₵{amount:,.2f}"
-
-    current_site = Site.objects.get_current()
-    protocol = "http" if settings.DEBUG else "https"
-    try:
-        relative_url = reverse('dashboard')
-    except NoReverseMatch:
-        print("URL Reverse Match Error: Check URL configuration for 'dashboard'")
-        relative_url = reverse('group-detail', kwargs={'id': group.id})
-    full_dashboard_url = f"{protocol}://{current_site.domain}{relative_url}"
 
-    # Render Email Content
-    context = {
-        'beneficiary_name': beneficiary_name,
-        'group_name': group_name,
-        'cycle': cycle,
-        'amount': formatted_amount,
-        'momo_number': momo_number,
-        'dashboard_url': full_dashboard_url,
-    }
-    template_name = 'emails/payout_notification.html'
-    subject = f"🎉 Payout Processed from '{group_name}'!"
-    email_html_content = render_to_string(template_name, context)
-    email_text_content = (
-        f"Congratulations, {beneficiary_name}! Your payout of {formatted_amount} "
-        f"for cycle {cycle} in '{group_name}' has been processed. "
-        f"It will be sent to your MoMo account: {momo_number}. "
-        f"View your dashboard: {full_dashboard_url}"
-    )
+@shared_task(bind=True, acks_late=True, max_retries=5, default_retry_delay=30)
+def process_profile_picture(self, staged_id: int):
+    """
+    Uploads a profile picture staged at signup to Cloudinary, resized to fit
+    500x500, and sets it on the profile. After the last retry the picture is
+    dropped and the profile stays without one.
+    """
+    staged = StagedProfilePicture.objects.filter(pk=staged_id).first()
+    if staged is None:
+        # Already processed, or the account was removed
+        return False
 
-    # Send Email
     try:
-        send_mail(
-            subject=subject,
-            message=email_text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[beneficiary.email],
-            html_message=email_html_content,
-            fail_silently=False,
-        )
-        print(f"Payout notification email sent to {beneficiary.email} for Group ID {group.id}")
-        return True
+        with track_outbound('cloudinary'):
+            upload_result = cloudinary.uploader.upload(
+                bytes(staged.image),
+                folder="snappx/profiles/",
+                transformation=[
+                    {'width': 500, 'height': 500, 'crop': 'limit'},
+                    {'quality': "auto"}
+                ]
+            )
     except Exception as e:
-        print(f"EMAIL SEND ERROR for Beneficiary ID {beneficiary_id}: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+        print(f"Profile picture upload for profile {staged.profile_id} failed for good: {e}")
+        staged.delete()
         return False
+
+    with transaction.atomic():
+        Profile.objects.filter(pk=staged.profile_id).update(profile_picture=upload_result.get('secure_url'))
+        staged.delete()
+    print(f"Profile picture uploaded for profile {staged.profile_id}")
+    return True
+
+
+@shared_task
+@single_flight('requeue-staged-profile-pictures', ttl=120)
+def requeue_staged_profile_pictures():
+    """
+    Enqueues process_profile_picture again for staged pictures left behind,
+    e.g. because the broker was down at signup or the task was lost. Only rows
+    older than PROFILE_PICTURE_REQUEUE_SECONDS, which outlasts the task's own
+    retries, are picked up.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.PROFILE_PICTURE_REQUEUE_SECONDS)
+    staged_ids = list(
+        StagedProfilePicture.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list('pk', flat=True)
+    )
+    for staged_id in staged_ids:
+        process_profile_picture.delay(staged_id)
+    if staged_ids:
+        print(f"Re-enqueued {len(staged_ids)} staged profile pictures")
+    return len(staged_ids)
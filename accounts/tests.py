@@ -1,3 +1,1327 @@
-from django.test import TestCase
+"""
+Query budgets for every endpoint in accounts/urls.py and accounts/auth_urls.py.
 
-# Create your tests here.
+Each endpoint is called against seeded data and must stay within its declared
+query count and query time. List endpoints are called again after the data has
+grown, and must run the same number of queries (no N+1).
+
+Also: the database pool settings, replica routing, concurrent KYC uploads with
+a stand-in uploader, caching of the signed URLs the admin shows KYC images
+through, the cached site URLs notifications link to, the in-app feed's unread
+count, daily payouts through the Payout ledger, single-flight task locks, the
+vectorised payout projection, disbursement against the fake provider, the
+notification outbox with its SMS channel and pooled mailer, real-time fan-out
+through a Redis stand-in, single-use event stream tickets, per-request metrics,
+the lifetime of the OTP provider's HTTP client, and background processing of
+signup pictures.
+"""
+import asyncio
+import copy
+import datetime
+import io
+import json
+import random
+import smtplib
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable
+from unittest import mock, skipUnless
+
+import httpx
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from PIL import Image
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+import core.settings as project_settings
+from core.locks import LocalBackend, PostgresAdvisoryBackend, single_flight
+from core.metrics import metrics, series_key
+
+from . import (
+    auth_urls, disbursements, feed, kyc, mail, otp, outbox, projections, realtime, rendering, sms, tasks, urls, views,
+)
+from .disbursements import FakeDisbursementProvider
+from .kyc import IMAGE_FIELDS as KYC_IMAGE_FIELDS, FakeKycUploader
+from .models import (
+    Contribution, DisbursementBatch, GroupAdminKYC, GroupJoinRequest, GroupMembership, Notification, Payout,
+    PayoutOrder, Profile, SavingsGroup, StagedProfilePicture, User, UserNotification,
+)
+from .tasks import notify_join_response
+
+PASSWORD = 'Str0ng-pass!'
+
+
+@dataclass
+class Endpoint:
+    method: str
+    max_queries: int
+    kwargs: Callable = lambda t: {}
+    data: Callable = lambda t: None
+    # Which seeded user calls it; None for anonymous
+    as_user: str = 'viewer'
+    # List endpoints: queries must not grow with the number of results
+    scales: bool = False
+    max_query_seconds: float = 0.5
+    extra: dict = field(default_factory=dict)
+
+
+ENDPOINTS = {
+    # Auth
+    'signup': Endpoint('post', 12, as_user=None, data=lambda t: {
+        'email': 'new@example.com', 'password': PASSWORD, 'password2': PASSWORD, 'full_name': 'New Member',
+        'date_of_birth': '1995-05-05', 'user_type': 'worker', 'ghana_post_address': 'GA-123-4567',
+        'momo_provider': 'mtn', 'momo_number': '+233209999999', 'momo_name': 'New Member',
+    }, extra={'format': 'multipart'}),
+    'otp-send': Endpoint('post', 0, as_user=None, data=lambda t: {'phone_number': '+233200000001'}),
+    'otp-verify': Endpoint('post', 3, as_user=None, data=lambda t: {
+        'phone_number': str(t.viewer.profile.momo_number), 'code': '123456',
+    }),
+    'login': Endpoint('post', 6, as_user=None, data=lambda t: {
+        'login_field': t.viewer.email, 'password': PASSWORD,
+    }),
+    'token_refresh': Endpoint('post', 1, as_user=None, data=lambda t: {'refresh': t.refresh_token}),
+    'forgot_password': Endpoint('post', 1, as_user=None, data=lambda t: {'login_field': t.viewer.email}),
+    'reset_password': Endpoint('post', 3, as_user=None, data=lambda t: {
+        'phone': str(t.viewer.profile.momo_number), 'code': '123456', 'password': PASSWORD, 'password2': PASSWORD,
+    }),
+    'me': Endpoint('get', 2),
+
+    # Groups
+    'create-savings-group': Endpoint('post', 12, data=lambda t: {
+        'group_name': 'Budget Group', 'contribution_amount': '50.00', 'frequency': 'weekly',
+        'payout_timeline_days': 7, 'expected_members': 5, 'description': 'Seeded',
+    }, extra={'format': 'multipart'}),
+    'my-groups': Endpoint('get', 3, scales=True),
+    'all-groups': Endpoint('get', 3, scales=True),
+    'group-detail': Endpoint('get', 2, kwargs=lambda t: {'id': t.admin_group.id}),
+    'group-request-join': Endpoint('post', 12, as_user='outsider', kwargs=lambda t: {'group_id': t.admin_group.id}),
+    'group-requests-list': Endpoint('get', 4, scales=True, kwargs=lambda t: {'group_id': t.admin_group.id}),
+    'group-request-action': Endpoint('post', 16, kwargs=lambda t: {'pk': t.pending_request.id},
+                                     data=lambda t: {'action': 'approve'}),
+    'group-contribute': Endpoint('post', 6, kwargs=lambda t: {'group_id': t.member_group.id}),
+    'dashboard': Endpoint('get', 5, scales=True),
+
+    # Notifications
+    'notification-list': Endpoint('get', 2, scales=True),
+    'notification-unread-count': Endpoint('get', 2),
+    'notification-mark-read': Endpoint('post', 4, data=lambda t: {'all': True}),
+    'event-stream': Endpoint('get', 0, as_user=None),
+    'event-stream-ticket': Endpoint('post', 1),
+}
+
+
+def dawurobo_ok(*args, **kwargs):
+    return mock.Mock(status_code=200, text='success')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATELIMIT_ENABLE=False,
+    AXES_ENABLED=False,
+    REALTIME_BROKER='local',
+)
+class EndpointQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phone_counter = 0
+        cls.viewer = cls.make_user('viewer')
+        cls.outsider = cls.make_user('outsider')
+        GroupAdminKYC.objects.create(
+            user=cls.viewer, ghana_card_front='kyc/front', ghana_card_back='kyc/back', live_photo='kyc/live'
+        )
+        cls.admin_group = cls.make_group(admin=cls.viewer)
+        cls.member_group = cls.make_group(admin=cls.outsider, members=[cls.viewer])
+        cls.pending_request = GroupJoinRequest.objects.create(user=cls.make_user('applicant'), group=cls.admin_group)
+        cls.grow(cls, 2)
+
+    @classmethod
+    def make_user(cls, name):
+        cls.phone_counter += 1
+        user = User.objects.create_user(
+            email=f'{name}{cls.phone_counter}@example.com', username=f'{name}{cls.phone_counter}',
+            password=PASSWORD, is_verified=True,
+        )
+        Profile.objects.create(
+            user=user, full_name=name.title(), date_of_birth='1990-01-01', user_type='worker',
+            ghana_post_address='GA-123-4567', momo_provider='mtn', momo_number=f'+23324{cls.phone_counter:07d}',
+            momo_name=name.title(),
+        )
+        return user
+
+    @classmethod
+    def make_group(cls, admin, members=(), member_count=3):
+        group = SavingsGroup.objects.create(
+            admin=admin, group_name=f'Group {SavingsGroup.objects.count() + 1}', contribution_amount=Decimal('20.00'),
+            frequency='weekly', payout_timeline_days=7, expected_members=member_count + len(members),
+            current_members=member_count + len(members), status='active',
+            start_date=timezone.now().date() - datetime.timedelta(days=8),
+        )
+        users = list(members) + [cls.make_user('member') for _ in range(member_count)]
+        for position, user in enumerate(users, start=1):
+            membership = GroupMembership.objects.create(user=user, group=group)
+            PayoutOrder.objects.create(group=group, membership=membership, position=position)
+            for cycle in range(1, group.current_cycle_number + 1):
+                Contribution.objects.create(
+                    membership=membership, amount=group.contribution_amount, cycle_number=cycle, is_verified=True
+                )
+        return group
+
+    def grow(self, count):
+        """Adds ``count`` more of everything the list endpoints return to the viewer."""
+        for _ in range(count):
+            admin_group = self.make_group(admin=self.viewer)
+            self.make_group(admin=self.outsider, members=[self.viewer])
+            GroupJoinRequest.objects.create(user=self.make_user('applicant'), group=self.admin_group)
+            GroupJoinRequest.objects.create(user=self.make_user('applicant'), group=admin_group)
+            UserNotification.objects.create(user=self.viewer, kind='payout', title='Payout', body='Seeded')
+
+    def setUp(self):
+        patcher = mock.patch('accounts.otp._post', side_effect=dawurobo_ok)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.refresh_token = self.client_for('viewer').refresh_token
+
+    def client_for(self, as_user):
+        client = APIClient()
+        client.refresh_token = ''
+        if as_user:
+            refresh = RefreshToken.for_user(getattr(self, as_user))
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+            client.refresh_token = str(refresh)
+        return client
+
+    def call(self, name):
+        endpoint = ENDPOINTS[name]
+        client = self.client_for(endpoint.as_user)
+        url = reverse(name, kwargs=endpoint.kwargs(self))
+        data = endpoint.data(self)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, endpoint.method)(url, data, **endpoint.extra)
+        if response.status_code >= 500:
+            self.fail(f"{name} returned {response.status_code}")
+        return queries
+
+    def test_every_endpoint_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns + auth_urls.urlpatterns}
+        self.assertEqual(names - set(ENDPOINTS), set(), "Declare a query budget for these endpoints")
+
+    def test_endpoints_stay_within_budget(self):
+        for name, endpoint in ENDPOINTS.items():
+            with self.subTest(endpoint=name), transaction.atomic():
+                queries = self.call(name)
+                seconds = sum(float(query['time']) for query in queries.captured_queries)
+                self.assertLessEqual(
+                    len(queries), endpoint.max_queries,
+                    f"{name} ran {len(queries)} queries:\n" + '\n'.join(q['sql'] for q in queries.captured_queries)
+                )
+                self.assertLessEqual(seconds, endpoint.max_query_seconds, f"{name} spent {seconds:.3f}s in queries")
+                transaction.set_rollback(True)
+
+    def test_list_queries_do_not_grow_with_results(self):
+        scaling = [name for name, endpoint in ENDPOINTS.items() if endpoint.scales]
+        before = {name: len(self.call(name)) for name in scaling}
+        self.grow(3)
+        for name in scaling:
+            with self.subTest(endpoint=name):
+                self.assertEqual(len(self.call(name)), before[name], f"{name} runs more queries with more results")
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REPLICA_STICKY_SECONDS=60,
+)
+@skipUnless('replica' in settings.DATABASES, "No replica database configured")
+class ReplicaRoutingTests(TransactionTestCase):
+    # No wrapping transaction: the router keeps reads on the primary inside one
+    databases = {'default', 'replica'} & settings.DATABASES.keys()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='reader@example.com', username='reader', password=PASSWORD)
+        Profile.objects.create(
+            user=self.user, full_name='Reader', date_of_birth='1990-01-01', user_type='worker',
+            ghana_post_address='GA-123-4567', momo_provider='mtn', momo_number='+233241111111', momo_name='Reader',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get(self, name):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_opted_in_views_read_from_replica(self):
+        primary, replica = self.get('dashboard')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_other_views_read_from_primary(self):
+        primary, replica = self.get('notification-list')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        response = self.client.post(reverse('notification-mark-read'), {'all': True})
+        self.assertEqual(response.status_code, 200)
+        primary, replica = self.get('dashboard')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+
+@skipUnless(project_settings.DB_POOL_ENABLED, "Database pool disabled")
+class DatabasePoolTests(SimpleTestCase):
+
+    def test_pool_builds_from_the_project_settings(self):
+        # The project's own DATABASES, not the test settings that may replace them
+        database = copy.deepcopy(project_settings.DATABASES['default'])
+        wrapper = ConnectionHandler({'default': database, 'pool-check': database})['pool-check']
+        self.addCleanup(wrapper.close_pool)
+
+        pool = wrapper.pool
+        self.assertIsNotNone(pool)
+        self.assertEqual(pool.max_size, project_settings.DATABASES['default']['OPTIONS']['pool']['max_size'])
+        self.assertIsNotNone(pool._check)
+
+
+class ConcurrentKycUploader(FakeKycUploader):
+    """Fails unless all the images of a submission are uploading at the same time."""
+
+    def __init__(self):
+        super().__init__()
+        self.barrier = threading.Barrier(len(KYC_IMAGE_FIELDS), timeout=5)
+
+    def upload(self, field, file):
+        self.barrier.wait()
+        return super().upload(field, file)
+
+
+def png(name):
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REALTIME_BROKER='local',
+)
+class KycUploadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='founder@example.com', username='founder', password=PASSWORD)
+        Profile.objects.create(
+            user=self.user, full_name='Founder', date_of_birth='1990-01-01', user_type='worker',
+            ghana_post_address='GA-123-4567', momo_provider='mtn', momo_number='+233242222222', momo_name='Founder',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_kyc_images_upload_concurrently(self):
+        uploader = ConcurrentKycUploader()
+        with mock.patch('accounts.kyc.get_uploader', return_value=uploader):
+            response = self.client.post(reverse('create-savings-group'), {
+                'group_name': 'KYC Group', 'contribution_amount': '50.00', 'frequency': 'weekly',
+                'payout_timeline_days': 7, 'expected_members': 5, 'description': 'New',
+                **{f'kyc.{name}': png(f'{name}.png') for name in KYC_IMAGE_FIELDS},
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(uploader.uploaded), len(KYC_IMAGE_FIELDS))
+        submission = GroupAdminKYC.objects.get(user=self.user)
+        for name in KYC_IMAGE_FIELDS:
+            field = GroupAdminKYC._meta.get_field(name)
+            self.assertTrue(getattr(submission, name).public_id.startswith(field.options['folder']))
+
+    @override_settings(KYC_SIGNED_URL_SECONDS=3600, KYC_SIGNED_URL_MARGIN=60)
+    def test_signed_urls_expire_and_are_reused_until_shortly_before(self):
+        image = FakeKycUploader().upload(GroupAdminKYC._meta.get_field('live_photo'), png('live.png'))
+        kyc._signed_urls.clear()
+        signed_at = 1_800_000_000
+        with mock.patch('time.time', return_value=signed_at), \
+                mock.patch('accounts.kyc.private_download_url', side_effect=['signed-1', 'signed-2']) as sign:
+            self.assertEqual(kyc.signed_url(image), 'signed-1')
+            self.assertEqual(kyc.signed_url(image), 'signed-1')
+            self.assertEqual(sign.call_args.kwargs['expires_at'], signed_at + 3600)
+            self.assertEqual(sign.call_args.kwargs['type'], 'private')
+
+            # A new version of the image gets a URL of its own
+            image.version = 2
+            self.assertEqual(kyc.signed_url(image), 'signed-2')
+
+        with mock.patch('time.time', return_value=signed_at + 3600 - 59):
+            with mock.patch('accounts.kyc.private_download_url', return_value='signed-3'):
+                self.assertEqual(kyc.signed_url(image), 'signed-3')
+
+
+def make_member(name, momo_number):
+    user = User.objects.create_user(email=f'{name}@example.com', username=name, password=PASSWORD)
+    Profile.objects.create(
+        user=user, full_name=name.title(), date_of_birth='1990-01-01', user_type='worker',
+        ghana_post_address='GA-123-4567', momo_provider='mtn', momo_number=momo_number, momo_name=name.title(),
+    )
+    return user
+
+
+class DisbursementTests(TestCase):
+
+    def setUp(self):
+        self.provider = FakeDisbursementProvider()
+        patcher = mock.patch('accounts.disbursements._provider', self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        group = SavingsGroup.objects.create(
+            admin=make_member('treasurer', '+233243000000'), group_name='Payday',
+            contribution_amount=Decimal('20.00'), frequency='weekly', payout_timeline_days=7,
+            expected_members=2, current_members=2, status='active',
+        )
+        self.payouts = [
+            Payout.objects.create(
+                group=group, cycle_number=cycle, beneficiary=make_member(f'member{cycle}', f'+23324300000{cycle}'),
+                amount=Decimal('40.00'), status='notified', notified_at=timezone.now(),
+            )
+            for cycle in (1, 2)
+        ]
+
+    def test_payouts_are_disbursed_and_settled(self):
+        self.provider.failing_numbers = {'233243000002'}
+        self.assertEqual(disbursements.submit_due_payouts(), 2)
+        self.assertEqual(disbursements.reconcile_batches(), 2)
+
+        self.assertEqual(dict(Payout.objects.values_list('cycle_number', 'status')), {1: 'disbursed', 2: 'failed'})
+        self.assertEqual(DisbursementBatch.objects.get().status, 'completed')
+
+    def test_interrupted_batch_is_released_and_resubmitted(self):
+        # A run that died between claiming and submitting
+        [(batch, _)] = disbursements.claim_due_payouts(self.provider)
+        self.assertEqual(disbursements.submit_due_payouts(), 0)
+
+        DisbursementBatch.objects.filter(pk=batch.pk).update(
+            created_at=timezone.now() - datetime.timedelta(seconds=settings.DISBURSEMENT_SUBMIT_TIMEOUT + 1)
+        )
+        self.assertEqual(disbursements.submit_due_payouts(), 2)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'failed')
+        self.assertEqual(set(Payout.objects.values_list('batch__status', flat=True)), {'submitted'})
+        self.assertEqual(set(self.provider.results), {payout.transfer_reference for payout in self.payouts})
+
+    def test_unsupported_wallets_fail_on_their_own(self):
+        Profile.objects.filter(user=self.payouts[1].beneficiary).update(momo_provider='glo')
+
+        [(batch, transfers)] = disbursements.claim_due_payouts(disbursements.PaystackDisbursementProvider())
+
+        self.assertEqual([transfer.reference for transfer in transfers], [self.payouts[0].transfer_reference])
+        self.assertEqual(batch.item_count, 1)
+        failed = Payout.objects.get(pk=self.payouts[1].pk)
+        self.assertEqual((failed.status, failed.batch), ('failed', None))
+        self.assertIn("'glo'", failed.failure_reason)
+
+    def paystack_submit(self, transfers, already_sent=()):
+        """Submits to Paystack through a stand-in that normalises account numbers to a leading 0."""
+        calls = []
+
+        def handler(request):
+            calls.append((request.method, request.url.path))
+            if request.url.path.startswith('/transfer/verify/'):
+                reference = request.url.path.rsplit('/', 1)[1]
+                if reference not in already_sent:
+                    return httpx.Response(404, json={'status': False})
+                return httpx.Response(200, json={'data': {'status': 'pending'}})
+            body = json.loads(request.content)
+            if request.url.path == '/transferrecipient/bulk':
+                return httpx.Response(200, json={'data': {'errors': [], 'success': [
+                    {
+                        'recipient_code': f"RCP_{recipient['metadata']['reference']}",
+                        'details': {'account_number': '0' + recipient['account_number'][3:]},
+                        'metadata': recipient['metadata'],
+                    }
+                    for recipient in body['batch']
+                ]}})
+            calls.append(body['transfers'])
+            return httpx.Response(200, json={'status': True, 'data': []})
+
+        async def submit():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await disbursements.PaystackDisbursementProvider().submit_batch(client, transfers)
+
+        async_to_sync(submit)()
+        return calls
+
+    def test_paystack_transfers_go_to_the_recipient_created_for_them(self):
+        _, transfers = disbursements.claim_due_payouts(self.provider)[0]
+
+        *_, sent = self.paystack_submit(transfers)
+
+        self.assertEqual(
+            [(transfer['reference'], transfer['recipient'], transfer['amount']) for transfer in sent],
+            [(payout.transfer_reference, f'RCP_{payout.transfer_reference}', 4000) for payout in self.payouts],
+        )
+
+    def test_paystack_resubmission_skips_transfers_it_already_has(self):
+        Payout.objects.update(submission_attempts=1)
+        _, transfers = disbursements.claim_due_payouts(self.provider)[0]
+        self.assertEqual({transfer.attempt for transfer in transfers}, {2})
+
+        calls = self.paystack_submit(transfers, already_sent={self.payouts[0].transfer_reference})
+
+        self.assertEqual(sum(1 for call in calls if call[0] == 'GET'), 2)
+        self.assertEqual([transfer['reference'] for transfer in calls[-1]], [self.payouts[1].transfer_reference])
+
+        # Nothing left to send: no bulk calls at all
+        calls = self.paystack_submit(transfers, already_sent={payout.transfer_reference for payout in self.payouts})
+        self.assertEqual({method for method, *_ in calls}, {'GET'})
+
+    @override_settings(DISBURSEMENT_PROVIDER='')
+    def test_refuses_to_run_without_a_provider(self):
+        with mock.patch('accounts.disbursements._provider', None):
+            with self.assertRaises(ImproperlyConfigured):
+                disbursements.submit_due_payouts()
+            with self.assertRaises(ImproperlyConfigured):
+                disbursements.reconcile_batches()
+        self.assertFalse(DisbursementBatch.objects.exists())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REALTIME_BROKER='local',
+)
+class DailyPayoutTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('core.locks.get_backend', return_value=LocalBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.today = timezone.now().date()
+
+    def next_number(self):
+        return f'+23324500{User.objects.count():04d}'
+
+    def make_group(self, name, started_days_ago, verified_cycles=()):
+        group = SavingsGroup.objects.create(
+            admin=make_member(f'{name}-admin', self.next_number()), group_name=name,
+            contribution_amount=Decimal('20.00'), frequency='weekly', payout_timeline_days=7,
+            expected_members=2, current_members=2, status='active',
+            start_date=self.today - datetime.timedelta(days=started_days_ago),
+        )
+        for position in (1, 2):
+            member = make_member(f'{name}-{position}', self.next_number())
+            membership = GroupMembership.objects.create(user=member, group=group)
+            PayoutOrder.objects.create(group=group, membership=membership, position=position)
+            for cycle in verified_cycles:
+                Contribution.objects.create(
+                    membership=membership, amount=group.contribution_amount, cycle_number=cycle, is_verified=True
+                )
+        return group
+
+    def test_each_cycle_is_paid_out_once(self):
+        paid = self.make_group('paid', started_days_ago=7, verified_cycles=(1, 2))
+        short = self.make_group('short', started_days_ago=7, verified_cycles=(1,))
+
+        tasks.process_daily_payouts()
+        tasks.process_daily_payouts()
+
+        payout = Payout.objects.get(group=paid)
+        self.assertEqual((payout.cycle_number, payout.status), (2, 'notified'))
+        self.assertEqual(payout.beneficiary, PayoutOrder.objects.get(group=paid, position=2).membership.user)
+        self.assertEqual(payout.amount, Decimal('40.00'))
+        self.assertEqual(Payout.objects.get(group=short).status, 'pending')
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('kind', 'channel')),
+            [('incomplete_contributions', 'email'), ('payout', 'email'), ('payout', 'sms')],
+        )
+        self.assertEqual(UserNotification.objects.filter(user=payout.beneficiary, kind='payout').count(), 1)
+        self.assertEqual(UserNotification.objects.filter(user=short.admin, kind='incomplete_contributions').count(), 1)
+
+    def test_cycles_roll_over_on_the_payout_date(self):
+        boundary = self.make_group('boundary', started_days_ago=6)
+        mid_cycle = self.make_group('mid-cycle', started_days_ago=3)
+        self.assertEqual(boundary.current_cycle_number, 1)
+        self.assertEqual(boundary.next_payout_date, self.today + datetime.timedelta(days=1))
+
+        tomorrow = timezone.now() + datetime.timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            self.assertEqual(tasks.roll_over_group_cycles(), 1)
+            self.assertEqual(tasks.roll_over_group_cycles(), 0)
+
+        boundary.refresh_from_db()
+        self.assertEqual(boundary.current_cycle_number, 2)
+        self.assertEqual(boundary.next_payout_date, tomorrow.date() + datetime.timedelta(days=7))
+        self.assertEqual(
+            SavingsGroup.objects.filter(pk=mid_cycle.pk).values_list('current_cycle_number', 'next_payout_date').get(),
+            (1, self.today + datetime.timedelta(days=4)),
+        )
+
+
+@override_settings(DEBUG=False)
+class AbsoluteUrlTests(TestCase):
+
+    def setUp(self):
+        rendering.clear_url_caches()
+        self.addCleanup(rendering.clear_url_caches)
+        self.site = Site.objects.get_current()
+        self.site.domain = 'snappx.app'
+        self.site.save()
+
+    def test_patterns_are_reversed_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                rendering.absolute_url('group-detail', id=7), 'https://snappx.app' + reverse('group-detail', args=[7])
+            )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                rendering.absolute_url('group-detail', id=8), 'https://snappx.app' + reverse('group-detail', args=[8])
+            )
+
+    def test_changing_the_site_clears_the_cache(self):
+        rendering.absolute_url('dashboard')
+        self.site.domain = 'pay.snappx.app'
+        self.site.save()
+        self.assertEqual(rendering.absolute_url('dashboard'), 'https://pay.snappx.app' + reverse('dashboard'))
+
+        Site.objects.create(domain='other.example.com', name='Other').delete()
+        self.assertEqual(rendering.site_base_url.cache_info().currsize, 0)
+        self.assertEqual(rendering._url_pattern.cache_info().currsize, 0)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REALTIME_BROKER='local',
+)
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_member('reader', '+233246000001')
+
+    def push(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [feed.push(self.user.pk, 'payout', 'Payout', 'Processed') for _ in range(count)]
+
+    def test_pushes_increment_the_cached_count(self):
+        self.push()
+        self.assertEqual(feed.unread_count(self.user.pk), 1)
+
+        self.push(2)
+        with self.assertNumQueries(0):
+            self.assertEqual(feed.unread_count(self.user.pk), 3)
+
+    def test_uncached_count_is_recounted(self):
+        self.push(2)
+        self.assertIsNone(cache.get(f'feed:unread:{self.user.pk}'))
+        with self.assertNumQueries(1):
+            self.assertEqual(feed.unread_count(self.user.pk), 2)
+
+    def test_rolled_back_push_leaves_the_count_alone(self):
+        self.assertEqual(feed.unread_count(self.user.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                feed.push(self.user.pk, 'payout', 'Payout', 'Processed')
+                raise RuntimeError('rolled back')
+        self.assertEqual(feed.unread_count(self.user.pk), 0)
+
+    def test_marking_entries_read(self):
+        entries = self.push(3)
+        feed.unread_count(self.user.pk)
+
+        self.assertEqual(feed.mark_read(self.user.pk, [entries[0].pk]), 1)
+        self.assertEqual(feed.mark_read(self.user.pk, [entries[0].pk]), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(feed.unread_count(self.user.pk), 2)
+
+        self.assertEqual(feed.mark_read(self.user.pk), 2)
+        self.assertEqual(feed.unread_count(self.user.pk), 0)
+        self.assertFalse(UserNotification.objects.filter(user=self.user, is_read=False).exists())
+
+
+def brute_force_projection(schedules, first_day, days):
+    """Walks every group over every day of the window."""
+    counts, totals = [0] * days, [0] * days
+    for start_day, interval, pot in zip(
+        schedules.start_days.tolist(), schedules.intervals.tolist(), schedules.pots.tolist()
+    ):
+        for offset in range(days):
+            days_since_start = first_day.toordinal() + offset - start_day
+            if days_since_start >= 0 and days_since_start % interval == 0:
+                counts[offset] += 1
+                totals[offset] += pot
+    return counts, totals
+
+
+class ProjectionTests(SimpleTestCase):
+
+    def setUp(self):
+        self.first_day = datetime.date(2026, 3, 1)
+        # Groups that started long ago, just before the window, inside it and after it
+        rng = random.Random(30)
+        rows = [
+            (self.first_day.toordinal() + rng.randint(-400, 120), rng.choice((1, 7, 30)), rng.randint(1, 50) * 2000)
+            for _ in range(300)
+        ]
+        rows += [(self.first_day.toordinal() + offset, 7, 1000) for offset in (-7, -1, 0, 89, 90)]
+        # Beyond float64's exact integers, so a float sum would be off by a pesewa
+        rows += [(self.first_day.toordinal() + 3, 30, 2 ** 53 + 1)]
+        start_days, intervals, pots = zip(*rows)
+        self.schedules = projections.GroupSchedules(
+            start_days=np.array(start_days, dtype=np.int64),
+            intervals=np.array(intervals, dtype=np.int64),
+            pots=np.array(pots, dtype=np.int64),
+        )
+
+    def test_matches_a_day_by_day_walk(self):
+        for days in (1, 7, 30, 90, 95):
+            counts, totals = projections.project_daily_payouts(self.schedules, self.first_day, days)
+            self.assertEqual(
+                (counts.tolist(), totals.tolist()), brute_force_projection(self.schedules, self.first_day, days)
+            )
+
+    def test_totals_are_reported_in_cedis(self):
+        counts, totals = brute_force_projection(self.schedules, self.first_day, 90)
+        projected = projections.build_projection(self.first_day, 90, schedules=self.schedules)
+
+        self.assertEqual([day.day for day in projected][-1], self.first_day + datetime.timedelta(days=89))
+        self.assertEqual([day.payout_count for day in projected], counts)
+        self.assertEqual([day.total_amount for day in projected], [Decimal(total) / 100 for total in totals])
+
+
+class RenewalCountingBackend(LocalBackend):
+    """In-process locks that count renewals, and can report the lease as lost."""
+
+    def __init__(self, keep_lease=True):
+        super().__init__()
+        self.keep_lease = keep_lease
+        self.renewals = 0
+
+    def renew(self, name, ttl):
+        self.renewals += 1
+        return self.keep_lease
+
+
+@override_settings(METRICS_REDIS_URL='')
+class SingleFlightTests(SimpleTestCase):
+
+    def use(self, backend):
+        patcher = mock.patch('core.locks.get_backend', return_value=backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return backend
+
+    def lease_lost_count(self, name):
+        return metrics.snapshot().get(series_key('singleflight_lease_lost_total', {'task': name}), 0)
+
+    def test_overlapping_runs_are_skipped(self):
+        backend = self.use(LocalBackend())
+        started, finish = threading.Event(), threading.Event()
+
+        @single_flight('test-overlap', ttl=60)
+        def slow():
+            started.set()
+            finish.wait(5)
+            return 'done'
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(slow()))
+        first.start()
+        self.assertTrue(started.wait(5))
+        self.assertIsNone(slow())
+        finish.set()
+        first.join()
+
+        self.assertEqual(results, ['done'])
+        self.assertEqual(slow(), 'done')
+
+    def test_lease_is_renewed_while_running(self):
+        backend = self.use(RenewalCountingBackend())
+
+        @single_flight('test-renewal', ttl=0.03)
+        def slow():
+            time.sleep(0.1)
+
+        slow()
+        self.assertGreaterEqual(backend.renewals, 2)
+        self.assertEqual(backend.acquire('test-renewal', 60), 'test-renewal')
+
+    def test_lost_lease_is_reported_once(self):
+        backend = self.use(RenewalCountingBackend(keep_lease=False))
+        lost_before = self.lease_lost_count('test-lost')
+
+        @single_flight('test-lost', ttl=0.03)
+        def slow():
+            time.sleep(0.1)
+
+        slow()
+        self.assertEqual(backend.renewals, 1)
+        self.assertEqual(self.lease_lost_count('test-lost'), lost_before + 1)
+
+    def test_postgres_locks_hold_a_connection_of_their_own(self):
+        backend = PostgresAdvisoryBackend()
+        held, free = mock.Mock(), mock.Mock()
+        held.execute.return_value.fetchone.return_value = (True,)
+        free.execute.return_value.fetchone.return_value = (False,)
+
+        with mock.patch.object(PostgresAdvisoryBackend, '_connect', side_effect=[held, free]):
+            handle = backend.acquire('test-postgres', 60)
+            self.assertIsNone(backend.acquire('test-postgres', 60))
+        free.close.assert_called_once_with()
+
+        self.assertTrue(backend.renew(handle, 60))
+        held.close.assert_not_called()
+        backend.release(handle)
+        held.execute.assert_called_with("SELECT pg_advisory_unlock(%s)", [backend._lock_id('test-postgres')])
+        held.close.assert_called_once_with()
+
+    def test_lock_is_released_when_the_task_fails(self):
+        backend = self.use(LocalBackend())
+
+        @single_flight('test-failure', ttl=60)
+        def failing():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            failing()
+        self.assertEqual(backend.acquire('test-failure', 60), 'test-failure')
+
+
+class SmtpConnectionStandIn:
+    """Stand-in for an SMTP backend that drops the connection after ``drop_after`` sends."""
+
+    def __init__(self, drop_after=None):
+        self.drop_after = drop_after
+        self.sent = []
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def send_messages(self, messages):
+        if self.drop_after is not None and len(self.sent) >= self.drop_after:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.sent.extend(messages)
+        return len(messages)
+
+
+@override_settings(METRICS_REDIS_URL='')
+class MailerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.mailer = mail.NotificationMailer(batch_size=2)
+        self.connections = []
+
+    def use_connections(self, *connections):
+        self.connections.extend(connections)
+        patcher = mock.patch('accounts.mail.get_connection', side_effect=connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def messages(self, count):
+        return [mail.build_email('Payout', 'Processed', f'member{n}@example.com') for n in range(count)]
+
+    def test_connection_is_reused_between_sends(self):
+        self.use_connections(SmtpConnectionStandIn())
+        self.assertEqual(self.mailer.send_many(self.messages(3)), 3)
+        self.assertTrue(self.mailer.send(self.messages(1)[0]))
+
+        stats = self.mailer.stats()
+        self.assertEqual((stats['messages_sent'], stats['connections_opened'], stats['connection_reuses']), (4, 1, 2))
+
+    def test_dropped_connection_is_replaced(self):
+        dropped, fresh = SmtpConnectionStandIn(drop_after=2), SmtpConnectionStandIn()
+        self.use_connections(dropped, fresh)
+
+        with self.assertLogs('accounts.mail', 'WARNING'):
+            self.assertEqual(self.mailer.send_many(self.messages(4)), 4)
+        self.assertTrue(dropped.closed)
+        self.assertEqual((len(dropped.sent), len(fresh.sent)), (2, 2))
+        self.assertEqual(self.mailer.stats()['connections_opened'], 2)
+
+    def test_messages_sent_before_a_drop_are_not_sent_again(self):
+        dropped, fresh = SmtpConnectionStandIn(drop_after=1), SmtpConnectionStandIn()
+        self.use_connections(dropped, fresh)
+        messages = self.messages(3)
+
+        with self.assertLogs('accounts.mail', 'WARNING'):
+            self.assertEqual(mail.NotificationMailer(batch_size=10).send_many(messages), 3)
+        self.assertEqual(dropped.sent + fresh.sent, messages)
+
+    def test_gives_up_after_reconnecting_once(self):
+        self.use_connections(SmtpConnectionStandIn(drop_after=0), SmtpConnectionStandIn(drop_after=0))
+        with self.assertRaises(smtplib.SMTPServerDisconnected), self.assertLogs('accounts.mail', 'WARNING'):
+            self.mailer.send_many(self.messages(1))
+        self.assertTrue(all(connection.closed for connection in self.connections))
+
+    def test_idle_connection_is_replaced(self):
+        stale, fresh = SmtpConnectionStandIn(), SmtpConnectionStandIn()
+        self.use_connections(stale, fresh)
+        self.mailer.send_many(self.messages(1))
+
+        self.mailer._last_used -= self.mailer.max_idle_seconds + 1
+        self.mailer.send_many(self.messages(1))
+        self.assertTrue(stale.closed)
+        self.assertEqual((len(stale.sent), len(fresh.sent)), (1, 1))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REALTIME_BROKER='local',
+    NOTIFICATION_LEASE_SECONDS=300,
+    NOTIFICATION_RETRY_BASE_SECONDS=60,
+    NOTIFICATION_RETRY_MAX_SECONDS=3600,
+    NOTIFICATION_MAX_ATTEMPTS=3,
+)
+class OutboxTests(TestCase):
+
+    def test_an_event_is_queued_once(self):
+        self.assertTrue(outbox.enqueue('payout', 'payout:1:1:1', {'cycle': 1}))
+        self.assertFalse(outbox.enqueue('payout', 'payout:1:1:1', {'cycle': 1}))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_each_rejection_of_a_resubmitted_request_is_notified(self):
+        group = SavingsGroup.objects.create(
+            admin=make_member('organiser', '+233244000000'), group_name='Circle',
+            contribution_amount=Decimal('20.00'), frequency='weekly', payout_timeline_days=7, expected_members=3,
+        )
+        join_request = GroupJoinRequest.objects.create(user=make_member('applicant', '+233244000001'), group=group)
+
+        join_request.handled_at = timezone.now()
+        self.assertTrue(notify_join_response(join_request, 'rejected'))
+        self.assertFalse(notify_join_response(join_request, 'rejected'))
+        # Re-submitted, then rejected again
+        join_request.handled_at += datetime.timedelta(minutes=5)
+        self.assertTrue(notify_join_response(join_request, 'rejected'))
+
+        self.assertEqual(Notification.objects.filter(channel='email').count(), 2)
+        self.assertEqual(UserNotification.objects.filter(user=join_request.user).count(), 2)
+
+    def test_claimed_notifications_are_leased(self):
+        for index in range(3):
+            outbox.enqueue('payout', f'payout:1:{index}:1', {})
+        outbox.enqueue('payout', 'sms:payout:1:0:1', {}, channel='sms')
+
+        self.assertEqual(len(outbox.claim_due(2)), 2)
+        self.assertEqual(len(outbox.claim_due(2)), 1)
+        self.assertEqual(outbox.claim_due(2), [])
+
+        # Rows held by a drainer that died are claimed again once the lease runs out
+        later = timezone.now() + datetime.timedelta(seconds=301)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(len(outbox.claim_due(10)), 3)
+        self.assertEqual(len(outbox.claim_due(10, channel='sms')), 1)
+
+    def test_failures_back_off_until_the_last_attempt(self):
+        outbox.enqueue('payout', 'payout:1:1:1', {})
+        notification = Notification.objects.get()
+        with mock.patch('accounts.outbox.random.uniform', return_value=1.0):
+            for attempt, delay in enumerate([60, 120], start=1):
+                before = timezone.now()
+                outbox.mark_failed(notification, 'SMTP down')
+                notification.refresh_from_db()
+                self.assertEqual((notification.status, notification.attempts), ('pending', attempt))
+                self.assertAlmostEqual((notification.next_attempt_at - before).total_seconds(), delay, delta=1)
+
+            outbox.mark_failed(notification, 'SMTP down')
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 3))
+        self.assertEqual(notification.last_error, 'SMTP down')
+
+    def test_permanent_failures_are_not_retried(self):
+        outbox.enqueue('payout', 'payout:1:1:1', {})
+        notification = Notification.objects.get()
+        outbox.mark_failed(notification, 'Nothing to send', permanent=True)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 1))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SMS_RATE_LIMIT_PER_MINUTE=2,
+    SMS_BATCH_SIZE=100,
+)
+class SmsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = sms.FakeSmsProvider()
+        patcher = mock.patch('accounts.sms._provider', self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.group = SavingsGroup.objects.create(
+            admin=make_member('organiser', '+233245000000'), group_name='Texters',
+            contribution_amount=Decimal('20.00'), frequency='weekly', payout_timeline_days=7, expected_members=3,
+        )
+
+    def queue_payout_sms(self, cycle):
+        beneficiary = make_member(f'member{cycle}', f'+23324500000{cycle}')
+        outbox.enqueue('payout', f'sms:payout:{self.group.pk}:{cycle}:{beneficiary.pk}', {
+            'beneficiary_id': beneficiary.pk, 'group_id': self.group.pk, 'cycle': cycle, 'amount': '60.00',
+        }, channel='sms')
+
+    def test_rate_limit_window_is_shared_per_sender(self):
+        limiter = sms.SenderRateLimiter('SnappX', limit=3)
+        with mock.patch('accounts.sms.time.time', return_value=600.0):
+            self.assertEqual(limiter.acquire(2), 2)
+            self.assertEqual(sms.SenderRateLimiter('SnappX', limit=3).acquire(2), 1)
+            self.assertEqual(limiter.acquire(1), 0)
+            self.assertEqual(sms.SenderRateLimiter('Other', limit=3).acquire(1), 1)
+            self.assertEqual(limiter.window_resets_in(), 60)
+        with mock.patch('accounts.sms.time.time', return_value=660.0):
+            self.assertEqual(limiter.acquire(2), 2)
+
+    def test_sends_over_the_limit_wait_for_the_next_window(self):
+        for cycle in (1, 2, 3):
+            self.queue_payout_sms(cycle)
+
+        delivered = tasks._deliver_sms(outbox.claim_due(10, channel='sms'))
+
+        self.assertEqual(delivered, 2)
+        self.assertEqual(self.provider.calls, 1)
+        # Delivery records: the number each went to and the provider's message id
+        sent = Notification.objects.filter(status='sent')
+        self.assertEqual(
+            sorted(sent.values_list('recipient', 'provider_reference')),
+            sorted((message.number, f'fake-{index}') for index, message in enumerate(self.provider.sent, start=1)),
+        )
+        deferred = Notification.objects.get(status='pending')
+        self.assertEqual(deferred.attempts, 0)
+        self.assertGreater(deferred.next_attempt_at, timezone.now())
+
+    def test_rejected_numbers_are_not_retried(self):
+        self.provider.failing_numbers = {'+233245000001'}
+        self.queue_payout_sms(1)
+
+        self.assertEqual(tasks._deliver_sms(outbox.claim_due(10, channel='sms')), 0)
+
+        notification = Notification.objects.get()
+        self.assertEqual((notification.status, notification.last_error), ('failed', 'Invalid number'))
+
+    @override_settings(SMS_PROVIDER='')
+    def test_sms_is_off_without_a_provider(self):
+        self.queue_payout_sms(1)
+        tasks._queue('payout', 'payout:1:2:3', {'cycle': 2}, channels=('email', 'sms'))
+        self.assertEqual(sorted(Notification.objects.values_list('channel', flat=True)), ['email', 'sms'])
+
+        # Rows queued before SMS was switched off are left for later
+        with mock.patch('accounts.sms._provider', None), \
+                mock.patch('core.locks.get_backend', return_value=LocalBackend()), \
+                mock.patch('accounts.tasks._deliver_emails', return_value=0):
+            self.assertEqual(tasks.drain_notification_outbox(), 0)
+        self.assertEqual(Notification.objects.get(channel='sms').status, 'pending')
+
+    def test_dawurobo_bulk_send(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={'data': [
+                {'reference': '1', 'status': 'success', 'messageid': 'dw-1'},
+                {'reference': '2', 'status': 'failed', 'message': 'Invalid number'},
+            ]})
+
+        provider = sms.DawuroboSmsProvider(transport=httpx.MockTransport(handler))
+        self.addCleanup(provider.close)
+        messages = [sms.SmsMessage(str(n), f'23324500000{n}', f'Message {n}') for n in (1, 2, 3)]
+        results = provider.send_bulk('SnappX', messages)
+
+        self.assertEqual(
+            [(result.success, result.provider_reference, result.error) for result in results],
+            [(True, 'dw-1', ''), (False, '', 'Invalid number'), (True, '', '')],
+        )
+        [request] = requests
+        self.assertEqual(str(request.url), f'{provider.base_url}/bulk')
+        self.assertEqual(request.headers['x-api-key'], settings.DAWUROBO_API_KEY)
+        self.assertEqual(json.loads(request.content), {'senderid': 'SnappX', 'messages': [
+            {'number': message.number, 'message': message.text, 'reference': message.reference}
+            for message in messages
+        ]})
+
+    def test_dawurobo_errors_fail_the_batch(self):
+        provider = sms.DawuroboSmsProvider(transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        self.addCleanup(provider.close)
+        with self.assertRaises(httpx.HTTPStatusError):
+            provider.send_bulk('SnappX', [sms.SmsMessage('1', '233245000001', 'Hello')])
+
+
+class RedisStandIn:
+    """
+    In-process stand-in for the Redis pub/sub the real-time broker uses:
+    publish, subscribe, and a restart that drops every pub/sub connection.
+    """
+
+    def __init__(self):
+        self.connections = []
+
+    def publish(self, channel, message):
+        for connection in self.connections:
+            if channel in connection.channels:
+                connection.inbox.put_nowait({
+                    'type': 'message', 'channel': channel.encode(), 'data': message.encode(),
+                })
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        connection = PubSubStandIn()
+        self.connections.append(connection)
+        return connection
+
+    def restart(self):
+        for connection in self.connections:
+            connection.inbox.put_nowait(RedisConnectionError("Connection reset by peer"))
+        self.connections = []
+
+    async def aclose(self):
+        pass
+
+
+class PubSubStandIn:
+
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def listen(self):
+        while True:
+            item = await self.inbox.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def aclose(self):
+        pass
+
+
+@override_settings(REALTIME_STREAM_BUFFER=10)
+class RealtimeBrokerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = RedisStandIn()
+        for target in ('accounts.realtime.redis.Redis.from_url', 'accounts.realtime.aioredis.Redis.from_url'):
+            patcher = mock.patch(target, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.broker = realtime.RedisBroker('redis://stand-in')
+        self.broker.reconnect_delay = 0
+
+    def subscribed(self, user_id):
+        return any(realtime._channel(user_id) in connection.channels for connection in self.redis.connections)
+
+    async def wait_until_subscribed(self, user_id):
+        for _ in range(100):
+            if self.subscribed(user_id):
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"Never subscribed to user {user_id}")
+
+    async def test_messages_fan_out_to_each_stream_of_the_user(self):
+        async with self.broker.subscription(1) as first, self.broker.subscription(1) as second, \
+                self.broker.subscription(2) as other:
+            await self.wait_until_subscribed(1)
+            self.broker.publish(1, 'hello')
+            self.assertEqual(await asyncio.wait_for(first.get(), 1), 'hello')
+            self.assertEqual(await asyncio.wait_for(second.get(), 1), 'hello')
+            await asyncio.sleep(0.01)
+            self.assertTrue(other.empty())
+        self.assertFalse(self.subscribed(1))
+        self.assertFalse(self.subscribed(2))
+
+    async def test_open_streams_are_resubscribed_after_a_reconnect(self):
+        async with self.broker.subscription(1) as stream:
+            await self.wait_until_subscribed(1)
+            self.redis.restart()
+            self.assertFalse(self.subscribed(1))
+
+            await self.wait_until_subscribed(1)
+            self.broker.publish(1, 'after restart')
+            self.assertEqual(await asyncio.wait_for(stream.get(), 1), 'after restart')
+
+    async def test_a_late_unsubscribe_keeps_a_reopened_stream(self):
+        async with self.broker.subscription(1) as stream:
+            await self.wait_until_subscribed(1)
+            # The previous stream of the user closed just before this one opened
+            await self.broker._on_last_listener(1)
+            self.broker.publish(1, 'still here')
+            self.assertEqual(await asyncio.wait_for(stream.get(), 1), 'still here')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATELIMIT_ENABLE=False,
+    AXES_ENABLED=False,
+    REALTIME_BROKER='local',
+    METRICS_REDIS_URL='',
+)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_member('watcher', '+233248000001'))
+        self.before = metrics.snapshot()
+
+    def recorded(self, name, **labels):
+        key = series_key(name, labels)
+        return metrics.snapshot().get(key, 0) - self.before.get(key, 0)
+
+    def test_responses_and_queries_are_counted_per_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('notification-list')).status_code, 200)
+        # Read before the next request resets the query log
+        query_count = len(queries)
+        self.client.get('/api/accounts/no-such-page/')
+
+        view = {'view': 'notification-list'}
+        self.assertEqual(self.recorded('http_responses_total', **view, method='GET', status='2xx'), 1)
+        self.assertEqual(self.recorded('http_request_duration_seconds_count', **view, method='GET'), 1)
+        self.assertEqual(self.recorded('http_request_db_queries_count', **view), 1)
+        self.assertEqual(self.recorded('http_request_db_queries_sum', **view), query_count)
+        self.assertEqual(self.recorded('http_responses_total', view='unmatched', method='GET', status='4xx'), 1)
+
+    def test_outbound_calls_are_counted(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text='success'))
+        client = httpx.AsyncClient(base_url=otp.DAWUROBO_BASE, transport=transport)
+        with mock.patch('accounts.otp._new_client', return_value=client):
+            response = self.client.post(reverse('otp-send'), {'phone_number': '+233200000001'})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        labels = {'view': 'otp-send', 'service': 'dawurobo'}
+        self.assertEqual(self.recorded('http_request_outbound_calls_total', **labels), 1)
+        self.assertGreater(self.recorded('http_request_outbound_seconds_total', **labels), 0)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REALTIME_TICKET_SECONDS=30,
+)
+class StreamTicketTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_member('listener', '+233249000001')
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+
+    def stream_user(self, **params):
+        request = RequestFactory().get(reverse('event-stream'), params)
+        return async_to_sync(views._authenticate_stream)(request)
+
+    def test_a_ticket_opens_one_stream(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = client.post(reverse('event-stream-ticket'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], 30)
+
+        self.assertEqual(self.stream_user(ticket=response.data['ticket']), self.user)
+        self.assertIsNone(self.stream_user(ticket=response.data['ticket']))
+        self.assertIsNone(self.stream_user(ticket='made-up'))
+
+    def test_access_tokens_are_not_accepted_in_the_url(self):
+        self.assertIsNone(self.stream_user(token=self.access_token))
+        response = self.client.get(reverse('event-stream'), {'token': self.access_token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_tickets_are_refused(self):
+        ticket = realtime.issue_stream_ticket(self.user.pk)
+        cache.delete(f'stream-ticket:{ticket}')
+        self.assertIsNone(self.stream_user(ticket=ticket))
+
+
+class OtpClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.created = []
+        for target, value in (
+            ('accounts.otp._new_client', self.new_client),
+            ('accounts.otp._clients', weakref.WeakKeyDictionary()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def new_client(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text='success'))
+        client = httpx.AsyncClient(base_url=otp.DAWUROBO_BASE, transport=transport)
+        self.created.append(client)
+        return client
+
+    def test_wsgi_requests_close_their_client(self):
+        # Each request of a WSGI worker runs on an event loop of its own
+        for _ in range(2):
+            self.assertTrue(async_to_sync(otp.send_otp)('+233246000000')['success'])
+        self.assertEqual(len(self.created), 2)
+        self.assertTrue(all(client.is_closed for client in self.created))
+
+    @mock.patch('accounts.otp._keep_clients_open', True)
+    async def test_asgi_requests_share_one_open_client(self):
+        self.assertTrue((await otp.send_otp('+233246000000'))['success'])
+        self.assertTrue(await otp.verify_and_invalidate_otp('+233246000000', '123456'))
+        self.assertEqual(len(self.created), 1)
+        self.assertFalse(self.created[0].is_closed)
+        await self.created[0].aclose()
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATELIMIT_ENABLE=False,
+    AXES_ENABLED=False,
+    REALTIME_BROKER='local',
+    PROFILE_PICTURE_REQUEUE_SECONDS=600,
+)
+class ProfilePictureTests(TransactionTestCase):
+    # Real commits, so the upload is enqueued the way it is in production
+
+    def setUp(self):
+        for target, kwargs in (
+            ('accounts.otp._post', {'side_effect': dawurobo_ok}),
+            ('core.locks.get_backend', {'return_value': LocalBackend()}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_signup_succeeds_with_the_broker_down(self):
+        data = {**ENDPOINTS['signup'].data(self), 'profile_picture': png('me.png')}
+        with mock.patch('accounts.tasks.process_profile_picture.delay', side_effect=OperationalError('Broker down')):
+            response = APIClient().post(reverse('signup'), data, format='multipart')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(StagedProfilePicture.objects.filter(profile__user__email=data['email']).exists())
+
+    def test_sweep_enqueues_pictures_left_behind(self):
+        left_behind, _ = [
+            StagedProfilePicture.objects.create(profile=make_member(name, number).profile, image=b'png')
+            for name, number in (('early', '+233247000001'), ('late', '+233247000002'))
+        ]
+        StagedProfilePicture.objects.filter(pk=left_behind.pk).update(
+            created_at=timezone.now() - datetime.timedelta(seconds=601)
+        )
+
+        with mock.patch('accounts.tasks.process_profile_picture.delay') as delay:
+            self.assertEqual(tasks.requeue_staged_profile_pictures(), 1)
+        delay.assert_called_once_with(left_behind.pk)
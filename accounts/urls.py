@@ -1,4 +1,4 @@
-from .views import ContributeView, CreateSavingsGroupView, DashboardView, MyGroupsListView, GroupDetailView, AllGroupsListView, GroupJoinRequestView, GroupRequestsListView, GroupRequestActionView
+from .views import ContributeView, CreateSavingsGroupView, DashboardView, MyGroupsListView, GroupDetailView, AllGroupsListView, GroupJoinRequestView, GroupRequestsListView, GroupRequestActionView, NotificationListView, NotificationUnreadCountView, NotificationMarkReadView, EventStreamTicketView, event_stream
 
 from django.urls import path
 
@@ -16,4 +16,13 @@ urlpatterns = [
 
     # Dashboard endpoint
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+
+    # In-app notification feed
+    path('notifications/', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('notifications/mark-read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
+
+    # Real-time event stream (Server-Sent Events, needs the ASGI server)
+    path('events/', event_stream, name='event-stream'),
+    path('events/ticket/', EventStreamTicketView.as_view(), name='event-stream-ticket'),
 ]
@@ -1,34 +1,45 @@
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample, OpenApiTypes
-from .models import SavingsGroup, Profile, GroupJoinRequest, GroupMembership, Contribution, PayoutOrder
-from .tasks import send_dawurobo_otp_sync, verify_and_invalidate_otp_sync, send_group_join_request_email_async, send_group_join_response_email_async
+from .models import SavingsGroup, Profile, StagedProfilePicture, validate_image_extension, GroupJoinRequest, GroupMembership, Contribution, PayoutOrder, UserNotification
+from .tasks import notify_join_request, notify_join_response, process_profile_picture
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import serializers as rest_serializers
-from django.views.decorators.cache import never_cache
-from django.utils.decorators import method_decorator
 from rest_framework.parsers import MultiPartParser
 from django.db import transaction, IntegrityError
-from django_ratelimit.decorators import ratelimit
-from rest_framework.filters import SearchFilter
+from django.core.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from .permissions import IsGroupAdmin
+from .filters import SavingsGroupCatalogFilter
+from . import feed, otp, realtime
+from rest_framework.pagination import CursorPagination
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import F, Q, Sum
 from dateutil.relativedelta import relativedelta
 
 from .serializers import (
     SavingsGroupCreateSerializer, SavingsGroupSerializer, SendOTPSerializer, VerifyOTPSerializer,
     CustomTokenObtainPairSerializer, ForgotPasswordSerializer, ResetPasswordSerializer, ProfileSerializer,
-    FullSignupSerializer, GroupJoinRequestSerializer, GroupJoinActionSerializer, GroupDashboardCardSerializer, DashboardResponseSerializer
+    FullSignupSerializer, GroupJoinRequestSerializer, GroupJoinActionSerializer, GroupDashboardCardSerializer, DashboardResponseSerializer,
+    UserNotificationSerializer, MarkNotificationsReadSerializer, UnreadCountSerializer
 )
 
-import cloudinary.uploader
+import asyncio
 import logging
 
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from core.ratelimit import aratelimit
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -38,12 +49,12 @@ class CustomLoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class ForgotPasswordView(APIView):
+class ForgotPasswordView(AsyncAPIView):
     permission_classes = [AllowAny]
     serializer_class = ForgotPasswordSerializer
 
-    @method_decorator(ratelimit(key='ip', rate='10/m', method='POST', block=True))
-    def post(self, request):
+    @aratelimit(key='ip', rate='10/m', method='POST')
+    async def post(self, request):
         serializer = ForgotPasswordSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -52,15 +63,15 @@ class ForgotPasswordView(APIView):
 
         try:
             if '@' in login_field:
-                user = User.objects.select_related('profile').get(email=login_field)
+                user = await User.objects.select_related('profile').aget(email=login_field)
             else:
-                user = User.objects.select_related('profile').get(profile__momo_number=login_field)
+                user = await User.objects.select_related('profile').aget(profile__momo_number=login_field)
         except User.DoesNotExist:
             return Response({"error": "User not found with this email or phone"},
                             status=status.HTTP_404_NOT_FOUND)
 
         momo_number = str(user.profile.momo_number)
-        result = send_dawurobo_otp_sync(momo_number)
+        result = await otp.send_otp(momo_number)
 
         if result.get("success"):
             return Response({
@@ -72,7 +83,37 @@ class ForgotPasswordView(APIView):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@method_decorator(never_cache, name='dispatch')
+@sync_to_async
+@transaction.atomic
+def _create_signup_account(data, email, momo_number, profile_picture):
+    user = User.objects.create_user(
+        email=email,
+        username=email.split('@')[0],
+        password=data['password'],
+        is_verified=False
+    )
+    profile = Profile.objects.create(
+        user=user,
+        full_name=data['full_name'],
+        date_of_birth=data['date_of_birth'],
+        user_type=data['user_type'],
+        ghana_post_address=data['ghana_post_address'],
+        momo_provider=data['momo_provider'],
+        momo_number=momo_number,
+        momo_name=data['momo_name']
+    )
+    if profile_picture is not None:
+        # Resized and uploaded to Cloudinary in the background, so signup
+        # doesn't wait on the image
+        staged = StagedProfilePicture.objects.create(
+            profile=profile, image=profile_picture.read(), file_name=profile_picture.name
+        )
+        # Robust: with the broker down the account still stands; the staged
+        # picture sweep enqueues it later
+        transaction.on_commit(lambda: process_profile_picture.delay(staged.pk), robust=True)
+    return user
+
+
 @extend_schema(
     request=FullSignupSerializer,
     responses={
@@ -90,12 +131,11 @@ class ForgotPasswordView(APIView):
     description="Complete user and profile registration, including optional file upload. Triggers phone verification.",
     tags=['Authentication & Registration']
 )
-class FullSignupView(APIView):
+class FullSignupView(AsyncAPIView):
     permission_classes = [AllowAny]
     parser_classes = [MultiPartParser]
 
-    @transaction.atomic
-    def post(self, request):
+    async def post(self, request):
         data = request.data
         required_fields = [
             'email', 'password', 'password2', 'full_name', 'date_of_birth',
@@ -118,74 +158,52 @@ class FullSignupView(APIView):
         momo_number = str(data['momo_number']).strip()
 
         # Uniqueness checks
-        if User.objects.filter(email=email).exists():
+        if await User.objects.filter(email=email).aexists():
             return Response({"error": "This email is already registered"}, status=400)
-        if Profile.objects.filter(momo_number=momo_number).exists():
+        if await Profile.objects.filter(momo_number=momo_number).aexists():
             return Response({"error": "This MoMo number is already registered"}, status=400)
 
         # Handle profile picture
-        profile_picture_url = None
-        if 'profile_picture' in request.FILES:
+        profile_picture = request.FILES.get('profile_picture')
+        if profile_picture is not None:
             try:
-                upload_result = cloudinary.uploader.upload(
-                    request.FILES['profile_picture'],
-                    folder="snappx/profiles/",
-                    transformation=[
-                        {'width': 500, 'height': 500, 'crop': 'limit'},
-                        {'quality': "auto"}
-                    ]
-                )
-                profile_picture_url = upload_result.get('secure_url')
-                logger.info(f"Profile picture uploaded: {profile_picture_url}")
-            except Exception as e:
-                logger.warning(f"Cloudinary upload failed (continuing without photo): {e}")
-        try:
-            with transaction.atomic():
-                # Create user
-                user = User.objects.create_user(
-                    email=email,
-                    username=email.split('@')[0],
-                    password=data['password'],
-                    is_verified=False
-                )
-
-                # Create profile
-                Profile.objects.create(
-                    user=user,
-                    full_name=data['full_name'],
-                    date_of_birth=data['date_of_birth'],
-                    user_type=data['user_type'],
-                    ghana_post_address=data['ghana_post_address'],
-                    profile_picture=profile_picture_url,
-                    momo_provider=data['momo_provider'],
-                    momo_number=momo_number,
-                    momo_name=data['momo_name']
-                )
-
-                # Send OTP via Dawurobo
-                result = send_dawurobo_otp_sync(momo_number)
-
-                if not result.get("success"):
-                    raise Exception("OTP sending failed")
+                validate_image_extension(profile_picture)
+            except ValidationError as e:
+                return Response({"error": e.messages[0]}, status=400)
+            if profile_picture.size > settings.PROFILE_PICTURE_MAX_BYTES:
+                return Response({
+                    "error": f"Profile picture must be under {settings.PROFILE_PICTURE_MAX_BYTES // (1024 * 1024)} MB"
+                }, status=400)
 
+        try:
+            user = await _create_signup_account(data, email, momo_number, profile_picture)
         except IntegrityError:
             return Response({"error": "Email or phone already in use"}, status=400)
         except Exception as e:
             logger.error(f"Signup failed: {e}")
             return Response({"error": "Account creation failed. Please try again."}, status=500)
 
+        # Sent after the commit rather than inside the transaction, so no
+        # connection sits idle in a transaction while Dawurobo answers
+        result = await otp.send_otp(momo_number)
+        if not result.get("success"):
+            logger.error("Signup failed: OTP sending failed")
+            await user.adelete()
+            return Response({"error": "Account creation failed. Please try again."}, status=500)
+
         return Response({
             "message": "Account created successfully! OTP sent to your phone.",
             "phone": momo_number,
             "next_step": "verify_otp"
         }, status=201)
 
-@method_decorator([never_cache, ratelimit(key='ip', rate='5/m', method='POST', block=True)], name='dispatch')
-class ResetPasswordView(APIView):
+
+class ResetPasswordView(AsyncAPIView):
     permission_classes = [AllowAny]
     serializer_class = ResetPasswordSerializer
 
-    def post(self, request):
+    @aratelimit(key='ip', rate='5/m', method='POST')
+    async def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -194,32 +212,33 @@ class ResetPasswordView(APIView):
         code = serializer.validated_data['code']
         new_password = serializer.validated_data['password']
 
-        if not verify_and_invalidate_otp_sync(phone, code):
+        if not await otp.verify_and_invalidate_otp(phone, code):
             return Response({"error": "Invalid or expired OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            profile = Profile.objects.select_related('user').get(momo_number=phone)
-            user = profile.user
-            user.set_password(new_password)
-            user.save(update_fields=['password'])
-            logger.info(f"Password reset successful for {user.email} ({phone})")
-            return Response({"message": "Password reset successful. You can now log in."})
+            profile = await Profile.objects.select_related('user').aget(momo_number=phone)
         except Profile.DoesNotExist:
             return Response({"error": "Invalid request"}, status=status.HTTP_400_BAD_REQUEST)
 
+        user = profile.user
+        await sync_to_async(user.set_password, thread_sensitive=False)(new_password)
+        await user.asave(update_fields=['password'])
+        logger.info(f"Password reset successful for {user.email} ({phone})")
+        return Response({"message": "Password reset successful. You can now log in."})
+
 
-class SendOTPView(APIView):
+class SendOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
     serializer_class = SendOTPSerializer
 
-    @method_decorator(ratelimit(key='ip', rate='10/m', method='POST', block=True))
-    def post(self, request):
+    @aratelimit(key='ip', rate='10/m', method='POST')
+    async def post(self, request):
         serializer = SendOTPSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
 
         phone = serializer.validated_data['phone_number']
-        result = send_dawurobo_otp_sync(phone)
+        result = await otp.send_otp(phone)
 
         if result.get("success"):
             return Response({"message": "OTP sent again!"}, status=200)
@@ -227,11 +246,11 @@ class SendOTPView(APIView):
             return Response({"error": "Failed to send OTP"}, status=500)
 
 
-class VerifyOTPView(APIView):
+class VerifyOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
     serializer_class = VerifyOTPSerializer
 
-    def post(self, request):
+    async def post(self, request):
         serializer = VerifyOTPSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
@@ -239,11 +258,11 @@ class VerifyOTPView(APIView):
         phone = serializer.validated_data['phone_number']
         code = serializer.validated_data['code']
 
-        if verify_and_invalidate_otp_sync(phone, code):
+        if await otp.verify_and_invalidate_otp(phone, code):
             try:
-                profile = Profile.objects.get(momo_number=phone)
+                profile = await Profile.objects.select_related('user').aget(momo_number=phone)
                 profile.user.is_verified = True
-                profile.user.save(update_fields=['is_verified'])
+                await profile.user.asave(update_fields=['is_verified'])
                 return Response({
                     "success": True,
                     "message": "Welcome to SnappX! Your account is verified."
@@ -264,6 +283,7 @@ class MeViewResponseSerializer(rest_serializers.Serializer):
 
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
+    read_from_replica = True
     @extend_schema(
         responses={200: MeViewResponseSerializer},
         description="Retrieves the current authenticated user's details and profile data.",
@@ -324,6 +344,7 @@ class MyGroupsListView(generics.ListAPIView):
     """Groups where user is the admin"""
     serializer_class = SavingsGroupSerializer
     permission_classes = [IsAuthenticated]
+    read_from_replica = True
 
     def get_queryset(self):
         return SavingsGroup.objects.filter(admin=self.request.user).select_related('admin__profile')
@@ -350,11 +371,12 @@ class GroupDetailView(generics.RetrieveAPIView):
     """Single group detail"""
     serializer_class = SavingsGroupSerializer
     permission_classes = [IsAuthenticated]
+    read_from_replica = True
     lookup_field = 'id'
 
     def get_queryset(self):
         user = self.request.user
-        return SavingsGroup.objects.filter(admin=user)
+        return SavingsGroup.objects.filter(admin=user).select_related('admin__profile')
 
 @extend_schema(
     description="Lists all Active savings groups across the platform, allowing filtering and searching.",
@@ -378,6 +400,36 @@ class GroupDetailView(generics.RetrieveAPIView):
             location=OpenApiParameter.QUERY,
             description='Filter by exact expected number of members.'
         ),
+        OpenApiParameter(
+            name='min_amount',
+            type={'type': 'number'},
+            location=OpenApiParameter.QUERY,
+            description='Minimum contribution amount (inclusive).'
+        ),
+        OpenApiParameter(
+            name='max_amount',
+            type={'type': 'number'},
+            location=OpenApiParameter.QUERY,
+            description='Maximum contribution amount (inclusive).'
+        ),
+        OpenApiParameter(
+            name='min_open_seats',
+            type={'type': 'integer'},
+            location=OpenApiParameter.QUERY,
+            description='Only groups with at least this many open seats (expected minus current members).'
+        ),
+        OpenApiParameter(
+            name='max_days_to_payout',
+            type={'type': 'integer'},
+            location=OpenApiParameter.QUERY,
+            description='Only groups whose next payout is within this many days.'
+        ),
+        OpenApiParameter(
+            name='ordering',
+            type={'type': 'string'},
+            location=OpenApiParameter.QUERY,
+            description='Sort by contribution_amount, open_seats, next_payout_date or created_at. Prefix with "-" for descending.'
+        ),
     ],
     examples=[
         OpenApiExample(
@@ -389,6 +441,17 @@ class GroupDetailView(generics.RetrieveAPIView):
             },
             request_only=True
         ),
+        OpenApiExample(
+            name='Open Seats In Budget Example',
+            description='Groups with open seats, ₵50–₵200 per contribution, most open seats first.',
+            value={
+                'min_open_seats': 1,
+                'min_amount': 50,
+                'max_amount': 200,
+                'ordering': '-open_seats'
+            },
+            request_only=True
+        ),
     ],
     responses={
         200: SavingsGroupSerializer(many=True),
@@ -396,20 +459,25 @@ class GroupDetailView(generics.RetrieveAPIView):
     }
 )
 class AllGroupsListView(generics.ListAPIView):
-    """Lists all active savings groups for the platform, with filtering and searching."""
+    """Lists all active savings groups for the platform, with filtering, searching and ordering."""
     serializer_class = SavingsGroupSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    read_from_replica = True
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
 
-    filterset_fields = ['frequency', 'expected_members', 'contribution_amount']
+    filterset_class = SavingsGroupCatalogFilter
 
     search_fields = ['group_name', 'description']
 
+    ordering_fields = ['contribution_amount', 'open_seats', 'next_payout_date', 'created_at']
+    ordering = ['-created_at']
+
     def get_queryset(self):
         # Only show groups that have been approved by an admin
         return (
             SavingsGroup.objects
             .filter(status='active')
+            .annotate(open_seats=F('expected_members') - F('current_members'))
             .select_related('admin__profile')
         )
 
@@ -460,7 +528,7 @@ class GroupJoinRequestView(APIView):
                 existing_request.handled_by = None
                 existing_request.save(update_fields=['status', 'requested_at', 'handled_at', 'handled_by'])
 
-                send_group_join_request_email_async.delay(existing_request.id)
+                notify_join_request(existing_request)
 
                 return Response({"message": f"Previous request re-submitted to admin of {group.group_name}."},
                                 status=status.HTTP_200_OK)
@@ -469,7 +537,7 @@ class GroupJoinRequestView(APIView):
             # 4. No request exists yet, so create a new one
             new_request = GroupJoinRequest.objects.create(user=user, group=group, status='pending')
 
-            send_group_join_request_email_async.delay(new_request.id)
+            notify_join_request(new_request)
 
             return Response({"message": f"Join request sent to admin of {group.group_name}. The admin has been notified via email."},
                             status=status.HTTP_201_CREATED)
@@ -555,7 +623,7 @@ class GroupRequestActionView(APIView):
                 request_obj.handled_by = request.user
                 request_obj.handled_at = timezone.now()
                 request_obj.save(update_fields=['status', 'handled_by', 'handled_at'])
-                send_group_join_response_email_async.delay(pk, 'approved')
+                notify_join_response(request_obj, 'approved')
                 message = "User approved and added to the group successfully."
 
                 # Auto-start logic: If group is now full and active, set start_date and generate payout order
@@ -581,7 +649,7 @@ class GroupRequestActionView(APIView):
             request_obj.handled_by = request.user
             request_obj.handled_at = timezone.now()
             request_obj.save(update_fields=['status', 'handled_by', 'handled_at'])
-            send_group_join_response_email_async.delay(pk, 'rejected')
+            notify_join_response(request_obj, 'rejected')
             message = "User request has been rejected."
         else:
             message = "Invalid action."
@@ -601,10 +669,10 @@ class GroupRequestActionView(APIView):
 )
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
+    read_from_replica = True
 
     def get(self, request):
         user = request.user
-        memberships = GroupMembership.objects.filter(user=user).select_related('group')
 
         # Total savings: all user's contributions across all groups
         total_savings = user.memberships.annotate(
@@ -623,8 +691,21 @@ class DashboardView(APIView):
         else:
             growth_percentage = 100 if total_savings > 0 else 0
 
-        # Groups cards
-        groups = [m.group for m in memberships if m.group.status == 'active']
+        # Groups cards, with their contribution totals computed in the same query
+        groups = (
+            SavingsGroup.objects
+            .filter(id__in=GroupMembership.objects.filter(user=user).values('group_id'), status='active')
+            .annotate(
+                user_contribution_total=Sum(
+                    'members__contributions__amount', filter=Q(members__user=user)
+                ),
+                current_cycle_total=Sum(
+                    'members__contributions__amount',
+                    filter=Q(members__contributions__cycle_number=F('current_cycle_number'))
+                ),
+            )
+            .order_by('created_at')
+        )
         groups_serializer = GroupDashboardCardSerializer(
             groups, many=True, context={'request': request}
         )
@@ -698,6 +779,13 @@ class ContributeView(APIView):
             cycle_number=current_cycle,
             is_verified=True  # Manual now; webhook later
         )
+        # Refreshes the admin's and the member's open screens
+        realtime.publish([group.admin_id, request.user.id], 'contribution', {
+            'group_id': group.id,
+            'cycle': current_cycle,
+            'amount': contribution.amount,
+            'member_id': request.user.id,
+        })
 
         return Response({
             "message": "Contribution recorded successfully",
@@ -705,3 +793,134 @@ class ContributeView(APIView):
             "amount": float(contribution.amount),
             "cycle": current_cycle
         }, status=status.HTTP_201_CREATED)
+
+
+class NotificationCursorPagination(CursorPagination):
+    # Cursor paging stays stable while new entries arrive at the top
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+@extend_schema(
+    description="The authenticated user's in-app notification feed, newest first. "
+                "Cursor paginated: follow 'next' to load older entries.",
+    tags=['Notifications'],
+)
+class NotificationListView(generics.ListAPIView):
+    serializer_class = UserNotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+
+    def get_queryset(self):
+        return UserNotification.objects.filter(user=self.request.user)
+
+
+@extend_schema(
+    description="Number of unread notifications. Cheap enough to poll instead of the dashboard.",
+    tags=['Notifications'],
+    responses={200: UnreadCountSerializer}
+)
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": feed.unread_count(request.user.id)})
+
+
+@extend_schema(
+    description="Marks the given notifications, or all of them, as read.",
+    tags=['Notifications'],
+    request=MarkNotificationsReadSerializer,
+    responses={200: {
+        'type': 'object',
+        'properties': {
+            'marked_read': {'type': 'integer', 'example': 3},
+            'unread_count': {'type': 'integer', 'example': 0}
+        }
+    }}
+)
+class NotificationMarkReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkNotificationsReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = None if serializer.validated_data['all'] else serializer.validated_data['ids']
+
+        marked = feed.mark_read(request.user.id, ids)
+        return Response({
+            "marked_read": marked,
+            "unread_count": feed.unread_count(request.user.id)
+        })
+
+
+@extend_schema(
+    description="Issues a single-use ticket for opening the event stream: "
+                "GET /api/accounts/events/?ticket=<ticket> within 'expires_in' seconds. "
+                "EventSource can't send the Authorization header, and access tokens don't belong in URLs.",
+    tags=['Notifications'],
+    request=None,
+    responses={200: {
+        'type': 'object',
+        'properties': {
+            'ticket': {'type': 'string'},
+            'expires_in': {'type': 'integer', 'example': 30}
+        }
+    }}
+)
+class EventStreamTicketView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "ticket": realtime.issue_stream_ticket(request.user.id),
+            "expires_in": settings.REALTIME_TICKET_SECONDS
+        })
+
+
+async def _authenticate_stream(request):
+    """Resolves the user from a Bearer token or a single-use ?ticket= from EventStreamTicketView."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        authentication = JWTAuthentication()
+        try:
+            validated_token = authentication.get_validated_token(header[7:])
+            return await sync_to_async(authentication.get_user)(validated_token)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None
+    user_id = await realtime.redeem_stream_ticket(ticket)
+    if user_id is None:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events stream of the authenticated user's real-time events:
+    join requests, join responses, contributions and payouts.
+    """
+    user = await _authenticate_stream(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    async def events():
+        # Tell the client how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        async with realtime.get_broker().subscription(user.id) as queue:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=settings.REALTIME_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The real-time event stream (accounts.views.event_stream) holds connections
+open, and the OTP, password reset and signup views await Dawurobo and
+Cloudinary instead of blocking a worker, so serve this with an async server, e.g.
+    gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -14,3 +19,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+from accounts import otp  # noqa: E402
+
+# One event loop serves every request: keep provider connections open between them
+otp.keep_clients_open()
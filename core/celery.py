@@ -1,5 +1,26 @@
+"""
+Celery app.
+
+Tasks are routed to queues per workload class (CELERY_TASK_ROUTES). Give
+user-facing queues their own worker so a payout-day backlog can't hold them up:
+
+    SNAPPX_ROLE=worker celery -A core worker -Q interactive,notifications -c 8 -n fast@%h
+    SNAPPX_ROLE=worker celery -A core worker -Q payouts,bulk,default -c 2 -O fair -n slow@%h
+
+SNAPPX_ROLE=worker loads the slimmer worker settings (see core/settings.py).
+
+Every task is instrumented through Celery signals: time waiting in the queue,
+runtime, retries and failures per task name, recorded in core.metrics and
+served with broker queue depths at /metrics.
+"""
 import os
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, task_retry
+
+from core.instrumentation import sample_pool_stats
+from core.metrics import metrics
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
@@ -9,6 +30,61 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
 
+SENT_AT_HEADER = 'snappx_sent_at'
+
+# Start times of the tasks running in this worker process, by task id
+_started = {}
+
+
+@before_task_publish.connect
+def stamp_sent_at(headers=None, **kwargs):
+    headers[SENT_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    sent_at = getattr(task.request, SENT_AT_HEADER, None) or (task.request.headers or {}).get(SENT_AT_HEADER)
+    if sent_at:
+        metrics.observe('celery_task_queue_seconds', max(0.0, time.time() - sent_at), {'task': task.name})
+
+
+@task_postrun.connect
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    labels = {'task': task.name, 'state': state or 'UNKNOWN'}
+    if started is not None:
+        metrics.observe('celery_task_runtime_seconds', time.perf_counter() - started, labels)
+    metrics.inc('celery_tasks_total', labels)
+    sample_pool_stats()
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    metrics.inc('celery_task_retries_total', {'task': sender.name})
+
+
+@task_failure.connect
+def record_task_failure(sender=None, exception=None, **kwargs):
+    metrics.inc('celery_task_failures_total', {'task': sender.name, 'exception': type(exception).__name__})
+
+
+def sample_queue_depths():
+    """Records the number of messages waiting in each task queue as a gauge."""
+    with app.connection_for_read() as connection:
+        # Fail fast when the broker is down instead of retrying inside a scrape
+        connection.ensure_connection(max_retries=1)
+        channel = connection.default_channel
+        for queue in app.conf.task_queues or ():
+            try:
+                depth = channel.queue_declare(queue=queue.name, passive=True).message_count
+            except Exception:
+                # Queues nobody has published to yet don't exist on some brokers
+                depth = 0
+            metrics.set_gauge('celery_queue_depth', depth, {'queue': queue.name})
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
+
@@ -0,0 +1,140 @@
+"""
+Read-replica routing.
+
+Views with ``read_from_replica = True`` run their GET and HEAD queries on the
+'replica' database while ReplicaRoutingMiddleware has replica reads switched
+on. Everything else, and any read inside a transaction, goes to the primary.
+
+After a successful write, the user's reads stay on the primary for
+REPLICA_STICKY_SECONDS, so they see their own changes despite replica lag.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from core.metrics import metrics
+
+REPLICA = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and REPLICA in settings.DATABASES
+            # Reads in a write transaction must see its uncommitted rows
+            and not connections['default'].in_atomic_block
+        ):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def _sticky_key(user_id):
+    return f'db-sticky:{user_id}'
+
+
+def _token_user_id(request):
+    # Read before the view authenticates, so only the token's signature is checked, without a query
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        return auth.get_validated_token(raw).get(api_settings.USER_ID_CLAIM)
+    except (InvalidToken, TokenError):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Turns on replica reads for safe requests to views that opt in, unless the user just wrote."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request._replica_reads = False
+        try:
+            response = self.get_response(request)
+        finally:
+            self._end_replica_reads(request)
+        self._mark_sticky(request, response)
+        return response
+
+    async def __acall__(self, request):
+        request._replica_reads = False
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._end_replica_reads(request)
+        await sync_to_async(self._mark_sticky)(request, response)
+        return response
+
+    def _end_replica_reads(self, request):
+        # Not reset() with a token: under ASGI process_view runs in a thread,
+        # on a copy of this context, so its token doesn't belong here
+        if request._replica_reads:
+            _replica_reads.set(False)
+
+    def _mark_sticky(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            # DRF copies the authenticated user back onto the Django request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(_sticky_key(user.pk), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if request.method not in ('GET', 'HEAD') or not getattr(view_class, 'read_from_replica', False):
+            return None
+        user_id = _token_user_id(request)
+        if user_id is not None and cache.get(_sticky_key(user_id)):
+            metrics.inc('db_replica_sticky_reads_total')
+            return None
+        _replica_reads.set(True)
+        request._replica_reads = True
+        return None
+
+
+def sample_replica_lag():
+    """
+    Sets the db_replica_lag_seconds gauge: time since the replica last replayed
+    a transaction. That overstates lag while the primary is idle.
+    """
+    if REPLICA not in settings.DATABASES or connections[REPLICA].vendor != 'postgresql':
+        return
+    with connections[REPLICA].cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_is_in_recovery() "
+            "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        lag, = cursor.fetchone()
+    if lag is not None:
+        metrics.set_gauge('db_replica_lag_seconds', float(lag))
@@ -0,0 +1,176 @@
+"""
+Per-request performance counters.
+
+RequestMetricsMiddleware opens a RequestStats for each request. While it is
+open, the DB execute wrapper, the instrumented cache backend and
+track_outbound() add to it. Outbound calls are also timed outside requests,
+e.g. in Celery tasks. Connection pool counters are sampled after requests and
+tasks.
+"""
+import contextlib
+import re
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+
+from core.metrics import metrics
+
+_current = ContextVar('request_stats', default=None)
+
+_MISS = object()
+
+POOL_SAMPLE_SECONDS = 10
+POOL_IN_USE_BUCKETS = (0, 1, 2, 5, 10, 20, 50)
+_pool_sampled_at = 0.0
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # service -> (calls, seconds)
+    outbound: dict = field(default_factory=dict)
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collect():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+class QueryRecorder:
+    """Execute wrapper that keeps each query's SQL shape and the project code that ran it."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((_sql_shape(sql), _project_stack()))
+        return execute(sql, params, many, context)
+
+    def report(self, limit=10):
+        """The most repeated statements, each with the stack of its first run."""
+        counts = Counter(shape for shape, _ in self.queries)
+        first_stack = {}
+        for shape, stack in self.queries:
+            first_stack.setdefault(shape, stack)
+        lines = []
+        for shape, count in counts.most_common(limit):
+            lines.append(f"{count}x {shape[:300]}")
+            lines.extend(f"    {frame}" for frame in first_stack[shape])
+        return '\n'.join(lines)
+
+
+def _sql_shape(sql):
+    # Literal values differ between N+1 repeats; the shape doesn't
+    return re.sub(r"\b\d+\b|'[^']*'", '?', sql)
+
+
+def _project_stack():
+    base = str(settings.BASE_DIR)
+    return [
+        f"{frame.filename[len(base) + 1:]}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and '/site-packages/' not in frame.filename
+    ]
+
+
+@contextlib.contextmanager
+def track_outbound(service):
+    """Times a call to an external service, e.g. ``with track_outbound('dawurobo'):``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe('outbound_request_seconds', elapsed, {'service': service})
+        stats = _current.get()
+        if stats is not None:
+            calls, seconds = stats.outbound.get(service, (0, 0.0))
+            stats.outbound[service] = (calls + 1, seconds + elapsed)
+
+
+def _record_cache(hits, misses):
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class InstrumentedRedisCache(RedisCache):
+    """RedisCache that counts hits and misses for the current request."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISS, version)
+        if value is _MISS:
+            _record_cache(0, 1)
+            return default
+        _record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        _record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+def sample_pool_stats():
+    """Adds each database pool's activity since the last sample to the metrics; at most every 10s per process."""
+    global _pool_sampled_at
+    now = time.monotonic()
+    if now - _pool_sampled_at < POOL_SAMPLE_SECONDS:
+        return
+    _pool_sampled_at = now
+
+    for alias in connections:
+        connection = connections[alias]
+        # Only pools this process already opened; DatabaseWrapper.pool would open one
+        pool = getattr(type(connection), '_connection_pools', {}).get(alias)
+        if pool is None:
+            continue
+        stats = pool.pop_stats()
+        labels = {'alias': alias}
+        metrics.observe(
+            'db_pool_connections_in_use', stats['pool_size'] - stats['pool_available'], labels,
+            buckets=POOL_IN_USE_BUCKETS,
+        )
+        for key, name, scale in (
+            ('requests_num', 'db_pool_requests_total', 1),
+            ('requests_queued', 'db_pool_requests_queued_total', 1),
+            ('requests_wait_ms', 'db_pool_wait_seconds_total', 0.001),
+            ('requests_errors', 'db_pool_timeouts_total', 1),
+            ('connections_num', 'db_pool_connections_opened_total', 1),
+            ('connections_ms', 'db_pool_connect_seconds_total', 0.001),
+            ('connections_lost', 'db_pool_connections_lost_total', 1),
+        ):
+            if stats.get(key):
+                metrics.inc(name, labels, stats[key] * scale)
@@ -0,0 +1,182 @@
+"""
+Single-flight execution for periodic Celery tasks.
+
+    @shared_task
+    @single_flight('process-daily-payouts', ttl=120)
+    def process_daily_payouts():
+        ...
+
+Only one beat/worker replica runs the wrapped function at a time. Overlapping
+calls return ``None`` straight away and are counted as skipped.
+
+The backend is chosen with SINGLE_FLIGHT_BACKEND:
+  - 'redis':    a lease with a TTL, renewed in the background while the task runs
+  - 'postgres': a session-level advisory lock, on a connection of its own to the default database
+  - 'local':    an in-process lock for development and tests
+"""
+import functools
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RedisLeaseBackend:
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def acquire(self, name, ttl):
+        lock = self.client.lock(f'singleflight:{name}', timeout=ttl, thread_local=False)
+        return lock if lock.acquire(blocking=False) else None
+
+    def renew(self, lock, ttl):
+        # Resets the lease to its full TTL; fails if another node took it over
+        return lock.reacquire()
+
+    def release(self, lock):
+        from redis.exceptions import LockError
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Single-flight lease {lock.name} expired before release")
+
+
+class PostgresAdvisoryBackend:
+    """
+    Each lock is a session advisory lock on a connection of its own, opened
+    outside Django's pooled connections and closed on release: the lock can't
+    be left behind on a connection returned to the pool, or unlocked from a
+    different session. A crashed worker's lock goes away with its connection.
+    """
+
+    @staticmethod
+    def _lock_id(name):
+        digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+
+    @staticmethod
+    def _connect():
+        import psycopg
+        return psycopg.connect(**{**connections['default'].get_connection_params(), 'autocommit': True})
+
+    def acquire(self, name, ttl):
+        lock_connection = self._connect()
+        try:
+            acquired = lock_connection.execute("SELECT pg_try_advisory_lock(%s)", [self._lock_id(name)]).fetchone()[0]
+        except Exception:
+            lock_connection.close()
+            raise
+        if not acquired:
+            lock_connection.close()
+            return None
+        return name, lock_connection
+
+    def renew(self, handle, ttl):
+        # The lock lasts as long as its session, so only the session needs checking
+        _, lock_connection = handle
+        try:
+            lock_connection.execute("SELECT 1")
+        except Exception:
+            return False
+        return True
+
+    def release(self, handle):
+        name, lock_connection = handle
+        try:
+            lock_connection.execute("SELECT pg_advisory_unlock(%s)", [self._lock_id(name)])
+        except Exception as e:
+            logger.warning(f"Single-flight lock '{name}' was lost before release: {e}")
+        finally:
+            lock_connection.close()
+
+
+class LocalBackend:
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._held = set()
+
+    def acquire(self, name, ttl):
+        with self._guard:
+            if name in self._held:
+                return None
+            self._held.add(name)
+            return name
+
+    def renew(self, name, ttl):
+        return True
+
+    def release(self, name):
+        with self._guard:
+            self._held.discard(name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend():
+    backend = getattr(settings, 'SINGLE_FLIGHT_BACKEND', 'redis')
+    if backend == 'redis':
+        return RedisLeaseBackend(settings.SINGLE_FLIGHT_REDIS_URL)
+    if backend == 'postgres':
+        return PostgresAdvisoryBackend()
+    if backend == 'local':
+        return LocalBackend()
+    raise ValueError(f"Unknown SINGLE_FLIGHT_BACKEND '{backend}'")
+
+
+class _LeaseRenewer(threading.Thread):
+    """Renews the lease every ttl/3 seconds until stopped."""
+
+    def __init__(self, backend, handle, name, ttl):
+        super().__init__(name=f'singleflight-{name}', daemon=True)
+        self.backend = backend
+        self.handle = handle
+        self.lock_name = name
+        self.ttl = ttl
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.ttl / 3):
+            try:
+                renewed = self.backend.renew(self.handle, self.ttl)
+            except Exception as e:
+                logger.warning(f"Single-flight renewal error for '{self.lock_name}': {e}")
+                renewed = False
+            if not renewed:
+                metrics.inc('singleflight_lease_lost_total', {'task': self.lock_name})
+                logger.error(f"Single-flight lease for '{self.lock_name}' was lost while running")
+                return
+
+
+def single_flight(name, ttl=300):
+    """
+    Skips the call when another process already holds the ``name`` lock.
+    ``ttl`` is the lease length in seconds; it is renewed while the task runs,
+    so it only bounds how long a crashed holder can block other nodes.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            handle = backend.acquire(name, ttl)
+            if handle is None:
+                metrics.inc('singleflight_skipped_total', {'task': name})
+                logger.info(f"Skipping '{name}': another run is still in progress")
+                return None
+
+            metrics.inc('singleflight_runs_total', {'task': name})
+            renewer = _LeaseRenewer(backend, handle, name, ttl)
+            renewer.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                renewer.stopped.set()
+                renewer.join()
+                backend.release(handle)
+        return wrapper
+    return decorator
@@ -0,0 +1,189 @@
+"""
+Lightweight application metrics.
+
+Counters are accumulated in-process and flushed to a Redis hash every few
+seconds, so all web and worker processes add up to one set of totals.
+Histograms are stored as Prometheus-style bucket counters in the same hash.
+Gauges are point-in-time values and are written straight through.
+When METRICS_REDIS_URL is empty the totals simply stay in the process.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = 'snappx:metrics'
+GAUGES_REDIS_KEY = 'snappx:metrics:gauges'
+
+# Seconds; suits request latency and most task runtimes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def series_key(name, labels=None):
+    """Builds a Prometheus-style series key, e.g. ``runs_total{task="payouts"}``."""
+    if not labels:
+        return name
+    rendered = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{rendered}}}'
+
+
+class MetricsRegistry:
+    def __init__(self, flush_interval=10):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._local_totals = defaultdict(float)
+        self._local_gauges = {}
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._client = None
+
+    def _redis(self):
+        url = getattr(settings, 'METRICS_REDIS_URL', None)
+        if not url:
+            return None
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        return self._client
+
+    def inc(self, name, labels=None, amount=1):
+        key = series_key(name, labels)
+        with self._lock:
+            self._pending[key] += amount
+            due = time.monotonic() - self._last_flush >= self._flush_interval
+        if due:
+            self.flush()
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        """Records one observation in histogram ``name``."""
+        labels = labels or {}
+        with self._lock:
+            for bound in buckets:
+                # Every bucket gets a series, even while it is still empty
+                self._pending[series_key(f'{name}_bucket', {**labels, 'le': _format_bound(bound)})] += value <= bound
+            self._pending[series_key(f'{name}_bucket', {**labels, 'le': '+Inf'})] += 1
+            self._pending[series_key(f'{name}_sum', labels)] += value
+            self._pending[series_key(f'{name}_count', labels)] += 1
+            due = time.monotonic() - self._last_flush >= self._flush_interval
+        if due:
+            self.flush()
+
+    def set_gauge(self, name, value, labels=None):
+        key = series_key(name, labels)
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                self._local_gauges[key] = value
+            return
+        try:
+            client.hset(GAUGES_REDIS_KEY, key, value)
+        except Exception as e:
+            logger.warning(f"Could not record gauge {key}: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                for key, value in pending.items():
+                    self._local_totals[key] += value
+            return
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in pending.items():
+                pipe.hincrbyfloat(REDIS_KEY, key, value)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Metrics flush failed, keeping values for the next attempt: {e}")
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    def snapshot(self):
+        """Returns ``{series_key: value}`` for every recorded series."""
+        return {**self._read_totals(), **self._read_gauges()}
+
+    def _read_totals(self):
+        self.flush()
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                return dict(self._local_totals)
+        return {
+            key.decode(): float(value)
+            for key, value in client.hgetall(REDIS_KEY).items()
+        }
+
+    def _read_gauges(self):
+        client = self._redis()
+        if client is None:
+            with self._lock:
+                return dict(self._local_gauges)
+        return {
+            key.decode(): float(value)
+            for key, value in client.hgetall(GAUGES_REDIS_KEY).items()
+        }
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format."""
+        totals = self._read_totals()
+        histograms = {
+            key.split('{', 1)[0][:-len('_bucket')] for key in totals if key.split('{', 1)[0].endswith('_bucket')
+        }
+        families = defaultdict(list)
+        types = {}
+        for key, value in totals.items():
+            name = key.split('{', 1)[0]
+            family = name.rsplit('_', 1)[0]
+            if family not in histograms or name[len(family):] not in ('_bucket', '_sum', '_count'):
+                family = name
+            families[family].append((key, value))
+            types[family] = 'histogram' if family in histograms else 'counter'
+        for key, value in self._read_gauges().items():
+            family = key.split('{', 1)[0]
+            families[family].append((key, value))
+            types[family] = 'gauge'
+
+        lines = []
+        for family in sorted(families):
+            lines.append(f'# TYPE {family} {types[family]}')
+            for key, value in sorted(families[family], key=_series_sort_key):
+                lines.append(f'{key} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_bound(bound):
+    return f'{bound:g}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _series_sort_key(item):
+    # Groups a histogram's series by labels: buckets in ascending ``le``, then _count and _sum
+    name, _, labels = item[0].partition('{')
+    bound = float('inf')
+    other_labels = []
+    for pair in labels.rstrip('}').split(','):
+        if pair.startswith('le="'):
+            text = pair[4:-1]
+            bound = float('inf') if text == '+Inf' else float(text)
+        elif pair:
+            other_labels.append(pair)
+    return (other_labels, not name.endswith('_bucket'), name, bound)
+
+
+metrics = MetricsRegistry()
+atexit.register(metrics.flush)
@@ -0,0 +1,117 @@
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import instrumentation
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+@contextmanager
+def _wrap_connections(wrapper):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, DB, cache and outbound HTTP time per resolved URL name.
+    Served with the other metrics at /metrics/; disabled with METRICS_ENABLED=False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with instrumentation.collect() as stats, _wrap_connections(instrumentation.db_execute_wrapper):
+            response = self.get_response(request)
+        self._record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with instrumentation.collect() as stats, _wrap_connections(instrumentation.db_execute_wrapper):
+            response = await self.get_response(request)
+        self._record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        labels = {'view': view, 'method': request.method}
+
+        metrics.observe('http_request_duration_seconds', elapsed, labels)
+        metrics.inc('http_responses_total', {**labels, 'status': f'{response.status_code // 100}xx'})
+        metrics.observe('http_request_db_queries', stats.db_queries, {'view': view}, buckets=QUERY_COUNT_BUCKETS)
+        metrics.inc('http_request_db_seconds_total', {'view': view}, stats.db_seconds)
+        if stats.cache_hits:
+            metrics.inc('http_request_cache_hits_total', {'view': view}, stats.cache_hits)
+        if stats.cache_misses:
+            metrics.inc('http_request_cache_misses_total', {'view': view}, stats.cache_misses)
+        for service, (calls, seconds) in stats.outbound.items():
+            metrics.inc('http_request_outbound_calls_total', {'view': view, 'service': service}, calls)
+            metrics.inc('http_request_outbound_seconds_total', {'view': view, 'service': service}, seconds)
+        instrumentation.sample_pool_stats()
+
+
+class QueryLogMiddleware:
+    """
+    Development aid: logs every request that runs more than QUERY_LOG_THRESHOLD
+    queries, with each repeated statement and the code that issued it.
+    Only active when DEBUG is on and the threshold is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (settings.DEBUG and settings.QUERY_LOG_THRESHOLD):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = instrumentation.QueryRecorder()
+        with _wrap_connections(recorder):
+            response = self.get_response(request)
+        self._report(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = instrumentation.QueryRecorder()
+        with _wrap_connections(recorder):
+            response = await self.get_response(request)
+        self._report(request, recorder)
+        return response
+
+    def _report(self, request, recorder):
+        if len(recorder.queries) > settings.QUERY_LOG_THRESHOLD:
+            logger.warning(
+                f"{request.method} {request.path} ran {len(recorder.queries)} queries "
+                f"(threshold {settings.QUERY_LOG_THRESHOLD}):\n{recorder.report()}"
+            )
@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from decouple import config
 from pathlib import Path
 from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
+from kombu import Queue
 
 # Load .env file
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,31 +24,46 @@ DJANGO_ENV = config('DJANGO_ENV', default='development')
 
 ALLOWED_HOSTS = ['*']
 
+# Process role: 'web' serves HTTP; 'worker' runs Celery and skips the apps only
+# requests use (admin, sessions, static files, CORS, API schema), so it starts
+# faster and holds less memory. Run migrations and collectstatic as 'web'.
+SNAPPX_ROLE = config('SNAPPX_ROLE', default='web')
+if SNAPPX_ROLE not in ('web', 'worker'):
+    raise ImproperlyConfigured(f"SNAPPX_ROLE must be 'web' or 'worker', not {SNAPPX_ROLE!r}")
+
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
     'django.contrib.sites',
 
     'rest_framework',
     'rest_framework_simplejwt',
-    'corsheaders',
     'phonenumber_field',
     'cloudinary',
-    'cloudinary_storage',
-    'django_otp',
-    'qrcode',
-    'drf_spectacular',
     'django_filters',
 
     'accounts',
 ]
+if SNAPPX_ROLE == 'web':
+    INSTALLED_APPS += [
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'corsheaders',
+        'cloudinary_storage',
+        'drf_spectacular',
+    ]
+else:
+    # Celery runs Django's system checks as a worker starts, which imports every
+    # URLconf and view; web deploys run them already
+    os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.QueryLogMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,6 +108,8 @@ if DJANGO_ENV == 'production':
             'PORT': os.getenv('DB_PORT'),
         }
     }
+    REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+    REPLICA_PORT = os.getenv('DB_REPLICA_PORT', os.getenv('DB_PORT'))
 else:
     print("--- Using Development Database ---")
     DATABASES = {
@@ -103,6 +122,44 @@ else:
             'PORT': '5432',
         }
     }
+    REPLICA_HOST = config('POSTGRES_REPLICA_HOST', default='')
+    REPLICA_PORT = config('POSTGRES_REPLICA_PORT', default='5432')
+
+# Read replica for views with read_from_replica (core/db_router.py), only when a
+# replica host is set: otherwise every read stays on 'default', rather than a
+# second pool to the same server. Tests mirror 'default'.
+if REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': REPLICA_HOST,
+        'PORT': REPLICA_PORT,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# After a write, the user's reads stay on the primary this long
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+# Connection reuse. The psycopg pool serves WSGI and ASGI workers alike; each
+# process keeps up to DB_POOL_MAX_SIZE connections per alias, checks one before
+# handing it out (Django passes the pool's check when CONN_HEALTH_CHECKS is on),
+# and replaces it after DB_POOL_MAX_LIFETIME seconds. With the pool off,
+# connections persist for DB_CONN_MAX_AGE seconds instead.
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=True, cast=bool)
+for database in DATABASES.values():
+    database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_ENABLED:
+        database['OPTIONS'] = {
+            **database.get('OPTIONS', {}),
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+                'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+                'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            },
+        }
+    else:
+        database['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -176,10 +233,46 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': config('CLOUDINARY_API_SECRET'),
 }
 
+# Uploads Group Admin KYC images; accounts.kyc.FakeKycUploader for development and tests
+KYC_UPLOADER = config('KYC_UPLOADER', default='accounts.kyc.CloudinaryKycUploader')
+# Lifetime of the signed URLs the admin shows KYC images through, and how long
+# before expiry a cached one is replaced
+KYC_SIGNED_URL_SECONDS = config('KYC_SIGNED_URL_SECONDS', default=3600, cast=int)
+KYC_SIGNED_URL_MARGIN = config('KYC_SIGNED_URL_MARGIN', default=60, cast=int)
+
+# Signup pictures wait in the database until a worker uploads them
+PROFILE_PICTURE_MAX_BYTES = config('PROFILE_PICTURE_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+# Staged pictures older than this are enqueued again; longer than the task's retries (about 16 minutes)
+PROFILE_PICTURE_REQUEUE_SECONDS = config('PROFILE_PICTURE_REQUEUE_SECONDS', default=20 * 60, cast=int)
+
 # Dawurobo SMS OTP Settings
 DAWUROBO_API_KEY = config('DAWUROBO_API_KEY')
 DAWUROBO_ACCESS_TOKEN = config('DAWUROBO_ACCESS_TOKEN')
 DAWUROBO_SENDER_ID = config('DAWUROBO_SENDER_ID', default='Dawurobo')
+# Open connections to the OTP API per ASGI worker; calls beyond this wait for one
+DAWUROBO_MAX_CONNECTIONS = config('DAWUROBO_MAX_CONNECTIONS', default=200, cast=int)
+
+# MoMo disbursement of payouts. Unset, the disbursement tasks refuse to run;
+# accounts.disbursements.FakeDisbursementProvider is for development only.
+DISBURSEMENT_PROVIDER = config('DISBURSEMENT_PROVIDER', default='')
+DISBURSEMENT_BATCH_SIZE = config('DISBURSEMENT_BATCH_SIZE', default=100, cast=int)
+DISBURSEMENT_MAX_CONCURRENCY = config('DISBURSEMENT_MAX_CONCURRENCY', default=4, cast=int)
+# A batch still submitting after this long was left by a run that died
+DISBURSEMENT_SUBMIT_TIMEOUT = config('DISBURSEMENT_SUBMIT_TIMEOUT', default=900, cast=int)
+PAYSTACK_SECRET_KEY = config('PAYSTACK_SECRET_KEY', default='')
+
+# Notification outbox delivery
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=100, cast=int)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=8, cast=int)
+NOTIFICATION_RETRY_BASE_SECONDS = config('NOTIFICATION_RETRY_BASE_SECONDS', default=60, cast=int)
+NOTIFICATION_RETRY_MAX_SECONDS = config('NOTIFICATION_RETRY_MAX_SECONDS', default=3600, cast=int)
+NOTIFICATION_LEASE_SECONDS = config('NOTIFICATION_LEASE_SECONDS', default=300, cast=int)
+
+# SMS notifications. Set SMS_PROVIDER to '' to turn SMS off;
+# accounts.sms.FakeSmsProvider is for development only.
+SMS_PROVIDER = config('SMS_PROVIDER', default='accounts.sms.DawuroboSmsProvider')
+SMS_BATCH_SIZE = config('SMS_BATCH_SIZE', default=100, cast=int)
+SMS_RATE_LIMIT_PER_MINUTE = config('SMS_RATE_LIMIT_PER_MINUTE', default=300, cast=int)
 
 # Axes - Login brute force protection
 AUTHENTICATION_BACKENDS = [
@@ -232,6 +325,35 @@ CELERY_BROKER_URL = os.environ.get(
 )
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 
+# Single-flight locks for periodic tasks: 'redis', 'postgres' or 'local'
+SINGLE_FLIGHT_BACKEND = os.environ.get('SINGLE_FLIGHT_BACKEND', 'redis')
+SINGLE_FLIGHT_REDIS_URL = os.environ.get('SINGLE_FLIGHT_REDIS_URL', CELERY_BROKER_URL)
+
+# Shared store for application metrics (empty keeps them per process)
+METRICS_REDIS_URL = os.environ.get('METRICS_REDIS_URL', CELERY_BROKER_URL)
+# Per-request instrumentation (core.middleware.RequestMetricsMiddleware)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# In DEBUG, log requests running more queries than this, with stack traces (0 turns it off)
+QUERY_LOG_THRESHOLD = config('QUERY_LOG_THRESHOLD', default=0, cast=int)
+# Lets non-local scrapers read /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Real-time event fan-out: 'redis' or 'local' (single process only)
+REALTIME_BROKER = os.environ.get('REALTIME_BROKER', 'redis')
+REALTIME_REDIS_URL = os.environ.get('REALTIME_REDIS_URL', CELERY_BROKER_URL)
+REALTIME_KEEPALIVE_SECONDS = 15
+REALTIME_STREAM_BUFFER = 100
+# Lifetime of the single-use ticket a client opens its event stream with
+REALTIME_TICKET_SECONDS = config('REALTIME_TICKET_SECONDS', default=30, cast=int)
+
+# Shared cache, used for cross-worker counters such as the SMS rate limit
+CACHES = {
+    'default': {
+        'BACKEND': 'core.instrumentation.InstrumentedRedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', CELERY_BROKER_URL),
+    }
+}
+
 # Timezone setting
 CELERY_TIMEZONE = 'Africa/Accra'
 
@@ -240,6 +362,42 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Queues per workload class, so a payout-day backlog can't delay user-facing work.
+# Run separate workers for them (see core/celery.py).
+CELERY_TASK_QUEUES = (
+    Queue('interactive'),
+    Queue('notifications'),
+    Queue('payouts'),
+    Queue('bulk'),
+    Queue('default'),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+
+# Redis priorities: 0 is served first within a queue
+CELERY_TASK_ROUTES = {
+    'accounts.tasks.send_group_join_request_email_async': {'queue': 'interactive', 'priority': 0},
+    'accounts.tasks.send_group_join_response_email_async': {'queue': 'interactive', 'priority': 0},
+    'accounts.tasks.process_profile_picture': {'queue': 'interactive', 'priority': 3},
+    'accounts.tasks.drain_notification_outbox': {'queue': 'notifications', 'priority': 3},
+    'accounts.tasks.send_payout_notification_email_async': {'queue': 'notifications', 'priority': 3},
+    'accounts.tasks.process_daily_payouts': {'queue': 'payouts', 'priority': 6},
+    'accounts.tasks.disburse_due_payouts': {'queue': 'payouts', 'priority': 6},
+    'accounts.tasks.reconcile_disbursements': {'queue': 'payouts', 'priority': 6},
+    'accounts.tasks.roll_over_group_cycles': {'queue': 'bulk', 'priority': 9},
+    'accounts.tasks.requeue_staged_profile_pictures': {'queue': 'bulk', 'priority': 9},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+
+# Nothing reads task results; tasks that need one opt back in
+CELERY_TASK_IGNORE_RESULT = True
+
+# Long payout jobs shouldn't sit prefetched behind each other on one process
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 # # Periodic Task Scheduling
 # CELERY_BEAT_SCHEDULE = {
 #     'process-daily-payouts': {
@@ -250,10 +408,31 @@ CELERY_RESULT_SERIALIZER = 'json'
 # }
 
 CELERY_BEAT_SCHEDULE = {
+    'roll-over-group-cycles': {
+        'task': 'accounts.tasks.roll_over_group_cycles',
+        # Just after midnight, when cycles change
+        'schedule': crontab(minute=1, hour=0),
+    },
     'process-daily-payouts': {
         'task': 'accounts.tasks.process_daily_payouts',
         'schedule': timedelta(minutes=3),
-        'options': {'queue': 'default'},
+    },
+    'disburse-due-payouts': {
+        'task': 'accounts.tasks.disburse_due_payouts',
+        'schedule': timedelta(minutes=5),
+    },
+    'reconcile-disbursements': {
+        'task': 'accounts.tasks.reconcile_disbursements',
+        'schedule': timedelta(minutes=10),
+    },
+    'requeue-staged-profile-pictures': {
+        'task': 'accounts.tasks.requeue_staged_profile_pictures',
+        'schedule': timedelta(minutes=5),
+    },
+    'drain-notification-outbox': {
+        'task': 'accounts.tasks.drain_notification_outbox',
+        # Picks up retries; new notifications also kick the drainer directly
+        'schedule': timedelta(minutes=1),
     },
 }
 
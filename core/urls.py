@@ -1,17 +1,32 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
+from core.views import lazy_view, metrics_view
 
+urlpatterns = [
     # Auth Endpoints (Login, Tokens, Signup)
     path('api/auth/', include('accounts.auth_urls')),
 
     # Application/Group Management Endpoints (Groups)
     path('api/accounts/', include('accounts.urls')),
 
-    # Swagger Docs Endpoints
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    # Prometheus metrics
+    path('metrics/', metrics_view, name='metrics'),
 ]
+
+# Web processes only (SNAPPX_ROLE); workers load this URLconf just to reverse links
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if apps.is_installed('drf_spectacular'):
+    # Swagger Docs Endpoints. The schema generator loads on the first request.
+    urlpatterns += [
+        path('api/schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+        path(
+            'api/schema/swagger-ui/',
+            lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'),
+            name='swagger-ui',
+        ),
+    ]
@@ -0,0 +1,52 @@
+import functools
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+from core.celery import sample_queue_depths
+from core.db_router import sample_replica_lag
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers send ``Authorization: Bearer <METRICS_TOKEN>``;
+    in DEBUG it is also open to local addresses.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = (settings.DEBUG and request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')) or (
+        token and request.headers.get('Authorization') == f'Bearer {token}'
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+
+    try:
+        sample_queue_depths()
+    except Exception as e:
+        logger.warning(f"Could not sample Celery queue depths: {e}")
+    try:
+        sample_replica_lag()
+    except Exception as e:
+        logger.warning(f"Could not sample replica lag: {e}")
+
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    A class-based view imported on its first request rather than with the
+    URLconf, for views that pull in heavy modules but are rarely used.
+    """
+    @functools.cache
+    def load():
+        return import_string(dotted_path).as_view(**initkwargs)
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        return load()(request, *args, **kwargs)
+    return view